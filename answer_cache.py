@@ -0,0 +1,120 @@
+"""
+Cache of recent answers for Star College Chatbot
+"""
+import os
+import re
+import json
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from metrics import metrics
+
+def normalize_question(question: str) -> str:
+    """
+    Normalize a question so trivially different phrasings share a cache entry
+
+    Args:
+        question: User question
+
+    Returns:
+        Lowercase question with collapsed whitespace and no trailing punctuation
+    """
+    return re.sub(r"\s+", " ", question.lower()).strip().rstrip("?!. ")
+
+class AnswerCache:
+    """Thread-safe LRU cache of answers keyed by normalized question"""
+
+    def __init__(self, max_entries: int = 1024):
+        """
+        Initialize the answer cache
+
+        Args:
+            max_entries: Maximum number of answers to keep
+        """
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+
+    def get(self, question: str) -> Optional[str]:
+        """
+        Get the cached answer for a question
+
+        Args:
+            question: User question
+
+        Returns:
+            The cached answer, or None on a miss
+        """
+        key = normalize_question(question)
+        with self._lock:
+            answer = self._entries.get(key)
+            if answer is not None:
+                self._entries.move_to_end(key)
+
+        metrics.increment("answer_cache.hits" if answer is not None else "answer_cache.misses")
+        return answer
+
+    def put(self, question: str, answer: str) -> None:
+        """
+        Cache the answer to a question
+
+        Args:
+            question: User question
+            answer: Answer to cache
+        """
+        key = normalize_question(question)
+        with self._lock:
+            self._entries[key] = answer
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def save(self, path: str) -> int:
+        """
+        Write the cached answers to a JSONL file, oldest first, e.g. for a server to load
+
+        Args:
+            path: File to write
+
+        Returns:
+            Number of answers written
+        """
+        with self._lock:
+            entries = list(self._entries.items())
+
+        # Written beside the file and renamed into place, so a loading server never sees half of it
+        directory = os.path.dirname(os.path.abspath(path))
+        descriptor, temporary_path = tempfile.mkstemp(suffix=".jsonl", dir=directory)
+        with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+            for question, answer in entries:
+                f.write(json.dumps({"question": question, "answer": answer}, ensure_ascii=False) + "\n")
+        os.replace(temporary_path, path)
+        return len(entries)
+
+    def load(self, path: str) -> int:
+        """
+        Add the answers of a JSONL file written by save
+
+        Args:
+            path: File to read
+
+        Returns:
+            Number of answers loaded
+        """
+        loaded = 0
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.put(entry["question"], entry["answer"])
+                    loaded += 1
+        return loaded
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+# Process-wide cache of answers from upstream providers
+answer_cache = AnswerCache()
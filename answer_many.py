@@ -0,0 +1,103 @@
+"""
+Answer a JSONL file of questions with StarBot
+
+Usage:
+    python answer_many.py questions.jsonl -o answers.jsonl
+    python answer_many.py questions.jsonl -o answers.jsonl --cache-file answer_cache.jsonl
+
+Each input line is either a JSON object with a "question" key (and an optional "id") or a
+JSON string. Results are streamed as JSONL and a throughput summary is printed to stderr.
+With --cache-file, the answers the LLM gave are also written where a server started with
+ANSWER_CACHE_FILE pointing at that file loads them into its answer cache.
+"""
+import os
+import sys
+import json
+import argparse
+from typing import Dict, Any, List
+
+from dotenv import load_dotenv
+
+from batch_answering import BatchStats, answer_many
+
+def read_questions(path: str) -> List[Dict[str, Any]]:
+    """Read questions from a JSONL file, or stdin if the path is "-" """
+    handle = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    questions = []
+    try:
+        for line in handle:
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            questions.append(item if isinstance(item, dict) else {"question": str(item)})
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+    return questions
+
+def main():
+    """Main function"""
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions with StarBot")
+    parser.add_argument("input", help="JSONL file of questions, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="JSONL file to write answers to (default: stdout)")
+    parser.add_argument("--provider", default=os.environ.get("LLM_PROVIDER", "mock"), help="LLM provider to use")
+    parser.add_argument("--workers", type=int, default=8, help="Number of questions answered concurrently")
+    parser.add_argument("--url", default="https://starcollegedurban.co.za/", help="Website to retrieve context from")
+    parser.add_argument("--no-retrieval", action="store_true", help="Answer without retrieving context")
+    parser.add_argument("--unordered", action="store_true", help="Write answers as they complete instead of in input order")
+    parser.add_argument("--cache-file", help="JSONL file to save the LLM's answers to, for a server's ANSWER_CACHE_FILE")
+    args = parser.parse_args()
+
+    from answer_cache import answer_cache
+    from intent_router import IntentRouter
+    from llm_providers import get_llm_provider
+    from provider_registry import provider_registry
+
+    questions = read_questions(args.input)
+    print(f"Loaded {len(questions)} questions", file=sys.stderr)
+
+    provider = get_llm_provider(args.provider)
+    if not provider.initialize():
+        print(f"Could not initialize {args.provider} provider", file=sys.stderr)
+        sys.exit(1)
+
+    # Routed like the server's questions, so the same ones are answered locally
+    cheap_model = os.environ.get("LLM_CHEAP_MODEL")
+    cheap_provider = provider_registry.get(args.provider, cheap_model) if cheap_model and args.provider != "mock" else None
+    router = IntentRouter(provider, cheap_provider)
+
+    # Added to rather than replaced, so running the batch in parts accumulates answers
+    if args.cache_file and os.path.exists(args.cache_file):
+        answer_cache.load(args.cache_file)
+
+    retriever = None
+    if not args.no_retrieval:
+        from data_retrieval import DataRetriever
+
+        # The website is scraped once for the whole batch
+        retriever = DataRetriever()
+        retriever.initialize(args.url)
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    stats = BatchStats()
+    try:
+        for result in answer_many(questions, router, retriever,
+                                  max_workers=args.workers,
+                                  ordered=not args.unordered,
+                                  stats=stats):
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(json.dumps(stats.summary()), file=sys.stderr)
+
+    if args.cache_file:
+        print(f"Saved {answer_cache.save(args.cache_file)} answers to {args.cache_file}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -38,14 +38,8 @@ def main():
     data_ingestion = DataIngestion()
     model_config = ModelConfig()
 
-    # Load data from Star College Durban website
-    print("Ingesting data from Star College Durban website...")
-    docs = data_ingestion.ingest_website('https://starcollegedurban.co.za/')
-    print(f"Ingested {len(docs)} document chunks")
-
-    # Create vector store
-    vector_store = data_ingestion.create_vector_store(docs, 'star-college')
-    print("Vector store created successfully")
+    # Reuse the persisted collection; set STARBOT_REFRESH_DATA=true to re-crawl the website
+    vector_store = data_ingestion.website_vector_store('https://starcollegedurban.co.za/', 'star-college')
 
     # Initialize QA system
     qa_system = RetrievalQA(
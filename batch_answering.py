@@ -0,0 +1,119 @@
+"""
+Batch question answering for Star College Chatbot
+
+Used for cache warming after a deploy, offline regression evaluation and FAQ generation.
+Questions go through the IntentRouter like those the server gets. They are taken a chunk
+at a time: small talk and FAQ hits are answered locally, retrieval for the rest of the
+chunk runs in one pass against the already-loaded index, and the LLM calls run
+concurrently; each provider's admission controller keeps them within the upstream rate
+limits.
+"""
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, Dict, Any, List, Iterator
+
+from intent_router import IntentRouter
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class BatchStats:
+    """Throughput and latency statistics for a batch run"""
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self.latencies: List[float] = []
+
+    def record(self, latency: float) -> None:
+        """Record the latency of one answered question"""
+        self.latencies.append(latency)
+
+    def finish(self) -> None:
+        """Mark the batch as finished"""
+        self.finished_at = time.monotonic()
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Summarize the batch
+
+        Returns:
+            Dictionary with question count, elapsed time, throughput and latency percentiles
+        """
+        elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        latencies = sorted(self.latencies)
+
+        def percentile(pct: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(pct / 100.0 * len(latencies)))], 3)
+
+        return {
+            "questions": len(latencies),
+            "elapsed_seconds": round(elapsed, 3),
+            "questions_per_second": round(len(latencies) / elapsed, 2) if elapsed > 0 else None,
+            "latency_p50": percentile(50),
+            "latency_p95": percentile(95),
+        }
+
+def answer_many(questions: List[Dict[str, Any]],
+                router: IntentRouter,
+                retriever=None,
+                max_workers: int = 8,
+                num_results: int = 3,
+                ordered: bool = True,
+                stats: Optional[BatchStats] = None,
+                chunk_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Answer a batch of questions
+
+    Args:
+        questions: Items with a "question" key and an optional "id"
+        router: Intent router answering each question locally or through its providers
+        retriever: Optional DataRetriever (or anything with search_many) for context
+        max_workers: Number of questions answered concurrently
+        num_results: Number of context passages per question
+        ordered: Yield results in input order rather than as they complete
+        stats: Optional BatchStats to record throughput into
+        chunk_size: Questions in flight at once (default: four per worker)
+
+    Yields:
+        One result per question with id, question, answer, route, context and latency
+    """
+    stats = stats or BatchStats()
+    chunk_size = chunk_size or max_workers * 4
+
+    def answer(index: int, context: List[str]) -> Dict[str, Any]:
+        start = time.monotonic()
+        reply, route = router.answer(questions[index]["question"], context)
+        latency = time.monotonic() - start
+        return {
+            "id": questions[index].get("id", index),
+            "question": questions[index]["question"],
+            "answer": reply,
+            "route": route,
+            "context": context,
+            "latency_seconds": round(latency, 3),
+        }
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch-answer") as executor:
+        for start in range(0, len(questions), chunk_size):
+            indices = range(start, min(start + chunk_size, len(questions)))
+
+            # Retrieval in one pass for the questions of the chunk small talk and the FAQ leave
+            retrieved = [index for index in indices if router.route_local(questions[index]["question"]) is None]
+            contexts: Dict[int, List[str]] = {index: [] for index in indices}
+            if retriever and retrieved:
+                texts = [questions[index]["question"] for index in retrieved]
+                contexts.update(zip(retrieved, retriever.search_many(texts, num_results)))
+
+            futures = [executor.submit(answer, index, contexts[index]) for index in indices]
+            for future in (futures if ordered else as_completed(futures)):
+                result = future.result()
+                stats.record(result["latency_seconds"])
+                yield result
+
+    stats.finish()
+    logger.info(f"Batch finished: {stats.summary()}")
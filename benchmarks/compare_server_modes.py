@@ -0,0 +1,145 @@
+"""
+Compare the sync (gunicorn + Flask) and async (uvicorn + Starlette) server modes
+
+Starts the stub LLM server, then runs each server mode in turn against it with the DeepSeek
+provider and drives the same load through /ask: a number of concurrent conversations, each
+asking its questions one after another. Nothing leaves the machine.
+
+Usage:
+    python benchmarks/compare_server_modes.py --conversations 200 --turns 3 --latency 1.0
+
+Needs gunicorn, uvicorn and httpx (all in requirements-server.txt).
+"""
+import os
+import sys
+import time
+import json
+import asyncio
+import argparse
+import subprocess
+from typing import Dict, Any, List
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from stub_llm_server import StubConfig, start_in_thread
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Questions that are not small talk or FAQ hits, so every one reaches the provider
+QUESTIONS = [
+    "Which sports can learners play at the school?",
+    "How do admissions and the assessment work for new learners?",
+    "What clubs are there for coding and robotics?",
+    "Is there boarding or transport for learners who live far away?",
+    "What does the school focus on in mathematics and science?",
+    "How does Star College prepare learners for the maths olympiads?",
+    "Are bursaries available to help with school fees?",
+]
+
+def server_command(mode: str, port: int, workers: int) -> List[str]:
+    """Command line that starts the server in the given mode"""
+    if mode == "sync":
+        return [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+                "-w", str(workers), "-b", f"127.0.0.1:{port}", "star_college_server:app"]
+    return [sys.executable, "-m", "uvicorn", "star_college_asgi:app",
+            "--host", "127.0.0.1", "--port", str(port), "--no-access-log"]
+
+def wait_until_ready(base_url: str, timeout: float = 60.0) -> None:
+    """Poll /readyz until the server is warm"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/readyz", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"Server at {base_url} did not become ready within {timeout:.0f}s")
+
+async def run_load(base_url: str, conversations: int, turns: int) -> Dict[str, Any]:
+    """Run the conversations concurrently and summarize the results"""
+    latencies: List[float] = []
+    errors = 0
+
+    async def conversation(client: httpx.AsyncClient, index: int) -> None:
+        nonlocal errors
+        for turn in range(turns):
+            question = QUESTIONS[(index + turn) % len(QUESTIONS)]
+            start = time.monotonic()
+            try:
+                response = await client.post(f"{base_url}/ask", json={"question": question})
+                response.raise_for_status()
+                latencies.append(time.monotonic() - start)
+            except httpx.HTTPError:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=conversations, max_keepalive_connections=conversations)
+    async with httpx.AsyncClient(timeout=120.0, limits=limits) as client:
+        start = time.monotonic()
+        await asyncio.gather(*(conversation(client, index) for index in range(conversations)))
+        elapsed = time.monotonic() - start
+
+    latencies.sort()
+
+    def percentile(p: float) -> float:
+        if not latencies:
+            return 0.0
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))], 3)
+
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "seconds": round(elapsed, 2),
+        "requests_per_second": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50": percentile(50),
+        "p95": percentile(95),
+        "p99": percentile(99),
+    }
+
+def benchmark_mode(mode: str, args: argparse.Namespace, stub_url: str) -> Dict[str, Any]:
+    """Start one server mode, load it and stop it"""
+    env = dict(os.environ)
+    env.update({
+        "LLM_PROVIDER": "deepseek",
+        "DEEPSEEK_API_KEY": "stub-key",
+        "DEEPSEEK_BASE_URL": stub_url,
+        "STARBOT_WEBSITE_URL": f"{stub_url}/site/",
+        "LLM_HEALTH_CHECK_INTERVAL": "0",
+        "ASK_TIMEOUT": "120",
+        "GUNICORN_TIMEOUT": "180",
+    })
+    base_url = f"http://127.0.0.1:{args.port}"
+    process = subprocess.Popen(server_command(mode, args.port, args.workers), cwd=REPO_ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_ready(base_url)
+        result = asyncio.run(run_load(base_url, args.conversations, args.turns))
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    result["mode"] = mode
+    return result
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Compare the sync and async server modes under the same load")
+    parser.add_argument("--conversations", type=int, default=200, help="Concurrent conversations")
+    parser.add_argument("--turns", type=int, default=3, help="Questions per conversation")
+    parser.add_argument("--latency", type=float, default=1.0, help="Stub LLM latency in seconds")
+    parser.add_argument("--workers", type=int, default=4, help="Gunicorn workers in sync mode")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the server under test")
+    parser.add_argument("--modes", default="sync,async", help="Comma-separated modes to run")
+    args = parser.parse_args()
+
+    stub = start_in_thread(config=StubConfig(latency=args.latency, chunk_interval=0.0))
+    stub_url = f"http://127.0.0.1:{stub.server_port}"
+
+    for mode in args.modes.split(","):
+        print(json.dumps(benchmark_mode(mode.strip(), args, stub_url)))
+
+    stub.shutdown()
+
+if __name__ == "__main__":
+    main()
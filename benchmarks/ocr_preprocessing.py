@@ -0,0 +1,146 @@
+"""
+Compare OCR time per image with and without preprocessing
+
+Runs Tesseract on each image as it is (decoded at full size and in colour) and after
+OCRPreprocessor (single greyscale decode, draft-mode downscaling, DPI normalisation and
+optional binarisation), and prints seconds per image for both. The OCR cache is not used.
+
+Without image arguments it renders sample scans and phone photos of known text, and also
+reports the share of their words each run recognised.
+
+Usage:
+    python benchmarks/ocr_preprocessing.py path/to/scans/*.jpg --repeat 3
+    python benchmarks/ocr_preprocessing.py --samples 4 --binarize
+
+Needs Tesseract and pytesseract (see docs/image_processing.md).
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from typing import Dict, List, Optional, Any
+
+from PIL import Image, ImageDraw, ImageFont
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from starbot.utils.image_loader import extract_text
+from starbot.utils.ocr_preprocessing import OCRPreprocessor
+
+SAMPLE_TEXT = (
+    "Star College is an independent school for boys and girls. Learners take part in "
+    "mathematics olympiads, robotics and coding clubs, debating, chess and athletics. "
+    "Admissions open each year after the entrance assessment. Bursaries are available "
+    "to learners who qualify, and the school offers transport for those who live far away."
+)
+
+def font(size: int) -> ImageFont.ImageFont:
+    """Default font at the given size, where Pillow supports sizing it"""
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        return ImageFont.load_default()
+
+def render_page(size, dpi: int, text_size: int, photo: bool, seed: int) -> Image.Image:
+    """Render SAMPLE_TEXT as a scanned page, or as a phone photo of one"""
+    rng = random.Random(seed)
+    background = (rng.randint(200, 235), rng.randint(195, 230), rng.randint(180, 220)) if photo else (255, 255, 255)
+    image = Image.new("RGB", size, background)
+    draw = ImageDraw.Draw(image)
+    typeface = font(text_size)
+
+    words = SAMPLE_TEXT.split()
+    margin = size[0] // 10
+    x, y = margin, margin
+    line_height = int(text_size * 1.6)
+    for word in words:
+        width = draw.textlength(word + " ", font=typeface)
+        if x + width > size[0] - margin:
+            x, y = margin, y + line_height
+        draw.text((x, y), word, fill=(30, 30, 40), font=typeface)
+        x += width
+
+    if photo:
+        # Uneven lighting across the page
+        shade = Image.linear_gradient("L").resize(size).point(lambda level: level // 4)
+        image = Image.composite(Image.new("RGB", size, (0, 0, 0)), image, shade)
+    image.info["dpi"] = (dpi, dpi)
+    return image
+
+def make_samples(directory: str, count: int) -> List[str]:
+    """Write sample scans (PNG, 150 and 300 DPI) and phone photos (12 MP JPEG)"""
+    paths = []
+    for index in range(count):
+        kind = ("scan-150", "scan-300", "photo")[index % 3]
+        if kind == "scan-150":
+            image = render_page((1275, 1650), 150, 20, False, index)
+            path = os.path.join(directory, f"sample{index}-{kind}.png")
+            image.save(path, dpi=(150, 150))
+        elif kind == "scan-300":
+            image = render_page((2550, 3300), 300, 40, False, index)
+            path = os.path.join(directory, f"sample{index}-{kind}.png")
+            image.save(path, dpi=(300, 300))
+        else:
+            image = render_page((4032, 3024), 72, 70, True, index)
+            path = os.path.join(directory, f"sample{index}-{kind}.jpg")
+            image.save(path, quality=90, dpi=(72, 72))
+        paths.append(path)
+    return paths
+
+def recognised_share(text: str) -> float:
+    """Share of the words of SAMPLE_TEXT that appear in OCR output"""
+    expected = re.findall(r"[a-z]+", SAMPLE_TEXT.lower())
+    found = set(re.findall(r"[a-z]+", text.lower()))
+    return sum(word in found for word in expected) / len(expected)
+
+def run(paths: List[str], preprocessor: OCRPreprocessor, repeat: int, language: str, samples: bool) -> Dict[str, Any]:
+    """OCR every image repeat times and summarize"""
+    per_image = []
+    shares = []
+    for path in paths:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            text, _ = extract_text(path, language, preprocessor=preprocessor)
+            timings.append(time.perf_counter() - start)
+        per_image.append(statistics.median(timings))
+        if samples:
+            shares.append(recognised_share(text))
+    return {
+        "mean": statistics.mean(per_image),
+        "median": statistics.median(per_image),
+        "total": sum(per_image),
+        "recognised": statistics.mean(shares) if shares else None
+    }
+
+def print_result(label: str, result: Dict[str, Any]) -> None:
+    """Print one summary row"""
+    recognised = f"  words recognised {result['recognised']:.0%}" if result["recognised"] is not None else ""
+    print(f"{label:<14} mean {result['mean']:.2f}s/image  median {result['median']:.2f}s/image  total {result['total']:.1f}s{recognised}")
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Compare OCR time per image with and without preprocessing")
+    parser.add_argument("images", nargs="*", help="Images to OCR (default: rendered samples)")
+    parser.add_argument("--samples", type=int, default=6, help="Number of sample images to render when none are given")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per image; the median is used")
+    parser.add_argument("--language", default="eng", help="OCR language")
+    parser.add_argument("--binarize", action="store_true", help="Binarise after preprocessing")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = args.images or make_samples(directory, args.samples)
+        print(f"{len(paths)} images, {args.repeat} run(s) each")
+
+        before = run(paths, OCRPreprocessor(enabled=False), args.repeat, args.language, not args.images)
+        after = run(paths, OCRPreprocessor(binarize=args.binarize), args.repeat, args.language, not args.images)
+
+    print_result("as is", before)
+    print_result("preprocessed", after)
+    print(f"Speed-up: {before['mean'] / after['mean']:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+"""
+Local stand-in for the OpenAI, DeepSeek and Ollama HTTP APIs
+
+Lets the real HTTP code paths of the LLM providers and ModelConfig be benchmarked
+offline. Only the standard library is used.
+
+Endpoints:
+    GET  /v1/models              OpenAI/DeepSeek model list
+    POST /v1/chat/completions    OpenAI/DeepSeek chat completions (supports "stream")
+    POST /v1/embeddings          OpenAI embeddings
+    GET  /api/tags               Ollama model list
+    POST /api/generate           Ollama completion (streams NDJSON unless "stream": false)
+    POST /api/chat               Ollama chat (streams NDJSON unless "stream": false)
+    POST /api/embed              Ollama embeddings (batch)
+    POST /api/embeddings         Ollama embeddings (legacy, single prompt)
+    GET  /site/                  A small school website for the server's crawler
+
+Usage:
+    python benchmarks/stub_llm_server.py --port 8900 --latency 0.8 --chunk-interval 0.02
+
+Then point the providers at it, e.g. DEEPSEEK_BASE_URL=http://localhost:8900,
+OPENAI_BASE_URL=http://localhost:8900/v1 or OLLAMA_BASE_URL=http://localhost:8900.
+"""
+import json
+import time
+import math
+import random
+import struct
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, Any, List, Iterator
+
+# Page served at /site/ so STARBOT_WEBSITE_URL can point the server's crawl at the stub
+SITE_PAGE = """<!DOCTYPE html>
+<html><head><title>Star College Durban</title></head>
+<body>
+<h1>Star College Durban</h1>
+<p>Star College Durban is an independent English medium school in Westville North, Durban.
+The school offers primary and secondary education with a focus on mathematics, science and
+computer technology.</p>
+<p>Learners take part in sports such as soccer, netball, chess and athletics, and in olympiads,
+robotics and coding clubs. Admissions open each year for grades R to 12; applications are made
+online and include an assessment and an interview.</p>
+<p>School fees, bursaries, uniforms, transport and boarding are described in the admissions pack.</p>
+</body></html>
+"""
+
+class StubConfig:
+    """Behaviour of the stub server"""
+
+    def __init__(self,
+                 latency: float = 0.5,
+                 latency_jitter: float = 0.0,
+                 chunk_interval: float = 0.02,
+                 answer_words: int = 60,
+                 error_rate: float = 0.0,
+                 error_status: int = 500,
+                 embedding_dim: int = 768,
+                 seed: Optional[int] = None):
+        """
+        Initialize the configuration
+
+        Args:
+            latency: Seconds before the first byte of a completion
+            latency_jitter: Maximum extra random latency in seconds
+            chunk_interval: Seconds between streamed chunks (one word per chunk)
+            answer_words: Number of words in each generated answer
+            error_rate: Fraction of requests answered with error_status
+            error_status: HTTP status used for injected errors (e.g. 429 or 503)
+            embedding_dim: Dimension of the fake embeddings
+            seed: Seed for latency jitter and error injection
+        """
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.chunk_interval = chunk_interval
+        self.answer_words = answer_words
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.embedding_dim = embedding_dim
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.seen_prefixes = set()
+        self.requests = 0
+        self.errors = 0
+
+    def sample_latency(self) -> float:
+        """Latency before the first byte of a completion"""
+        with self.lock:
+            return self.latency + self.random.uniform(0, self.latency_jitter)
+
+    def should_fail(self) -> bool:
+        """Decide whether to inject an error into this request"""
+        with self.lock:
+            self.requests += 1
+            fail = self.random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+            return fail
+
+    def cached_prefix_tokens(self, prefix: str) -> int:
+        """Simulate upstream prompt caching of a stable prompt prefix"""
+        key = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+        with self.lock:
+            seen = key in self.seen_prefixes
+            self.seen_prefixes.add(key)
+        return estimate_tokens(prefix) if seen else 0
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)"""
+    return max(1, len(text) // 4)
+
+def fake_embedding(text: str, dim: int) -> List[float]:
+    """
+    Deterministic unit-length embedding derived from a hash of the text
+
+    Args:
+        text: Text to embed
+        dim: Embedding dimension
+
+    Returns:
+        List of floats; identical texts always get identical vectors
+    """
+    values = []
+    counter = 0
+    while len(values) < dim:
+        digest = hashlib.sha256(f"{counter}:{text}".encode("utf-8")).digest()
+        for (value,) in struct.iter_unpack(">I", digest):
+            values.append(value / 2147483647.5 - 1.0)
+        counter += 1
+    values = values[:dim]
+    norm = math.sqrt(sum(v * v for v in values)) or 1.0
+    return [v / norm for v in values]
+
+def fake_answer(prompt: str, words: int) -> List[str]:
+    """Generate the words of a deterministic answer for a prompt"""
+    seed_words = (prompt.split()[-8:] or ["StarBot"])
+    filler = "Star College Durban offers a strong academic programme in mathematics science and technology".split()
+    answer = ["Stub", "answer", "about"] + seed_words
+    while len(answer) < words:
+        answer.append(filler[len(answer) % len(filler)])
+    return answer[:words]
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Request handler implementing the stubbed endpoints"""
+
+    protocol_version = "HTTP/1.1"
+    config: StubConfig = StubConfig()
+
+    def log_message(self, format: str, *args) -> None:
+        # Keep benchmark output clean
+        pass
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        return json.loads(body) if body else {}
+
+    def _send_json(self, payload: Any, status: int = 200) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, chunks: Iterator[bytes], content_type: str) -> None:
+        """Send a chunked response, keeping the connection reusable"""
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in chunks:
+            self.wfile.write(f"{len(chunk):X}\r\n".encode("ascii") + chunk + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _inject_error(self) -> bool:
+        if not self.config.should_fail():
+            return False
+        status = self.config.error_status
+        if status == 429:
+            body = json.dumps({"error": {"message": "Rate limit reached", "type": "rate_limit_error"}}).encode("utf-8")
+            self.send_response(429)
+            self.send_header("Retry-After", "1")
+        else:
+            body = json.dumps({"error": {"message": "Injected upstream error", "type": "server_error"}}).encode("utf-8")
+            self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return True
+
+    def do_GET(self) -> None:
+        if self.path.rstrip("/") in ("/v1/models", "/models"):
+            self._send_json({"object": "list", "data": [{"id": "stub-chat", "object": "model", "owned_by": "stub"}]})
+        elif self.path.rstrip("/") == "/api/tags":
+            self._send_json({"models": [{"name": "stub-chat", "model": "stub-chat"}]})
+        elif self.path.rstrip("/") == "/site":
+            body = SITE_PAGE.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json({"error": f"Unknown path {self.path}"}, 404)
+
+    def do_POST(self) -> None:
+        path = self.path.rstrip("/")
+        try:
+            request = self._read_json()
+        except ValueError:
+            self._send_json({"error": "Invalid JSON"}, 400)
+            return
+
+        if path in ("/v1/embeddings", "/embeddings"):
+            self._openai_embeddings(request)
+        elif path == "/api/embed":
+            inputs = request.get("input", [])
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            self._send_json({
+                "model": request.get("model"),
+                "embeddings": [fake_embedding(text, self.config.embedding_dim) for text in inputs]
+            })
+        elif path == "/api/embeddings":
+            self._send_json({"embedding": fake_embedding(request.get("prompt", ""), self.config.embedding_dim)})
+        elif self._inject_error():
+            return
+        elif path in ("/v1/chat/completions", "/chat/completions"):
+            self._chat_completions(request)
+        elif path == "/api/generate":
+            self._ollama_generate(request, request.get("prompt", ""), chat=False)
+        elif path == "/api/chat":
+            messages = request.get("messages", [])
+            self._ollama_generate(request, messages[-1].get("content", "") if messages else "", chat=True)
+        else:
+            self._send_json({"error": f"Unknown path {self.path}"}, 404)
+
+    def _openai_embeddings(self, request: Dict[str, Any]) -> None:
+        inputs = request.get("input", [])
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        self._send_json({
+            "object": "list",
+            "model": request.get("model"),
+            "data": [
+                {"object": "embedding", "index": index, "embedding": fake_embedding(text, self.config.embedding_dim)}
+                for index, text in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": sum(estimate_tokens(t) for t in inputs), "total_tokens": sum(estimate_tokens(t) for t in inputs)}
+        })
+
+    def _chat_completions(self, request: Dict[str, Any]) -> None:
+        messages = request.get("messages", [])
+        prompt = "\n".join(str(message.get("content", "")) for message in messages)
+        system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+        words = fake_answer(prompt, min(self.config.answer_words, request.get("max_tokens") or self.config.answer_words))
+        prompt_tokens = estimate_tokens(prompt)
+        cached = self.config.cached_prefix_tokens(system) if system else 0
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(words),
+            "total_tokens": prompt_tokens + len(words),
+            "prompt_tokens_details": {"cached_tokens": cached},
+            "prompt_cache_hit_tokens": cached,
+            "prompt_cache_miss_tokens": prompt_tokens - cached,
+        }
+        model = request.get("model", "stub-chat")
+        created = int(time.time())
+
+        time.sleep(self.config.sample_latency())
+
+        if not request.get("stream"):
+            self._send_json({
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)}, "finish_reason": "stop"}],
+                "usage": usage
+            })
+            return
+
+        def events() -> Iterator[bytes]:
+            for index, word in enumerate(words):
+                if index:
+                    time.sleep(self.config.chunk_interval)
+                chunk = {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": word if index == 0 else " " + word}, "finish_reason": None}]
+                }
+                yield f"data: {json.dumps(chunk)}\n\n".encode("utf-8")
+            final = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                "usage": usage
+            }
+            yield f"data: {json.dumps(final)}\n\n".encode("utf-8")
+            yield b"data: [DONE]\n\n"
+
+        self._send_stream(events(), "text/event-stream")
+
+    def _ollama_generate(self, request: Dict[str, Any], prompt: str, chat: bool) -> None:
+        words = fake_answer(prompt, self.config.answer_words)
+        model = request.get("model", "stub-chat")
+        started = time.monotonic()
+
+        time.sleep(self.config.sample_latency())
+
+        def message(text: str, done: bool) -> Dict[str, Any]:
+            payload: Dict[str, Any] = {"model": model, "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ"), "done": done}
+            if chat:
+                payload["message"] = {"role": "assistant", "content": text}
+            else:
+                payload["response"] = text
+            if done:
+                payload.update({
+                    "done_reason": "stop",
+                    "total_duration": int((time.monotonic() - started) * 1e9),
+                    "prompt_eval_count": estimate_tokens(prompt),
+                    "eval_count": len(words),
+                })
+            return payload
+
+        if request.get("stream") is False:
+            self._send_json(message(" ".join(words), True))
+            return
+
+        def lines() -> Iterator[bytes]:
+            for index, word in enumerate(words):
+                if index:
+                    time.sleep(self.config.chunk_interval)
+                yield (json.dumps(message(word if index == 0 else " " + word, False)) + "\n").encode("utf-8")
+            yield (json.dumps(message("", True)) + "\n").encode("utf-8")
+
+        self._send_stream(lines(), "application/x-ndjson")
+
+def create_server(host: str = "127.0.0.1", port: int = 8900, config: Optional[StubConfig] = None) -> ThreadingHTTPServer:
+    """
+    Create a stub server (call serve_forever() to run it)
+
+    Args:
+        host: Interface to bind
+        port: Port to bind, 0 for any free port
+        config: Stub behaviour
+
+    Returns:
+        The HTTP server
+    """
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"config": config or StubConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+def start_in_thread(port: int = 0, config: Optional[StubConfig] = None) -> ThreadingHTTPServer:
+    """
+    Start a stub server in a background thread, e.g. from a benchmark
+
+    Args:
+        port: Port to bind, 0 for any free port
+        config: Stub behaviour
+
+    Returns:
+        The running server; its base URL is http://127.0.0.1:<server.server_port>
+    """
+    server = create_server(port=port, config=config)
+    thread = threading.Thread(target=server.serve_forever, name="stub-llm-server", daemon=True)
+    thread.start()
+    return server
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Local stub for the OpenAI, DeepSeek and Ollama APIs")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=8900, help="Port to bind")
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds before the first byte of a completion")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="Maximum extra random latency in seconds")
+    parser.add_argument("--chunk-interval", type=float, default=0.02, help="Seconds between streamed chunks")
+    parser.add_argument("--answer-words", type=int, default=60, help="Words per generated answer")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of completions that fail")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of injected errors (e.g. 429, 503)")
+    parser.add_argument("--embedding-dim", type=int, default=768, help="Dimension of fake embeddings")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for jitter and error injection")
+    args = parser.parse_args()
+
+    config = StubConfig(
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        chunk_interval=args.chunk_interval,
+        answer_words=args.answer_words,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        embedding_dim=args.embedding_dim,
+        seed=args.seed
+    )
+    server = create_server(args.host, args.port, config)
+    print(f"Stub LLM server listening on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,9 @@
 pip install --upgrade pip
 pip install -r requirements-server.txt
 
+# Build fingerprinted, precompressed static assets
+python build_static.py
+
 # Verify gunicorn is installed
 which gunicorn || pip install gunicorn
 
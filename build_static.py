@@ -0,0 +1,217 @@
+"""
+Build fingerprinted, precompressed static assets for Star College Chatbot
+
+Copies every asset under static/ to static/dist/ with a content hash in its name, writes
+gzip (and brotli, if the brotli package is installed) variants of compressible files,
+writes responsive WebP/AVIF variants of the images and the image database's placeholder
+sidecar (if Pillow is installed), and writes the top-level HTML pages to static/dist/ with their asset references rewritten to the
+hashed names. The mapping is saved to static/dist/manifest.json for static_assets.py.
+
+Usage:
+    python build_static.py
+"""
+import os
+import re
+import gzip
+import json
+import shutil
+import argparse
+import logging
+import tempfile
+from typing import Any, Dict, Iterable, List
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent add_images calls are not serialized
+    fcntl = None
+
+from image_placeholders import compile_image_database
+from image_variants import build_image_variants
+from static_assets import (
+    STATIC_DIR, DIST_DIRNAME, MANIFEST_NAME, COMPRESSIBLE_EXTENSIONS, brotli, content_hash
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# References to static files in pages, e.g. src="/static/images/starBot.png"
+STATIC_REFERENCE = re.compile(r"/static/([A-Za-z0-9_./-]+)")
+
+# Held in static/dist/ while images are added, as every server worker may add them
+LOCK_NAME = ".build.lock"
+
+def write_file(path: str, data: bytes) -> None:
+    """
+    Write a file under static/dist/ unless it exists
+
+    Output names carry a content hash, so an existing file already has the right content.
+    Files are written whole and renamed into place, as they may be served while another
+    process adds to the build.
+    """
+    if os.path.exists(path):
+        return
+    descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as f:
+            f.write(data)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+
+def write_compressed_variants(path: str, data: bytes) -> None:
+    """Write .gz and .br variants of a compressible file next to it"""
+    if os.path.splitext(path)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+        return
+
+    if not os.path.exists(path + ".gz"):
+        write_file(path + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None and not os.path.exists(path + ".br"):
+        write_file(path + ".br", brotli.compress(data, quality=11))
+
+def write_asset(static_dir: str, dist_dir: str, relative_path: str) -> str:
+    """Copy an asset to dist_dir under its hashed name, with compressed variants; returns the hashed path"""
+    with open(os.path.join(static_dir, relative_path), "rb") as f:
+        data = f.read()
+    stem, extension = os.path.splitext(relative_path)
+    hashed_path = f"{stem}.{content_hash(data)[:10]}{extension}"
+
+    output_path = os.path.join(dist_dir, hashed_path)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    write_file(output_path, data)
+    write_compressed_variants(output_path, data)
+    return hashed_path
+
+def find_sources(static_dir: str) -> tuple:
+    """Find the pages (top-level HTML files) and the assets (everything else) under static/"""
+    pages: List[str] = []
+    assets: List[str] = []
+    for root, dirs, files in os.walk(static_dir):
+        relative_root = os.path.relpath(root, static_dir)
+        if relative_root == ".":
+            # Never fingerprint a previous build
+            dirs[:] = [d for d in dirs if d != DIST_DIRNAME]
+        for name in sorted(files):
+            relative_path = name if relative_root == "." else f"{relative_root}/{name}".replace(os.sep, "/")
+            if relative_root == "." and name.endswith(".html"):
+                pages.append(relative_path)
+            else:
+                assets.append(relative_path)
+    return sorted(pages), sorted(assets)
+
+def build(static_dir: str = STATIC_DIR) -> Dict[str, object]:
+    """
+    Build static/dist/
+
+    Args:
+        static_dir: Static directory to build from
+
+    Returns:
+        The manifest that was written
+    """
+    dist_dir = os.path.join(static_dir, DIST_DIRNAME)
+    if os.path.isdir(dist_dir):
+        shutil.rmtree(dist_dir)
+    os.makedirs(dist_dir)
+
+    # Compiled first, so the sidecar is built along with the database it describes
+    database_path = os.path.join(static_dir, "images", "database.json")
+    if os.path.exists(database_path):
+        compile_image_database(database_path)
+
+    pages, sources = find_sources(static_dir)
+
+    assets: Dict[str, str] = {}
+    for relative_path in sources:
+        assets[relative_path] = write_asset(static_dir, dist_dir, relative_path)
+
+    def rewrite(match: re.Match) -> str:
+        hashed_path = assets.get(match.group(1))
+        return f"/static/{DIST_DIRNAME}/{hashed_path}" if hashed_path else match.group(0)
+
+    for page in pages:
+        with open(os.path.join(static_dir, page), "r", encoding="utf-8") as f:
+            html = STATIC_REFERENCE.sub(rewrite, f.read())
+        output_path = os.path.join(dist_dir, page)
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(html)
+        write_compressed_variants(output_path, html.encode("utf-8"))
+
+    images = build_image_variants(dist_dir, assets)
+
+    manifest = {"assets": assets, "pages": pages, "images": images}
+    with open(os.path.join(dist_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    logger.info(f"Built {len(assets)} assets and {len(pages)} pages into {dist_dir}"
+                + ("" if brotli is not None else " (brotli not installed, gzip variants only)"))
+    return manifest
+
+def add_images(names: Iterable[str], static_dir: str = STATIC_DIR) -> Dict[str, Dict[str, Any]]:
+    """
+    Add images to an existing build without rebuilding it
+
+    Each image not in the manifest yet is fingerprinted and given its responsive variants,
+    and the manifest is rewritten with them. Nothing is done if there is no build.
+
+    Args:
+        names: Image paths relative to static/images/, e.g. "science.jpg"
+        static_dir: Static directory the build was made from
+
+    Returns:
+        The added images' source paths mapped to their size and variants
+    """
+    dist_dir = os.path.join(static_dir, DIST_DIRNAME)
+    manifest_path = os.path.join(dist_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {}
+
+    # One process at a time, so none writes back a manifest without another's images
+    with open(os.path.join(dist_dir, LOCK_NAME), "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            return _add_images(names, static_dir, dist_dir, manifest_path)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+def _add_images(names: Iterable[str], static_dir: str, dist_dir: str, manifest_path: str) -> Dict[str, Dict[str, Any]]:
+    """add_images, with the build lock held"""
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    assets = manifest.setdefault("assets", {})
+
+    added: Dict[str, str] = {}
+    for name in names:
+        relative_path = f"images/{name}"
+        if relative_path in assets or not os.path.isfile(os.path.join(static_dir, relative_path)):
+            continue
+        added[relative_path] = write_asset(static_dir, dist_dir, relative_path)
+    if not added:
+        return {}
+
+    images = build_image_variants(dist_dir, added)
+    assets.update(added)
+    manifest.setdefault("images", {}).update(images)
+
+    # Written whole and renamed into place, as server workers may be reading it
+    descriptor, temporary_path = tempfile.mkstemp(dir=dist_dir, suffix=".tmp")
+    with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(temporary_path, manifest_path)
+
+    logger.info(f"Added {len(added)} images to {manifest_path}")
+    return images
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Build fingerprinted, precompressed static assets")
+    parser.add_argument("--static-dir", default=STATIC_DIR, help="Static directory to build from")
+    args = parser.parse_args()
+
+    build(args.static_dir)
+
+if __name__ == "__main__":
+    main()
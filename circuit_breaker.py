@@ -0,0 +1,185 @@
+"""
+Circuit breakers around upstream LLM calls
+
+A breaker starts closed. After enough consecutive failures it opens and calls fail
+immediately with CircuitOpenError instead of waiting on a dead upstream. Once the recovery
+timeout has passed it goes half-open and lets a few trial calls through; a success closes
+it again and a failure re-opens it.
+"""
+import os
+import time
+import threading
+import logging
+from typing import Dict, Any, Optional
+
+from metrics import metrics
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Numeric encoding of the states for the metrics gauges
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an upstream whose circuit breaker is open"""
+
+class CircuitBreaker:
+    """Closed/open/half-open circuit breaker for one provider"""
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0, half_open_max_calls: int = 1):
+        """
+        Initialize the circuit breaker
+
+        Args:
+            name: Provider name, used in logs and metrics
+            failure_threshold: Consecutive failures that open the circuit
+            recovery_timeout: Seconds the circuit stays open before trial calls are allowed
+            half_open_max_calls: Number of trial calls allowed at once while half-open
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        # Bumped on every state change, so trial slots from an earlier half-open spell are not given back twice
+        self._generation = 0
+        self.times_opened = 0
+        self._publish()
+
+    @property
+    def state(self) -> str:
+        """Current state, moving from open to half-open once the recovery timeout has passed"""
+        with self._lock:
+            self._check_recovery()
+            return self._state
+
+    def _check_recovery(self) -> None:
+        """Go half-open if the recovery timeout has passed (caller holds the lock)"""
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._transition(HALF_OPEN)
+
+    def _transition(self, state: str) -> None:
+        """Change state (caller holds the lock)"""
+        if state == self._state:
+            return
+
+        logger.info(f"Circuit breaker for {self.name} is now {state}")
+        self._state = state
+        self._half_open_calls = 0
+        self._generation += 1
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            self.times_opened += 1
+        self._publish()
+
+    def _publish(self) -> None:
+        metrics.set_gauge(f"circuit_breaker.{self.name}.state", STATE_VALUES[self._state])
+
+    def before_call(self) -> Optional[int]:
+        """
+        Check whether a call may go ahead
+
+        Every call that gets through must end with record_success, record_failure or
+        release, passing release the token returned here.
+
+        Returns:
+            A token for the half-open trial slot the call holds, or None if it holds none
+
+        Raises:
+            CircuitOpenError: If the circuit is open or the half-open trial slots are taken
+        """
+        with self._lock:
+            self._check_recovery()
+
+            if self._state == OPEN:
+                metrics.increment(f"circuit_breaker.{self.name}.rejected")
+                raise CircuitOpenError(f"Circuit breaker for {self.name} is open")
+
+            if self._state == HALF_OPEN:
+                if self._half_open_calls >= self.half_open_max_calls:
+                    metrics.increment(f"circuit_breaker.{self.name}.rejected")
+                    raise CircuitOpenError(f"Circuit breaker for {self.name} is half-open and busy")
+                self._half_open_calls += 1
+                return self._generation
+            return None
+
+    def release(self, token: Optional[int]) -> None:
+        """
+        Give back a half-open trial slot after a call that neither succeeded nor failed upstream
+
+        Safe to call after record_success or record_failure: the state change they cause
+        already freed the slot, and the stale token is ignored.
+
+        Args:
+            token: Token returned by before_call
+        """
+        with self._lock:
+            if token is not None and token == self._generation and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+    def record_success(self) -> None:
+        """Record a successful call"""
+        with self._lock:
+            self._consecutive_failures = 0
+            self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        """Record a failed call"""
+        with self._lock:
+            self._consecutive_failures += 1
+            if self._state == HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                self._transition(OPEN)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get the breaker state as a dictionary"""
+        with self._lock:
+            self._check_recovery()
+            return {
+                "state": self._state,
+                "consecutive_failures": self._consecutive_failures,
+                "times_opened": self.times_opened,
+            }
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def get_circuit_breaker(provider_name: str) -> CircuitBreaker:
+    """
+    Get the process-wide circuit breaker for a provider
+
+    Thresholds are read from LLM_BREAKER_FAILURES and LLM_BREAKER_RECOVERY_SECONDS.
+
+    Args:
+        provider_name: Provider name
+
+    Returns:
+        The shared circuit breaker
+    """
+    with _breakers_lock:
+        breaker = _breakers.get(provider_name)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                provider_name,
+                failure_threshold=int(os.environ.get("LLM_BREAKER_FAILURES", "5")),
+                recovery_timeout=float(os.environ.get("LLM_BREAKER_RECOVERY_SECONDS", "30"))
+            )
+            _breakers[provider_name] = breaker
+        return breaker
+
+def circuit_breaker_snapshot() -> Dict[str, Any]:
+    """Get the state of every circuit breaker"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
+
+metrics.register_collector("circuit_breakers", circuit_breaker_snapshot)
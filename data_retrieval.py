@@ -2,8 +2,12 @@
 Data retrieval system for Star College Chatbot
 """
 import os
+import time
+import asyncio
 import logging
+import threading
 import requests
+from collections import Counter
 from typing import List, Optional
 from bs4 import BeautifulSoup
 import re
@@ -17,10 +21,13 @@ class WebScraper:
     
     def __init__(self):
         self.visited_urls = set()
+        # Whether the last scrape was cut short by its timeout
+        self.stopped_early = False
     
-    def scrape_website(self, base_url: str, max_pages: int = 10) -> List[str]:
-        """Scrape a website and return the text content"""
+    def scrape_website(self, base_url: str, max_pages: int = 10, timeout: Optional[float] = None) -> List[str]:
+        """Scrape a website and return the text content, stopping early once timeout seconds have passed"""
         logger.info(f"Scraping website: {base_url}")
+        deadline = None if timeout is None else time.monotonic() + timeout
         
         # Normalize base URL
         if not base_url.endswith('/'):
@@ -29,9 +36,17 @@ class WebScraper:
         # Start with the base URL
         urls_to_visit = [base_url]
         scraped_texts = []
+        self.stopped_early = False
         
         # Process URLs until we reach the limit or run out of URLs
         while urls_to_visit and len(self.visited_urls) < max_pages:
+            # Keep what has been scraped so far once the time is up
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                logger.warning(f"Stopped scraping {base_url} after {timeout:.1f}s")
+                self.stopped_early = True
+                break
+
             # Get the next URL
             url = urls_to_visit.pop(0)
             
@@ -44,7 +59,7 @@ class WebScraper:
             
             try:
                 # Fetch the page
-                response = requests.get(url, timeout=10)
+                response = requests.get(url, timeout=10 if remaining is None else min(10, remaining))
                 response.raise_for_status()
                 
                 # Parse the HTML
@@ -116,62 +131,131 @@ class WebScraper:
         
         return links
 
+DEFAULT_URL = "https://starcollegedurban.co.za/"
+
+# Seconds between background attempts to build the index while the site is unreachable
+CRAWL_RETRY_SECONDS = 60.0
+
 class DataRetriever:
     """Data retriever for Star College Chatbot"""
     
     def __init__(self):
         self.scraper = WebScraper()
         self.documents = []
+        self.term_counts = []
+        self._index = []
         self.initialized = False
+        self.url = DEFAULT_URL
+        self._crawl: Optional[threading.Thread] = None
+        self._crawl_started = 0.0
+        self._crawl_lock = threading.Lock()
     
-    def initialize(self, url: str = "https://starcollegedurban.co.za/") -> bool:
-        """Initialize the data retriever"""
+    def initialize(self, url: str = DEFAULT_URL, timeout: Optional[float] = None) -> bool:
+        """
+        Initialize the data retriever, scraping for at most timeout seconds
+
+        A scrape cut short by the timeout still makes its pages searchable, but leaves the
+        retriever uninitialized so the index is rebuilt in full later.
+
+        Returns:
+            True if the whole site was indexed
+        """
+        self.url = url
         try:
-            # Scrape the website
-            texts = self.scraper.scrape_website(url)
+            # Scrape the website afresh, so pages from an earlier scrape are visited again
+            self.scraper = WebScraper()
+            texts = self.scraper.scrape_website(url, timeout=timeout)
             
-            # Store the documents
+            # Store the documents and count their terms once, up front, publishing both
+            # together so a concurrent search never pairs documents with another scrape's counts
+            term_counts = [Counter(self._tokenize(doc)) for doc in texts]
+            self._index = list(zip(texts, term_counts))
             self.documents = texts
+            self.term_counts = term_counts
             
-            # Mark as initialized
-            self.initialized = True
+            # Only a complete scrape counts as initialized
+            self.initialized = not self.scraper.stopped_early
             
-            logger.info(f"Data retriever initialized with {len(self.documents)} documents")
-            return True
+            if self.initialized:
+                logger.info(f"Data retriever initialized with {len(self.documents)} documents")
+            else:
+                logger.warning(f"Data retriever has a partial index of {len(self.documents)} documents")
+            return self.initialized
             
         except Exception as e:
             logger.error(f"Error initializing data retriever: {e}")
             return False
+
+    def start_initialize(self) -> Optional[threading.Thread]:
+        """
+        Build the index in a background thread, unless that is already happening or the
+        last attempt was less than CRAWL_RETRY_SECONDS ago
+
+        Returns:
+            The thread building the index, or None if no attempt is under way
+        """
+        with self._crawl_lock:
+            if self._crawl is not None and self._crawl.is_alive():
+                return self._crawl
+            if self._crawl is not None and time.monotonic() - self._crawl_started < CRAWL_RETRY_SECONDS:
+                return None
+            self._crawl = threading.Thread(target=self.initialize, args=(self.url,), name="data-retriever-crawl", daemon=True)
+            self._crawl_started = time.monotonic()
+            self._crawl.start()
+            return self._crawl
     
-    def search(self, query: str, num_results: int = 3) -> List[str]:
+    def search(self, query: str, num_results: int = 3, timeout: Optional[float] = None) -> List[str]:
         """Search for documents relevant to a query"""
+        return self.search_many([query], num_results, timeout=timeout)[0]
+    
+    async def asearch(self, query: str, num_results: int = 3, timeout: Optional[float] = None) -> List[str]:
+        """Search from a coroutine; only waiting for the index is moved off the event loop"""
+        if self.initialized:
+            return self.search(query, num_results)
+        return await asyncio.to_thread(self.search, query, num_results, timeout)
+    
+    def search_many(self, queries: List[str], num_results: int = 3, timeout: Optional[float] = None) -> List[List[str]]:
+        """
+        Search for documents relevant to each of several queries
+
+        Searching itself is in-memory. If the index has not been built yet (warm-up failed
+        or has not finished), a full scrape is started in the background, without any
+        caller's deadline, and the search waits at most timeout seconds for it. Without an
+        index there is no context: an empty list per query, which is not a retrieval miss.
+        """
         if not self.initialized:
-            success = self.initialize()
-            if not success:
-                return ["No data available."]
+            crawl = self.start_initialize()
+            if crawl is not None and (timeout is None or timeout > 0):
+                crawl.join(timeout)
+        index = self._index
+        if not index:
+            return [[] for _ in queries]
         
-        # Simple keyword search for now
-        results = []
-        query_terms = self._tokenize(query.lower())
-        
-        # Score each document
-        scored_docs = []
-        for doc in self.documents:
-            score = self._score_document(doc, query_terms)
-            if score > 0:
-                scored_docs.append((doc, score))
-        
-        # Sort by score
-        scored_docs.sort(key=lambda x: x[1], reverse=True)
-        
-        # Return top results
-        results = [doc for doc, _ in scored_docs[:num_results]]
-        
-        # If no results, return a default message
-        if not results:
-            results = ["No relevant information found."]
+        all_results = []
+        for query in queries:
+            # Simple keyword search for now
+            query_terms = self._tokenize(query.lower())
+            
+            # Score each document
+            scored_docs = []
+            for doc, term_counts in index:
+                score = self._score_document(term_counts, query_terms)
+                if score > 0:
+                    scored_docs.append((doc, score))
+            
+            # Sort by score
+            scored_docs.sort(key=lambda x: x[1], reverse=True)
+            
+            # Return top results
+            results = [doc for doc, _ in scored_docs[:num_results]]
+            
+            # If no results, return a default message
+            if not results:
+                results = ["No relevant information found."]
+            
+            all_results.append(results)
         
-        return results
+        return all_results
     
     def _tokenize(self, text: str) -> List[str]:
         """Tokenize text into words"""
@@ -179,13 +263,11 @@ class DataRetriever:
         words = re.findall(r'\b\w+\b', text.lower())
         return words
     
-    def _score_document(self, document: str, query_terms: List[str]) -> float:
+    def _score_document(self, term_counts: Counter, query_terms: List[str]) -> float:
         """Score a document based on query terms"""
         # Simple TF scoring
-        doc_terms = self._tokenize(document.lower())
-        
         score = 0
         for term in query_terms:
-            score += doc_terms.count(term)
+            score += term_counts[term]
         
         return score
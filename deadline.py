@@ -0,0 +1,64 @@
+"""
+Per-request time budgets for Star College Chatbot
+"""
+import time
+from typing import Optional
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request's time budget runs out before a stage completes"""
+
+class Deadline:
+    """A fixed point in time by which a request must be answered"""
+
+    def __init__(self, budget: float):
+        """
+        Initialize the deadline
+
+        Args:
+            budget: Seconds from now until the deadline
+        """
+        self.budget = budget
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + budget
+
+    def remaining(self) -> float:
+        """Seconds left until the deadline (never negative)"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        """Check whether the deadline has passed"""
+        return time.monotonic() >= self.expires_at
+
+    def stage_budget(self, fraction: float, reserve: float = 0.0) -> float:
+        """
+        Get the time budget for one stage of the request
+
+        Args:
+            fraction: Share of the total budget the stage may use
+            reserve: Seconds to keep back for the stages that follow
+
+        Returns:
+            Seconds the stage may take, bounded by what is actually left
+        """
+        return max(0.0, min(self.budget * fraction, self.remaining() - reserve))
+
+    def check(self, stage: Optional[str] = None) -> None:
+        """
+        Raise if the deadline has passed
+
+        Args:
+            stage: Name of the stage about to start, for the error message
+
+        Raises:
+            DeadlineExceeded: If no time is left
+        """
+        if self.expired():
+            where = f" before {stage}" if stage else ""
+            raise DeadlineExceeded(f"Request deadline of {self.budget:.1f}s exceeded{where}")
+
+def is_timeout_error(error: Exception) -> bool:
+    """Check whether an error means a call ran out of time, whichever client raised it"""
+    if isinstance(error, TimeoutError):
+        return True
+    # requests.Timeout, openai.APITimeoutError, httpx.TimeoutException and the like
+    return any("Timeout" in cls.__name__ for cls in type(error).__mro__)
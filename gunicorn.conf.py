@@ -0,0 +1,33 @@
+"""
+Gunicorn configuration for the Star College Chatbot server
+
+StarBot is warmed up before it takes traffic. By default the app is preloaded and warmed up
+once in the master, so every forked worker shares the crawled index. Set STARBOT_PRELOAD=false
+to warm up in each worker instead; /readyz reports 503 until a worker is warm.
+"""
+import os
+import threading
+
+preload_app = os.environ.get("STARBOT_PRELOAD", "true").lower() == "true"
+
+# Room for the /ask budget (ASK_TIMEOUT) on top of request parsing and image enhancement
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "30"))
+
+errorlog = "-"
+
+def when_ready(server):
+    """Warm up in the master before any worker is forked"""
+    if preload_app:
+        import star_college_server
+
+        star_college_server.warm_up(background=False)
+
+def post_worker_init(worker):
+    """Start the worker's own background threads, warming up first if the master did not"""
+    import star_college_server
+
+    if star_college_server.state is not None:
+        star_college_server.start_background_tasks()
+    else:
+        # Warm up off the main thread so the worker keeps heart-beating to the master
+        threading.Thread(target=star_college_server.warm_up, name="starbot-warm-up", daemon=True).start()
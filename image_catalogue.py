@@ -0,0 +1,386 @@
+"""
+Image catalogues for Star College Chatbot
+
+A catalogue finds the image database entries that match a query. JsonImageCatalogue holds
+database.json in memory with a compiled keyword matcher. SQLiteImageCatalogue compiles it
+into an SQLite file with an FTS5 index and queries that instead, so each worker holds a
+connection and a small result cache rather than the whole catalogue, however many entries
+there are.
+"""
+import os
+import re
+import json
+import sqlite3
+import argparse
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Any
+
+from image_placeholders import compiled_path, load_placeholders
+from keyword_matcher import KeywordMatcher
+from metrics import metrics
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Words that make a query about a place or about students
+LOCATION_INDICATORS = [
+    "where", "location", "place", "building", "campus",
+    "room", "facility", "address", "map", "direction"
+]
+STUDENT_INDICATORS = [
+    "student", "learner", "pupil", "scholar", "top", "best",
+    "achievement", "performer", "academic", "winner", "champion",
+    "olympiad", "competition", "medal", "award"
+]
+
+# Database sections and the entry type of each
+SECTIONS = (("location", "locations"), ("student", "students"))
+
+SQLITE_SUFFIX = ".sqlite"
+
+# Query words too common to say anything about which image is wanted
+STOPWORDS = {
+    "a", "about", "an", "and", "any", "are", "at", "be", "by", "can", "do", "does", "for",
+    "from", "has", "have", "how", "i", "in", "is", "it", "me", "of", "on", "or", "show",
+    "tell", "that", "the", "there", "this", "to", "was", "we", "what", "when", "which",
+    "who", "why", "with", "you", "your"
+}
+
+# Matches come back best first; nobody needs more than a handful
+MAX_RESULTS = 10
+
+# Terms in more entries than this (and than the fraction of all entries) are too common to
+# search for on their own: ranking every entry that holds one costs more than it tells
+COMMON_TERM_MIN_ENTRIES = 100
+COMMON_TERM_FRACTION = 0.02
+
+# A match as (entry type, entry, placeholder); the placeholder may be empty
+Match = Tuple[str, Dict[str, Any], Dict[str, Any]]
+
+def indicator_matcher(matcher: Optional[KeywordMatcher] = None) -> KeywordMatcher:
+    """Add the location and student indicators to a matcher, with ("indicator", entry type) targets"""
+    matcher = matcher or KeywordMatcher()
+    for indicator in LOCATION_INDICATORS:
+        matcher.add(indicator, ("indicator", "location"))
+    for indicator in STUDENT_INDICATORS:
+        matcher.add(indicator, ("indicator", "student"))
+    return matcher
+
+def load_database(database_path: str, strict: bool = False) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Load an image database JSON file
+
+    Args:
+        database_path: Path to the image database JSON file
+        strict: Raise if the file cannot be read or parsed, e.g. while it is half written,
+            instead of returning an empty database
+
+    Returns:
+        Dictionary containing the image database; empty if it is missing or unreadable
+    """
+    try:
+        if not os.path.exists(database_path):
+            logger.warning(f"Image database not found at {database_path}")
+            return {"locations": [], "students": []}
+
+        with open(database_path, 'r') as f:
+            database = json.load(f)
+
+        logger.info(f"Loaded image database with {len(database.get('locations', []))} locations and {len(database.get('students', []))} students")
+        return database
+    except Exception as e:
+        if strict:
+            raise
+        logger.error(f"Error loading image database: {str(e)}")
+        return {"locations": [], "students": []}
+
+class ImageCatalogue:
+    """Finds the image database entries that match a query"""
+
+    def search(self, query: str) -> List[Match]:
+        """
+        Find the entries that match a query
+
+        Locations are only considered for location queries and students for student queries.
+
+        Args:
+            query: User query string
+
+        Returns:
+            List of (entry type, entry, placeholder) tuples, best match first
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release anything the catalogue holds open"""
+
+class JsonImageCatalogue(ImageCatalogue):
+    """The image database held in memory, matched with one compiled keyword automaton"""
+
+    def __init__(self, database_path: str, strict: bool = False):
+        """
+        Initialize the catalogue
+
+        Args:
+            database_path: Path to the image database JSON file
+            strict: Raise if the database cannot be loaded instead of starting empty
+        """
+        self.database = load_database(database_path, strict)
+        # Dimensions, dominant colour and blurred preview of each image, from the build
+        self.placeholders = load_placeholders(database_path)
+        # Matching is one pass over the query, however many entries the database holds
+        self.matcher = self._compile_matcher()
+
+    def _compile_matcher(self) -> KeywordMatcher:
+        """
+        Compile the query indicators and every entry's name and keywords into one matcher
+
+        Returns:
+            Matcher whose targets are ("indicator", entry type) or (entry type, entry index)
+        """
+        matcher = indicator_matcher()
+
+        for entry_type, key in SECTIONS:
+            for index, entry in enumerate(self.database.get(key, [])):
+                matcher.add(entry["name"], (entry_type, index))
+                for keyword in entry.get("keywords", []):
+                    matcher.add(keyword, (entry_type, index))
+
+        logger.info(f"Compiled {len(matcher)} image keywords")
+        return matcher.compile()
+
+    def search(self, query: str) -> List[Match]:
+        ranked = self.matcher.rank(query)
+        indicated = {target[1] for target, _, _ in ranked if target[0] == "indicator"}
+
+        matches = []
+        for (entry_type, index), _, _ in ranked:
+            if entry_type == "indicator" or entry_type not in indicated:
+                continue
+            entry = self.database[dict(SECTIONS)[entry_type]][index]
+            matches.append((entry_type, entry, self.placeholders.get(entry["image"], {})))
+
+        return matches[:MAX_RESULTS]
+
+def sqlite_path(database_path: str) -> str:
+    """Path of the SQLite catalogue compiled from an image database"""
+    return os.path.splitext(database_path)[0] + SQLITE_SUFFIX
+
+def compile_sqlite_catalogue(database_path: str, catalogue_path: Optional[str] = None, strict: bool = False) -> str:
+    """
+    Compile an image database, and its placeholder sidecar if built, into an SQLite catalogue
+
+    The file is written beside its destination and renamed into place, so readers never see
+    a partial catalogue.
+
+    Args:
+        database_path: Path to the image database JSON file
+        catalogue_path: Where to write the catalogue; defaults to beside the database
+        strict: Raise if the database cannot be loaded instead of compiling it empty
+
+    Returns:
+        Path of the catalogue
+    """
+    catalogue_path = catalogue_path or sqlite_path(database_path)
+    database = load_database(database_path, strict)
+    placeholders = load_placeholders(database_path)
+
+    descriptor, temporary_path = tempfile.mkstemp(suffix=SQLITE_SUFFIX, dir=os.path.dirname(os.path.abspath(catalogue_path)))
+    os.close(descriptor)
+    try:
+        connection = sqlite3.connect(temporary_path)
+        with connection:
+            connection.executescript("""
+                CREATE TABLE entries (
+                    id INTEGER PRIMARY KEY,
+                    type TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    placeholder TEXT
+                );
+                CREATE VIRTUAL TABLE entries_fts USING fts5(
+                    name, description, achievement, keywords,
+                    content='', tokenize='unicode61'
+                );
+                CREATE TABLE common_terms (term TEXT PRIMARY KEY);
+            """)
+            # Ids follow database order, which breaks ranking ties as the JSON catalogue does
+            rows = [
+                (entry_type, entry)
+                for entry_type, key in SECTIONS
+                for entry in database.get(key, [])
+            ]
+            for entry_id, (entry_type, entry) in enumerate(rows, start=1):
+                placeholder = placeholders.get(entry["image"])
+                connection.execute(
+                    "INSERT INTO entries (id, type, data, placeholder) VALUES (?, ?, ?, ?)",
+                    (entry_id, entry_type, json.dumps(entry), json.dumps(placeholder) if placeholder else None)
+                )
+                connection.execute(
+                    "INSERT INTO entries_fts (rowid, name, description, achievement, keywords) VALUES (?, ?, ?, ?, ?)",
+                    (entry_id, entry["name"], entry.get("description", ""), entry.get("achievement", ""),
+                     " ; ".join(entry.get("keywords", [])))
+                )
+            connection.execute("INSERT INTO entries_fts (entries_fts) VALUES ('optimize')")
+
+            connection.execute("CREATE VIRTUAL TABLE temp.entries_vocab USING fts5vocab(main, 'entries_fts', 'row')")
+            connection.execute(
+                "INSERT INTO common_terms SELECT term FROM temp.entries_vocab WHERE doc > ?",
+                (max(COMMON_TERM_MIN_ENTRIES, int(len(rows) * COMMON_TERM_FRACTION)),)
+            )
+        connection.close()
+        os.replace(temporary_path, catalogue_path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+    logger.info(f"Compiled {len(rows)} image entries into {catalogue_path}")
+    return catalogue_path
+
+class SQLiteImageCatalogue(ImageCatalogue):
+    """The image database compiled into SQLite and searched through its FTS5 index"""
+
+    # bm25 weights for name, description, achievement and keywords; lower scores rank higher
+    SEARCH_SQL = """
+        SELECT e.type, e.data, e.placeholder
+        FROM entries_fts
+        JOIN entries e ON e.id = entries_fts.rowid
+        WHERE entries_fts MATCH ? AND e.type IN (?, ?)
+        ORDER BY bm25(entries_fts, 10.0, 1.0, 2.0, 5.0), e.id
+        LIMIT ?
+    """
+
+    def __init__(self, database_path: str, catalogue_path: Optional[str] = None, cache_size: int = 256, strict: bool = False):
+        """
+        Initialize the catalogue, compiling it first if it is missing or older than its sources
+
+        Args:
+            database_path: Path to the image database JSON file
+            catalogue_path: Path to the SQLite catalogue; defaults to beside the database
+            cache_size: Number of query results to keep
+            strict: Raise if the database cannot be loaded instead of compiling it empty
+        """
+        self.database_path = database_path
+        self.catalogue_path = catalogue_path or sqlite_path(database_path)
+        self.cache_size = cache_size
+        self.indicators = indicator_matcher().compile()
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[Tuple[str, Tuple[str, ...]], List[Match]]" = OrderedDict()
+
+        if self._is_stale():
+            compile_sqlite_catalogue(database_path, self.catalogue_path, strict)
+        self.common_terms = {term for term, in self._connection().execute("SELECT term FROM common_terms")}
+
+    def _is_stale(self) -> bool:
+        """Check whether the catalogue is missing or older than the database or its sidecar"""
+        if not os.path.exists(self.catalogue_path):
+            return True
+        built = os.path.getmtime(self.catalogue_path)
+        sources = [self.database_path, compiled_path(self.database_path)]
+        return any(os.path.exists(source) and os.path.getmtime(source) > built for source in sources)
+
+    def _connection(self) -> sqlite3.Connection:
+        """This thread's read-only connection; sqlite3 caches its prepared statements"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            uri = "file:" + os.path.abspath(self.catalogue_path) + "?mode=ro"
+            connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def _fts_query(self, query: str) -> str:
+        """
+        FTS5 query matching any meaningful word of a user query
+
+        Each word also matches its singular, so "students" finds "student". Common words are
+        left out unless there is nothing else to search for, in which case all must match.
+        """
+        groups = []
+        for word in dict.fromkeys(re.findall(r"\w+", query.lower())):
+            if word in STOPWORDS:
+                continue
+            forms = [word] + [word[:-len(suffix)] for suffix in ("es", "s") if word.endswith(suffix) and len(word) > len(suffix) + 2]
+            groups.append((any(form in self.common_terms for form in forms), "(" + " OR ".join(f'"{form}"' for form in forms) + ")"))
+
+        rare = [group for common, group in groups if not common]
+        if rare:
+            return " OR ".join(rare)
+        return " AND ".join(group for _, group in groups)
+
+    def search(self, query: str) -> List[Match]:
+        types = tuple(sorted({target[1] for _, _, target in self.indicators.find(query)}))
+        fts_query = self._fts_query(query)
+        if not types or not fts_query:
+            return []
+
+        key = (fts_query, types)
+        with self._lock:
+            matches = self._cache.get(key)
+            if matches is not None:
+                self._cache.move_to_end(key)
+        metrics.increment("image_catalogue.cache_hits" if matches is not None else "image_catalogue.cache_misses")
+        if matches is not None:
+            return matches
+
+        try:
+            rows = self._connection().execute(self.SEARCH_SQL, (fts_query, types[0], types[-1], MAX_RESULTS)).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Error searching image catalogue: {e}")
+            return []
+
+        matches = [(entry_type, json.loads(data), json.loads(placeholder) if placeholder else {})
+                   for entry_type, data, placeholder in rows]
+        with self._lock:
+            self._cache[key] = matches
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return matches
+
+    def close(self) -> None:
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+
+def open_catalogue(database_path: str, backend: Optional[str] = None, strict: bool = False) -> ImageCatalogue:
+    """
+    Open the catalogue for an image database
+
+    Args:
+        database_path: Path to the image database JSON file
+        backend: "json" or "sqlite"; defaults to the IMAGE_CATALOGUE_BACKEND environment
+            variable, then "json"
+        strict: Raise if the database cannot be loaded instead of opening it empty
+
+    Returns:
+        The catalogue; the JSON one if SQLite cannot be used
+    """
+    backend = (backend or os.environ.get("IMAGE_CATALOGUE_BACKEND", "json")).lower()
+    if backend == "sqlite":
+        try:
+            return SQLiteImageCatalogue(database_path, strict=strict)
+        except (sqlite3.Error, OSError) as e:
+            # Most often an SQLite built without FTS5, or a read-only deploy directory
+            logger.error(f"Error opening SQLite image catalogue, using JSON: {e}")
+    elif backend != "json":
+        logger.warning(f"Unknown image catalogue backend {backend}, using JSON")
+    return JsonImageCatalogue(database_path, strict)
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Compile the image database into an SQLite catalogue")
+    parser.add_argument("--database", default=os.path.join("static", "images", "database.json"), help="Path to the image database JSON file")
+    args = parser.parse_args()
+
+    compile_sqlite_catalogue(args.database)
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,17 @@
 Image content manager for Star College Chatbot
 """
 import os
-import json
 import logging
 import re
-from typing import Dict, List, Optional, Tuple, Any
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple, Any
+
+from build_static import add_images
+from image_catalogue import ImageCatalogue, open_catalogue
+from image_placeholders import compile_image_database, compiled_path
+from metrics import metrics
+from static_assets import asset_manifest
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -14,168 +21,197 @@ logger = logging.getLogger(__name__)
 class ImageContentManager:
     """Manager for image content and metadata"""
     
-    def __init__(self, database_path: str = "static/images/database.json"):
+    def __init__(self, database_path: str = "static/images/database.json", backend: Optional[str] = None):
         """
         Initialize the image content manager
         
         Args:
             database_path: Path to the image database JSON file
+            backend: Catalogue backend, "json" or "sqlite"; defaults to IMAGE_CATALOGUE_BACKEND
         """
         self.database_path = database_path
-        self.database = self._load_database()
+        self.backend = backend
         self.image_base_url = "/static/images/"
-    
-    def _load_database(self) -> Dict:
-        """
-        Load the image database from JSON file
         
-        Returns:
-            Dictionary containing the image database
-        """
-        try:
-            if not os.path.exists(self.database_path):
-                logger.warning(f"Image database not found at {self.database_path}")
-                return {"locations": [], "students": []}
-            
-            with open(self.database_path, 'r') as f:
-                database = json.load(f)
-            
-            logger.info(f"Loaded image database with {len(database.get('locations', []))} locations and {len(database.get('students', []))} students")
-            return database
-        except Exception as e:
-            logger.error(f"Error loading image database: {str(e)}")
-            return {"locations": [], "students": []}
-    
-    def find_matching_images(self, query: str) -> List[Dict]:
-        """
-        Find images that match the given query
+        # Requests read self.catalogue once per search; a reload swaps in a new one whole
+        self._signature = self._source_signature()
+        self._failed_signature = None
+        self.catalogue = open_catalogue(database_path, backend)
+        self.generation = 0
         
-        Args:
-            query: User query string
-            
-        Returns:
-            List of matching image entries
-        """
-        query = query.lower()
-        matches = []
-        
-        # Check for location-related queries
-        if self._is_location_query(query):
-            matches.extend(self._find_matching_locations(query))
+        # Searches in progress per catalogue, so a replaced one is closed once they finish
+        self._readers: Dict[ImageCatalogue, int] = {}
+        self._readers_lock = threading.Lock()
         
-        # Check for student-related queries
-        if self._is_student_query(query):
-            matches.extend(self._find_matching_students(query))
-        
-        return matches
+        self._reload_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._watcher_thread: Optional[threading.Thread] = None
+    
+    def _source_signature(self) -> Tuple:
+        """Identity of the database and its placeholder sidecar: inode, mtime and size of each"""
+        signature = []
+        for path in (self.database_path, compiled_path(self.database_path)):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
     
-    def _is_location_query(self, query: str) -> bool:
+    @contextmanager
+    def _reading(self) -> Iterator[ImageCatalogue]:
+        """Use the current catalogue, closing it afterwards if it was replaced meanwhile"""
+        with self._readers_lock:
+            catalogue = self.catalogue
+            self._readers[catalogue] = self._readers.get(catalogue, 0) + 1
+        try:
+            yield catalogue
+        finally:
+            with self._readers_lock:
+                self._readers[catalogue] -= 1
+                retired = self._readers[catalogue] == 0 and catalogue is not self.catalogue
+                if self._readers[catalogue] == 0:
+                    del self._readers[catalogue]
+            if retired:
+                catalogue.close()
+    
+    def _compile_new_images(self, signature: Tuple) -> Tuple:
         """
-        Check if the query is related to locations
+        Build placeholders and responsive variants for images added to a changed database
         
         Args:
-            query: User query string
+            signature: Source signature the change was detected at
             
         Returns:
-            True if the query is about locations, False otherwise
+            The source signature after the sidecar was rewritten
         """
-        location_indicators = [
-            "where", "location", "place", "building", "campus", 
-            "room", "facility", "address", "map", "direction"
-        ]
+        database, sidecar = signature
+        if database is None or (sidecar is not None and sidecar[1] >= database[1]):
+            return signature
         
-        return any(indicator in query for indicator in location_indicators)
+        images = compile_image_database(self.database_path, incremental=True)
+        served_from = os.path.join(asset_manifest.static_dir, "images")
+        if images and os.path.dirname(os.path.realpath(self.database_path)) == served_from:
+            if add_images(images, asset_manifest.static_dir):
+                asset_manifest.load()
+        return self._source_signature()
     
-    def _is_student_query(self, query: str) -> bool:
+    def reload_if_changed(self) -> bool:
         """
-        Check if the query is related to students
+        Reload the catalogue if the database or its sidecar has changed on disk
+        
+        Placeholders and responsive variants are built for photos the database now references,
+        then the new catalogue is built while requests keep using the old one and swapped in.
+        The old one is closed once the searches using it finish. A database that cannot be
+        parsed, e.g. one an editor is still writing, is skipped until it changes again.
         
-        Args:
-            query: User query string
-            
         Returns:
-            True if the query is about students, False otherwise
+            True if a new catalogue was swapped in
         """
-        student_indicators = [
-            "student", "learner", "pupil", "scholar", "top", "best", 
-            "achievement", "performer", "academic", "winner", "champion",
-            "olympiad", "competition", "medal", "award"
-        ]
+        with self._reload_lock:
+            signature = self._source_signature()
+            if signature == self._signature or signature == self._failed_signature:
+                return False
+            
+            try:
+                signature = self._compile_new_images(signature)
+                catalogue = open_catalogue(self.database_path, self.backend, strict=True)
+            except Exception as e:
+                logger.error(f"Error reloading image database, keeping generation {self.generation}: {e}")
+                self._failed_signature = signature
+                metrics.increment("image_catalogue.reload_errors")
+                return False
+            
+            with self._readers_lock:
+                previous, self.catalogue = self.catalogue, catalogue
+                retired = previous not in self._readers
+            if retired:
+                previous.close()
+            self._signature = signature
+            self._failed_signature = None
+            self.generation += 1
         
-        return any(indicator in query for indicator in student_indicators)
+        metrics.increment("image_catalogue.reloads")
+        logger.info(f"Reloaded image database, now at generation {self.generation}")
+        return True
     
-    def _find_matching_locations(self, query: str) -> List[Dict]:
+    def start_watching(self, interval: float = 5.0) -> None:
         """
-        Find locations that match the query
+        Poll the database for changes in a background thread and reload it when it changes
         
         Args:
-            query: User query string
-            
-        Returns:
-            List of matching location entries
+            interval: Seconds between polls
         """
-        matches = []
+        if self._watcher_thread and self._watcher_thread.is_alive():
+            return
         
-        for location in self.database.get("locations", []):
-            # Check if location name is in query
-            if location["name"].lower() in query:
-                matches.append(self._prepare_image_data(location, "location"))
-                continue
-            
-            # Check if any keywords match
-            if any(keyword in query for keyword in location["keywords"]):
-                matches.append(self._prepare_image_data(location, "location"))
+        self._stop_event.clear()
+        
+        def run():
+            while not self._stop_event.wait(interval):
+                self.reload_if_changed()
         
-        return matches
+        self._watcher_thread = threading.Thread(target=run, name="image-database-watcher", daemon=True)
+        self._watcher_thread.start()
+        logger.info(f"Watching {self.database_path} for changes every {interval:.0f}s")
+    
+    def stop_watching(self) -> None:
+        """Stop polling the database for changes"""
+        self._stop_event.set()
     
-    def _find_matching_students(self, query: str) -> List[Dict]:
+    def find_matching_images(self, query: str) -> List[Dict]:
         """
-        Find students that match the query
+        Find images that match the given query
+        
+        Locations are only considered for location queries and students for student queries.
         
         Args:
             query: User query string
             
         Returns:
-            List of matching student entries
+            List of matching image entries, best match first
         """
-        matches = []
-        
-        for student in self.database.get("students", []):
-            # Check if student name is in query
-            if student["name"].lower() in query:
-                matches.append(self._prepare_image_data(student, "student"))
-                continue
-            
-            # Check if any keywords match
-            if any(keyword in query for keyword in student["keywords"]):
-                matches.append(self._prepare_image_data(student, "student"))
-        
-        return matches
+        with self._reading() as catalogue:
+            matches = catalogue.search(query)
+        return [
+            self._prepare_image_data(entry, entry_type, placeholder)
+            for entry_type, entry, placeholder in matches
+        ]
     
-    def _prepare_image_data(self, entry: Dict, entry_type: str) -> Dict:
+    def _prepare_image_data(self, entry: Dict, entry_type: str, placeholder: Optional[Dict] = None) -> Dict:
         """
         Prepare image data for response
         
         Args:
             entry: Database entry
             entry_type: Type of entry (location or student)
+            placeholder: Dimensions, dominant colour and blurred preview of the image, if compiled
             
         Returns:
             Dictionary with prepared image data
         """
-        image_url = self.image_base_url + entry["image"]
+        # Fingerprinted URL and responsive variants, when build_static.py has been run
+        image = asset_manifest.responsive_image(self.image_base_url[len("/static/"):] + entry["image"])
         
         if entry_type == "location":
             caption = f"{entry['name']} - {entry['description']}"
         else:  # student
             caption = f"{entry['name']} ({entry['grade']}) - {entry['achievement']}"
         
+        placeholder = placeholder or {}
+        
         return {
             "type": entry_type,
             "name": entry["name"],
             "description": entry.get("description", entry.get("achievement", "")),
-            "image_url": image_url,
-            "caption": caption
+            "image_url": image["url"],
+            "caption": caption,
+            "width": image.get("width", placeholder.get("width")),
+            "height": image.get("height", placeholder.get("height")),
+            "color": placeholder.get("color"),
+            "placeholder": placeholder.get("placeholder"),
+            "sizes": image.get("sizes"),
+            "sources": image.get("sources", [])
         }
     
     def enhance_response_with_images(self, question: str, answer: str) -> Dict:
@@ -201,7 +237,9 @@ class ImageContentManager:
         # Get the most relevant image (first match)
         image_data = matching_images[0]
         
-        # Create enhanced response
+        # Create enhanced response; width and height let the client reserve the image's space,
+        # color and placeholder fill it until the image loads, and sizes and sources pick the
+        # smallest variant that fills it
         enhanced_response = {
             "text": answer,
             "has_images": True,
@@ -209,7 +247,13 @@ class ImageContentManager:
                 {
                     "url": image_data["image_url"],
                     "caption": image_data["caption"],
-                    "type": image_data["type"]
+                    "type": image_data["type"],
+                    "width": image_data["width"],
+                    "height": image_data["height"],
+                    "color": image_data["color"],
+                    "placeholder": image_data["placeholder"],
+                    "sizes": image_data["sizes"],
+                    "sources": image_data["sources"]
                 }
             ]
         }
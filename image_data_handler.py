@@ -4,7 +4,6 @@ Image data handler for Star College Chatbot
 import os
 import logging
 from typing import List, Optional
-import glob
 from starbot.data.ingestion import DataIngestion
 from starbot.utils.image_loader import ImageLoader, DirectoryImageLoader
 
@@ -75,7 +74,7 @@ class ImageDataHandler:
             documents = self.data_ingestion.ingest_image_directory(directory_path, language=language)
             
             # Add all processed images to the set
-            image_files = glob.glob(os.path.join(directory_path, "**/*.{jpg,jpeg,png,gif,bmp,tiff}"), recursive=True)
+            image_files = DirectoryImageLoader(directory_path).find_images()
             self.processed_images.update(image_files)
             
             logger.info(f"Processed directory {directory_path}: {len(documents)} document chunks")
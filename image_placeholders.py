@@ -0,0 +1,160 @@
+"""
+Image placeholders for Star College Chatbot
+
+Compiles static/images/database.json into a sidecar, database.compiled.json, holding each
+referenced image's width, height, dominant colour and a tiny blurred preview (LQIP) as a
+data URI. Clients use these to reserve the image's space and paint something in it before
+the full image arrives. Each image is decoded once, at build time.
+
+Usage:
+    python image_placeholders.py [--database static/images/database.json]
+"""
+import os
+import io
+import json
+import base64
+import argparse
+import logging
+from typing import Dict, Any, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DATABASE_PATH = os.path.join("static", "images", "database.json")
+COMPILED_SUFFIX = ".compiled.json"
+
+# Longest side of the blurred preview, in pixels; a few hundred bytes once encoded
+PLACEHOLDER_SIZE = 16
+
+# EXIF orientations that turn the image a quarter, swapping its displayed width and height
+EXIF_ORIENTATION = 0x0112
+ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+
+def compiled_path(database_path: str) -> str:
+    """Path of the sidecar compiled from an image database"""
+    return os.path.splitext(database_path)[0] + COMPILED_SUFFIX
+
+def describe_image(path: str) -> Optional[Dict[str, Any]]:
+    """
+    Decode an image and describe it for placeholders
+
+    Args:
+        path: Image file
+
+    Returns:
+        Dictionary with "width", "height", "color" (hex) and "placeholder" (data URI), or
+        None if the image cannot be decoded
+    """
+    from PIL import Image, ImageFilter, ImageOps
+
+    try:
+        with Image.open(path) as opened:
+            width, height = opened.size
+            if opened.getexif().get(EXIF_ORIENTATION) in ROTATED_ORIENTATIONS:
+                width, height = height, width
+            # JPEG decoders can scale down while decoding, which is all a preview needs
+            opened.draft("RGB", (PLACEHOLDER_SIZE * 4, PLACEHOLDER_SIZE * 4))
+            image = ImageOps.exif_transpose(opened).convert("RGB")
+    except OSError as e:
+        logger.error(f"Error decoding {path}: {e}")
+        return None
+
+    thumbnail = image.copy()
+    thumbnail.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+
+    # The most common of a handful of representative colours
+    palette_image = thumbnail.quantize(colors=5)
+    palette = palette_image.getpalette()
+    _, index = max(palette_image.getcolors())
+    color = "#{:02x}{:02x}{:02x}".format(*palette[index * 3:index * 3 + 3])
+
+    buffer = io.BytesIO()
+    thumbnail.filter(ImageFilter.GaussianBlur(1)).save(buffer, "WEBP", quality=40)
+    placeholder = "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+    return {"width": width, "height": height, "color": color, "placeholder": placeholder}
+
+def compile_image_database(database_path: str = DATABASE_PATH, incremental: bool = False) -> Dict[str, Dict[str, Any]]:
+    """
+    Write the placeholder sidecar for an image database
+
+    Args:
+        database_path: Path to the image database JSON file
+        incremental: Keep the descriptions of images unchanged since the sidecar was last
+            written, and only decode new or changed ones
+
+    Returns:
+        Image file names mapped to their descriptions
+    """
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        logger.warning("Pillow is not installed, skipping image placeholders")
+        return {}
+
+    with open(database_path, "r", encoding="utf-8") as f:
+        database = json.load(f)
+
+    image_dir = os.path.dirname(database_path)
+    names = sorted({entry["image"] for kind in ("locations", "students") for entry in database.get(kind, [])})
+
+    output_path = compiled_path(database_path)
+    known = load_placeholders(database_path) if incremental else {}
+    compiled_at = os.path.getmtime(output_path) if known else 0.0
+
+    images: Dict[str, Dict[str, Any]] = {}
+    described = 0
+    for name in names:
+        path = os.path.join(image_dir, name)
+        if not os.path.isfile(path):
+            logger.warning(f"Image {name} referenced by {database_path} not found")
+            continue
+        if name in known and os.path.getmtime(path) <= compiled_at:
+            images[name] = known[name]
+            continue
+        described += 1
+        description = describe_image(path)
+        if description is not None:
+            images[name] = description
+
+    # Unique per process, as every server worker may compile the sidecar after a change
+    temporary_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as f:
+        json.dump({"images": images}, f, indent=2, sort_keys=True)
+    os.replace(temporary_path, output_path)
+
+    logger.info(f"Compiled placeholders for {len(images)} of {len(names)} images ({described} decoded) into {output_path}")
+    return images
+
+def load_placeholders(database_path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Load the placeholder sidecar for an image database, if it has been compiled
+
+    Args:
+        database_path: Path to the image database JSON file
+
+    Returns:
+        Image file names mapped to their descriptions
+    """
+    path = compiled_path(database_path)
+    if not os.path.exists(path):
+        return {}
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("images", {})
+    except (OSError, ValueError) as e:
+        logger.error(f"Error loading image placeholders: {e}")
+        return {}
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Compile image placeholders for the image database")
+    parser.add_argument("--database", default=DATABASE_PATH, help="Path to the image database JSON file")
+    args = parser.parse_args()
+
+    compile_image_database(args.database)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Responsive image variants for Star College Chatbot
+
+Used by build_static.py: every JPEG and PNG under static/images/ is decoded once and
+re-encoded as WebP (and AVIF, where Pillow supports it) at several widths, so clients can
+pick the smallest file that fills the space they display it in.
+"""
+import os
+import logging
+import tempfile
+from typing import Dict, List, Any
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Widths generated for each image, skipping any wider than the original
+VARIANT_WIDTHS = (320, 640, 960, 1280)
+
+SOURCE_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+
+# Output formats as (content type, Pillow format, file extension, save options), best first
+VARIANT_FORMATS = (
+    ("image/avif", "AVIF", ".avif", {"quality": 55}),
+    ("image/webp", "WEBP", ".webp", {"quality": 80, "method": 6}),
+)
+
+def supported_formats() -> List[tuple]:
+    """The variant formats this Pillow build can write"""
+    from PIL import Image
+
+    try:
+        # Registers AVIF with Pillow versions that do not support it natively
+        import pillow_avif  # noqa: F401
+    except ImportError:
+        pass
+
+    Image.init()
+    formats = [variant for variant in VARIANT_FORMATS if variant[1] in Image.SAVE]
+    if not any(variant[1] == "AVIF" for variant in formats):
+        logger.info("AVIF is not supported by this Pillow build, writing WebP variants only")
+    return formats
+
+def save_variant(image, path: str, pillow_format: str, options: Dict[str, Any]) -> None:
+    """
+    Save a variant unless it exists
+
+    Variants are named after the hash of their source, so an existing one is already
+    right; new ones are written whole and renamed into place, as they may be served
+    while another process adds to the build.
+    """
+    if os.path.exists(path):
+        return
+    descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as f:
+            image.save(f, pillow_format, **options)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+
+def build_image_variants(dist_dir: str, assets: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Write the responsive variants of the built images
+
+    Args:
+        dist_dir: Build output directory
+        assets: Source paths mapped to their hashed paths under dist_dir
+
+    Returns:
+        Source paths mapped to the image's size and its variants by content type
+    """
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        logger.warning("Pillow is not installed, skipping responsive image variants")
+        return {}
+
+    formats = supported_formats()
+    images: Dict[str, Dict[str, Any]] = {}
+
+    for source_path, hashed_path in sorted(assets.items()):
+        if not source_path.startswith("images/") or os.path.splitext(source_path)[1].lower() not in SOURCE_EXTENSIONS:
+            continue
+
+        try:
+            with Image.open(os.path.join(dist_dir, hashed_path)) as opened:
+                # Apply any EXIF rotation so the reported size matches what is displayed
+                image = ImageOps.exif_transpose(opened)
+                image.load()
+        except OSError as e:
+            logger.error(f"Error decoding {source_path}: {e}")
+            continue
+
+        width, height = image.size
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+
+        widths = sorted({w for w in VARIANT_WIDTHS if w < width} | {width})
+        stem = os.path.splitext(hashed_path)[0]
+        variants: Dict[str, List[Dict[str, Any]]] = {}
+
+        for variant_width in widths:
+            variant_height = max(1, round(height * variant_width / width))
+            resized = image if variant_width == width else image.resize((variant_width, variant_height), Image.LANCZOS)
+            for content_type, pillow_format, extension, options in formats:
+                variant_path = f"{stem}.{variant_width}w{extension}"
+                try:
+                    save_variant(resized, os.path.join(dist_dir, variant_path), pillow_format, options)
+                except (OSError, ValueError) as e:
+                    logger.error(f"Error writing {variant_path}: {e}")
+                    continue
+                variants.setdefault(content_type, []).append({
+                    "path": variant_path,
+                    "width": variant_width,
+                    "height": variant_height,
+                })
+
+        images[source_path] = {"width": width, "height": height, "variants": variants}
+
+    logger.info(f"Wrote responsive variants of {len(images)} images")
+    return images
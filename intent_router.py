@@ -0,0 +1,294 @@
+"""
+Local intent routing for Star College Chatbot
+
+Decides, before any upstream call, whether a question needs the LLM at all. Small talk,
+questions the built-in FAQ already answers and questions for which retrieval found nothing
+are answered locally; the rest go to a cheaper model when they look simple and to the main
+model otherwise. All matching uses indexes built once at construction time.
+"""
+import re
+import logging
+from collections import defaultdict
+from typing import Optional, Dict, List, Set, Tuple, Callable, Awaitable, Union
+
+from llm_providers import BaseLLMProvider, MockProvider
+from metrics import metrics
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SMALL_TALK = {
+    "greeting": (
+        ["hi", "hello", "hey", "hiya", "howzit", "good morning", "good afternoon", "good evening", "greetings"],
+        "**Hello!**\n\nI'm StarBot, the Star College Durban assistant. Ask me anything about the school, such as admissions, programmes, location or contact details."
+    ),
+    "thanks": (
+        ["thanks", "thank you", "thanks a lot", "thank you so much", "cheers", "much appreciated"],
+        "You're welcome! Let me know if there is anything else you would like to know about Star College Durban."
+    ),
+    "goodbye": (
+        ["bye", "goodbye", "see you", "see you later", "good night"],
+        "Goodbye! Thanks for chatting with StarBot."
+    ),
+    "wellbeing": (
+        ["how are you", "how are you doing", "how is it going"],
+        "I'm doing well, thank you! How can I help you with Star College Durban today?"
+    ),
+}
+
+# Words that may pad out small talk without making it a real question
+FILLER_WORDS = {"there", "starbot", "bot", "again", "very", "so", "much", "and", "all", "ok", "okay"}
+
+# Words that may surround a whole FAQ question without changing what is asked
+FAQ_FILLER_WORDS = FILLER_WORDS | {
+    "please", "can", "could", "would", "you", "tell", "me", "i", "like", "to", "know", "want",
+    "hi", "hello", "hey", "thanks", "thank",
+}
+
+# Function words a paraphrase of an FAQ question may add or swap without asking something else
+FUNCTION_WORDS = {"a", "an", "the", "do", "does", "is", "are", "of", "at", "in", "for", "about", "your", "its"}
+
+# Context returned by DataRetriever when nothing matched
+RETRIEVAL_MISSES = {"No relevant information found."}
+
+# Wording that suggests a question needs more reasoning than a cheap model gives
+COMPLEX_MARKERS = {
+    "why", "explain", "compare", "comparison", "difference", "differences", "versus", "vs",
+    "pros", "cons", "advantages", "disadvantages", "recommend", "should", "analyse", "analyze",
+}
+
+ROUTES = ("small_talk", "faq", "retrieval_miss", "cheap_model", "main_model")
+
+def normalize(text: str) -> str:
+    """Lowercase text and reduce it to words separated by single spaces"""
+    return " ".join(re.findall(r"[a-z0-9']+", text.lower()))
+
+def trigrams(text: str) -> Set[str]:
+    """Character trigrams of normalized text, padded so short words still produce some"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class IntentRouter:
+    """Routes questions to a local answer, a cheap model or the main model"""
+
+    def __init__(self,
+                 main_provider: BaseLLMProvider,
+                 cheap_provider: Optional[BaseLLMProvider] = None,
+                 faq_answers: Optional[Dict[str, str]] = None,
+                 faq_threshold: float = 0.6,
+                 simple_max_words: int = 12):
+        """
+        Initialize the router and build its indexes
+
+        Args:
+            main_provider: Provider for questions that need the full model
+            cheap_provider: Optional cheaper provider for simple questions
+            faq_answers: FAQ questions mapped to answers (defaults to MockProvider's)
+            faq_threshold: Minimum trigram Jaccard similarity for an FAQ hit
+            simple_max_words: Longest question still considered simple
+        """
+        self.main_provider = main_provider
+        self.cheap_provider = cheap_provider
+        self.faq_threshold = faq_threshold
+        self.simple_max_words = simple_max_words
+
+        # Small talk: exact lookup of normalized phrases; questions are looked up with and
+        # without filler words, but phrases are never shortened (so "see" is not "see you")
+        self.small_talk: Dict[str, str] = {}
+        for phrases, reply in SMALL_TALK.values():
+            for phrase in phrases:
+                self.small_talk[normalize(phrase)] = reply
+
+        # FAQ: trigram sets per question plus an inverted index from trigram to questions
+        faq_answers = faq_answers if faq_answers is not None else MockProvider().answers
+        self.faq_questions: List[str] = []
+        self.faq_words: List[Set[str]] = []
+        self.faq_replies: List[str] = []
+        self.faq_trigrams: List[Set[str]] = []
+        self.trigram_index: Dict[str, List[int]] = defaultdict(list)
+        for faq_question, reply in faq_answers.items():
+            index = len(self.faq_questions)
+            normalized = normalize(faq_question)
+            grams = trigrams(normalized)
+            self.faq_questions.append(normalized)
+            self.faq_words.append(set(normalized.split()))
+            self.faq_replies.append(reply)
+            self.faq_trigrams.append(grams)
+            for gram in grams:
+                self.trigram_index[gram].append(index)
+
+        for route in ROUTES:
+            metrics.increment(f"intent_route.{route}", 0)
+
+    @staticmethod
+    def _strip_filler(normalized: str) -> str:
+        return " ".join(word for word in normalized.split() if word not in FILLER_WORDS)
+
+    def match_small_talk(self, question: str) -> Optional[str]:
+        """Get the reply if the question is only small talk"""
+        normalized = normalize(question)
+        if normalized in self.small_talk:
+            return self.small_talk[normalized]
+
+        # Allow padding such as "hi there" or "thank you so much starbot"
+        stripped = self._strip_filler(normalized)
+        return self.small_talk.get(stripped) if stripped else None
+
+    def match_faq(self, question: str) -> Optional[str]:
+        """Get the FAQ answer if the question is close enough to an FAQ question"""
+        normalized = normalize(question)
+        if not normalized:
+            return None
+
+        grams = trigrams(normalized)
+        overlaps: Dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for index in self.trigram_index.get(gram, ()):
+                overlaps[index] += 1
+
+        best_index = None
+        best_score = 0.0
+        for index, overlap in overlaps.items():
+            score = overlap / len(grams | self.faq_trigrams[index])
+            # A whole FAQ question padded only with politeness ("please tell me ...") is a hit;
+            # any other extra words ask something the canned answer may not cover
+            if self._padded_faq(normalized, self.faq_questions[index]):
+                score = 1.0
+            elif self._asks_more(normalized, self.faq_words[index]):
+                continue
+            if score > best_score:
+                best_index, best_score = index, score
+
+        if best_index is not None and best_score >= self.faq_threshold:
+            return self.faq_replies[best_index]
+        return None
+
+    @staticmethod
+    def _padded_faq(normalized: str, faq_question: str) -> bool:
+        """Check whether a question is an FAQ question plus nothing but filler words"""
+        padded = f" {normalized} "
+        position = padded.find(f" {faq_question} ")
+        if position < 0:
+            return False
+        leftover = padded[:position].split() + padded[position + len(faq_question) + 2:].split()
+        return all(word in FAQ_FILLER_WORDS for word in leftover)
+
+    @staticmethod
+    def _asks_more(normalized: str, faq_words: Set[str]) -> bool:
+        """Check whether a question has content words the FAQ question does not, e.g. "ranked" """
+        for word in normalized.split():
+            if word in faq_words or word in FAQ_FILLER_WORDS or word in FUNCTION_WORDS:
+                continue
+            # Allow other forms of the same word, such as "what's" or "located"/"location"
+            if not any(word[:4] == faq_word[:4] for faq_word in faq_words if len(faq_word) >= 4):
+                return True
+        return False
+
+    def is_simple(self, question: str) -> bool:
+        """Check whether a question looks simple enough for the cheap model"""
+        words = normalize(question).split()
+        if len(words) > self.simple_max_words:
+            return False
+        if COMPLEX_MARKERS.intersection(words):
+            return False
+        # Several questions in one go need the main model
+        return question.count("?") <= 1
+
+    def route_local(self, question: str) -> Optional[Tuple[str, str]]:
+        """
+        Answer a question from small talk or the FAQ, which needs no retrieval
+
+        Args:
+            question: User question
+
+        Returns:
+            Tuple of (route name, local answer), or None if retrieval is needed
+        """
+        reply = self.match_small_talk(question)
+        if reply is not None:
+            return "small_talk", reply
+
+        reply = self.match_faq(question)
+        if reply is not None:
+            return "faq", reply
+
+        return None
+
+    def route(self, question: str, context: Optional[List[str]] = None) -> Tuple[str, Optional[str], Optional[BaseLLMProvider]]:
+        """
+        Decide how to answer a question
+
+        Args:
+            question: User question
+            context: Passages returned by retrieval
+
+        Returns:
+            Tuple of (route name, local answer or None, provider to call or None)
+        """
+        local = self.route_local(question)
+        if local is not None:
+            return local[0], local[1], None
+        return self._route_retrieved(question, context)
+
+    def _route_retrieved(self, question: str, context: Optional[List[str]]) -> Tuple[str, Optional[str], Optional[BaseLLMProvider]]:
+        """Route a question that small talk and the FAQ did not answer, given its context"""
+        if context and all(passage in RETRIEVAL_MISSES for passage in context):
+            return "retrieval_miss", MockProvider.no_information_answer, None
+
+        if self.cheap_provider is not None and self.is_simple(question):
+            return "cheap_model", None, self.cheap_provider
+
+        return "main_model", None, self.main_provider
+
+    def answer(self,
+               question: str,
+               context: Optional[List[str]] = None,
+               timeout: Optional[Union[float, Callable[[], float]]] = None,
+               retrieve: Optional[Callable[[], List[str]]] = None) -> Tuple[str, str]:
+        """
+        Answer a question through the chosen route
+
+        Args:
+            question: User question
+            context: Passages returned by retrieval
+            timeout: Seconds a provider call may take, or a callable returning them once
+                the route is known, so time spent on retrieval is accounted for
+            retrieve: Called for the context only if small talk and the FAQ do not answer
+
+        Returns:
+            Tuple of (answer, route name)
+        """
+        local = self.route_local(question)
+        if local is not None:
+            route, reply, provider = local[0], local[1], None
+        else:
+            if retrieve is not None:
+                context = retrieve()
+            route, reply, provider = self._route_retrieved(question, context)
+        metrics.increment(f"intent_route.{route}")
+        logger.info(f"Routing question via {route}")
+
+        if reply is None:
+            reply = provider.answer_question(question, context, timeout=timeout() if callable(timeout) else timeout)
+        return reply, route
+
+    async def aanswer(self,
+                      question: str,
+                      context: Optional[List[str]] = None,
+                      timeout: Optional[Union[float, Callable[[], float]]] = None,
+                      retrieve: Optional[Callable[[], Awaitable[List[str]]]] = None) -> Tuple[str, str]:
+        """Async version of answer; only retrieval and the provider call await"""
+        local = self.route_local(question)
+        if local is not None:
+            route, reply, provider = local[0], local[1], None
+        else:
+            if retrieve is not None:
+                context = await retrieve()
+            route, reply, provider = self._route_retrieved(question, context)
+        metrics.increment(f"intent_route.{route}")
+        logger.info(f"Routing question via {route}")
+
+        if reply is None:
+            reply = await provider.aanswer_question(question, context, timeout=timeout() if callable(timeout) else timeout)
+        return reply, route
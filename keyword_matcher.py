@@ -0,0 +1,139 @@
+"""
+Keyword matching for Star College Chatbot
+
+An Aho-Corasick automaton over any number of keywords: compiled once, it finds every
+keyword in a text in a single pass, however many keywords there are.
+"""
+from collections import deque
+from typing import Any, Dict, Hashable, Iterator, List, Tuple
+
+# Suffixes a keyword may carry and still match, so "student" matches "students"
+PLURAL_SUFFIXES = ("s", "es")
+
+def _is_word_char(char: str) -> bool:
+    """Check whether a character can be part of a word"""
+    return char.isalnum() or char == "_"
+
+class KeywordMatcher:
+    """Finds whole-word occurrences of many keywords in a text at once"""
+
+    def __init__(self):
+        """Initialize an empty matcher"""
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Per state, the (keyword length, targets) of every keyword ending there
+        self._outputs: List[List[Tuple[int, List[Hashable]]]] = [[]]
+        self._targets: Dict[str, List[Hashable]] = {}
+        # Order targets were first added in, to break ranking ties
+        self._order: Dict[Hashable, int] = {}
+        self._compiled = True
+
+    def __len__(self) -> int:
+        return len(self._targets)
+
+    def add(self, keyword: str, target: Hashable) -> None:
+        """
+        Add a keyword
+
+        Args:
+            keyword: Keyword to find; matched case-insensitively as a whole word or phrase
+            target: Value reported when the keyword is found; a keyword may have several
+        """
+        keyword = keyword.strip().lower()
+        if not keyword:
+            return
+        self._order.setdefault(target, len(self._order))
+
+        if keyword in self._targets:
+            if target not in self._targets[keyword]:
+                self._targets[keyword].append(target)
+            return
+
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            state = next_state
+
+        self._targets[keyword] = [target]
+        self._outputs[state].append((len(keyword), self._targets[keyword]))
+        self._compiled = False
+
+    def compile(self) -> "KeywordMatcher":
+        """Build the failure links; called automatically before the first search"""
+        # States one character deep fail back to the root
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                # Keywords that end at the link state also end here
+                self._outputs[next_state] = self._outputs[next_state] + self._outputs[self._fail[next_state]]
+
+        self._compiled = True
+        return self
+
+    def _ends_word(self, text: str, end: int) -> bool:
+        """Check that a keyword ending at end is not followed by more of the same word"""
+        if end == len(text) or not _is_word_char(text[end]):
+            return True
+        for suffix in PLURAL_SUFFIXES:
+            after = end + len(suffix)
+            if text.startswith(suffix, end) and (after == len(text) or not _is_word_char(text[after])):
+                return True
+        return False
+
+    def find(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """
+        Find every whole-word keyword in a text
+
+        Args:
+            text: Text to search
+
+        Yields:
+            Tuples of (start, end, target) for each occurrence, in order of where they end
+        """
+        if not self._compiled:
+            self.compile()
+
+        text = text.lower()
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+
+            for length, targets in self._outputs[state]:
+                start = index + 1 - length
+                if (start == 0 or not _is_word_char(text[start - 1])) and self._ends_word(text, index + 1):
+                    for target in targets:
+                        yield start, index + 1, target
+
+    def rank(self, text: str) -> List[Tuple[Any, int, int]]:
+        """
+        Rank the targets found in a text
+
+        Args:
+            text: Text to search
+
+        Returns:
+            List of (target, distinct keywords matched, total keyword length) tuples, best
+            first: more keywords, then longer ones, then the order the targets were added
+        """
+        text = text.lower()
+        found: Dict[Any, set] = {}
+        for start, end, target in self.find(text):
+            found.setdefault(target, set()).add(text[start:end])
+
+        scores = [(target, len(keywords), sum(len(keyword) for keyword in keywords))
+                  for target, keywords in found.items()]
+        return sorted(scores, key=lambda score: (-score[1], -score[2], self._order[score[0]]))
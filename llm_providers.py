@@ -2,16 +2,54 @@
 LLM Provider implementations for Star College Chatbot
 """
 import os
+import time
+import asyncio
+import random
 import logging
-from typing import Optional, Dict, Any, List
+import threading
+import contextvars
+import concurrent.futures
+from typing import Optional, Dict, Any, List, Iterator
+
+from answer_cache import answer_cache
+from circuit_breaker import CircuitBreaker, CircuitOpenError, get_circuit_breaker
+from deadline import DeadlineExceeded, is_timeout_error
+from metrics import metrics
+from prompt_builder import build_messages, build_prompt, estimate_prompt_tokens, normalize_usage, prompt_hash
+from rate_limiter import get_admission_controller, retry_after_seconds
+from transcripts import get_transcript_recorder, load_transcripts
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Token usage of the upstream call in progress, collected per call rather than on the
+# provider, which every request thread shares
+_call_usage: contextvars.ContextVar[Optional[Dict[str, int]]] = contextvars.ContextVar("llm_call_usage", default=None)
+
+_ollama_pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_ollama_pool_lock = threading.Lock()
+
+def _ollama_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """Shared pool for Ollama calls that are bounded by a caller's budget"""
+    global _ollama_pool
+    with _ollama_pool_lock:
+        if _ollama_pool is None:
+            _ollama_pool = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix="ollama")
+        return _ollama_pool
+
 class BaseLLMProvider:
     """Base class for LLM providers"""
 
+    name = "base"
+    # Whether calls go upstream, through the provider's admission controller and circuit breaker
+    calls_upstream = True
+    # Whether successful answers are written to LLM_RECORD_TRANSCRIPTS when it is set
+    records_transcripts = True
+    max_tokens = 500
+    rate_limit_retries = 2
+    request_timeout = float(os.environ.get("LLM_REQUEST_TIMEOUT", "30"))
+
     def __init__(self):
         self.initialized = False
 
@@ -23,19 +61,304 @@ class BaseLLMProvider:
         """Get the LLM instance"""
         raise NotImplementedError
 
-    def answer_question(self, question: str, context: Optional[List[str]] = None) -> str:
-        """Answer a question using the LLM"""
+    def check_health(self, timeout: float = 5.0) -> bool:
+        """Check whether the provider can currently serve requests"""
+        return self.initialized or self.initialize()
+
+    def generate_answer(self, question: str, context: Optional[List[str]] = None, timeout: Optional[float] = None) -> str:
+        """Generate an answer, raising an exception if the upstream call fails or takes longer than timeout"""
         raise NotImplementedError
 
+    async def agenerate_answer(self, question: str, context: Optional[List[str]] = None, timeout: Optional[float] = None) -> str:
+        """Generate an answer from a coroutine (in a worker thread unless the provider has an async client)"""
+        return await asyncio.to_thread(self.generate_answer, question, context, timeout)
+
+    def call_timeout(self, timeout: Optional[float] = None) -> float:
+        """
+        Get the timeout for one upstream call
+
+        Args:
+            timeout: Seconds the caller can still wait, or None for no caller budget
+
+        Returns:
+            The provider's request timeout, capped by the caller's budget
+
+        Raises:
+            DeadlineExceeded: If the caller's budget is already spent
+        """
+        if timeout is None:
+            return self.request_timeout
+        if timeout <= 0:
+            raise DeadlineExceeded(f"No time left to call {self.name}")
+        return min(self.request_timeout, timeout)
+
+    def record_usage(self, usage: Optional[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Record token usage, including upstream prompt-cache hits, from a response
+
+        The usage goes to the metrics and to the call request_answer is making in this
+        context, if any.
+
+        Args:
+            usage: Usage block of the response
+
+        Returns:
+            The normalized usage
+        """
+        normalized = normalize_usage(usage)
+        call_usage = _call_usage.get()
+        if call_usage is not None:
+            call_usage.update(normalized)
+
+        for key, value in normalized.items():
+            metrics.increment(f"llm_usage.{self.name}.{key}", value)
+
+        if normalized["prompt_tokens"]:
+            logger.info(
+                f"{self.name} usage: {normalized['prompt_tokens']} prompt tokens "
+                f"({normalized['cached_prompt_tokens']} cached), "
+                f"{normalized['completion_tokens']} completion tokens"
+            )
+        return normalized
+
+    def request_answer(self, question: str, context: Optional[List[str]] = None, timeout: Optional[float] = None) -> str:
+        """
+        Generate an answer through the provider's circuit breaker and admission controller
+
+        Calls fail fast with CircuitOpenError while the provider's circuit is open. Otherwise
+        they wait in a bounded queue for a concurrency slot and rate-limit capacity, and
+        upstream 429 responses pause admissions and are retried while time remains.
+
+        Args:
+            question: User question
+            context: Retrieved passages
+            timeout: Seconds the whole call may take, queueing included (defaults to the
+                queue timeout for admission and the request timeout for the upstream call)
+
+        Returns:
+            The generated answer
+        """
+        if not self.calls_upstream:
+            return self.generate_answer(question, context, timeout=timeout)
+
+        breaker = get_circuit_breaker(self.name)
+        trial = breaker.before_call()
+        try:
+            return self._request_answer(breaker, question, context, timeout)
+        finally:
+            # Deadlines, admission errors, exhausted 429 retries and cancellation record
+            # neither outcome, so the half-open trial slot is given back here
+            breaker.release(trial)
+
+    def _request_answer(self, breaker: CircuitBreaker, question: str, context: Optional[List[str]], timeout: Optional[float]) -> str:
+        """Body of request_answer, run while holding the breaker's go-ahead"""
+        controller = get_admission_controller(self.name)
+        # Budget for the full completion, since actual usage is only known afterwards
+        estimated_tokens = estimate_prompt_tokens(question, context) + self.max_tokens
+        now = time.monotonic()
+        call_deadline = None if timeout is None else now + timeout
+        queue_deadline = now + controller.queue_timeout
+        if call_deadline is not None:
+            queue_deadline = min(queue_deadline, call_deadline)
+
+        attempt = 0
+        while True:
+            # Running out of local capacity says nothing about the upstream, so an
+            # AdmissionError is not counted against the breaker
+            with controller.admit(estimated_tokens, timeout=max(0.0, queue_deadline - time.monotonic())):
+                start = time.monotonic()
+                remaining = None if call_deadline is None else call_deadline - start
+                usage: Dict[str, int] = {}
+                usage_token = _call_usage.set(usage)
+                try:
+                    answer = self.generate_answer(question, context, timeout=remaining)
+                except Exception as e:
+                    if isinstance(e, DeadlineExceeded):
+                        # The caller's budget ran out before the upstream was asked anything
+                        raise
+                    retry_after = retry_after_seconds(e)
+                    if retry_after is None:
+                        breaker.record_failure()
+                        raise
+                    if attempt >= self.rate_limit_retries:
+                        raise
+                else:
+                    breaker.record_success()
+                    self._record_transcript(question, context, answer, time.monotonic() - start, usage)
+                    return answer
+                finally:
+                    _call_usage.reset(usage_token)
+
+            attempt += 1
+            controller.backoff(retry_after)
+
+    async def arequest_answer(self, question: str, context: Optional[List[str]] = None, timeout: Optional[float] = None) -> str:
+        """Async version of request_answer, waiting for admission without blocking the event loop"""
+        if not self.calls_upstream:
+            return await self.agenerate_answer(question, context, timeout=timeout)
+
+        breaker = get_circuit_breaker(self.name)
+        trial = breaker.before_call()
+        try:
+            return await self._arequest_answer(breaker, question, context, timeout)
+        finally:
+            breaker.release(trial)
+
+    async def _arequest_answer(self, breaker: CircuitBreaker, question: str, context: Optional[List[str]], timeout: Optional[float]) -> str:
+        """Body of arequest_answer, run while holding the breaker's go-ahead"""
+        controller = get_admission_controller(self.name)
+        estimated_tokens = estimate_prompt_tokens(question, context) + self.max_tokens
+        now = time.monotonic()
+        call_deadline = None if timeout is None else now + timeout
+        queue_deadline = now + controller.queue_timeout
+        if call_deadline is not None:
+            queue_deadline = min(queue_deadline, call_deadline)
+
+        attempt = 0
+        while True:
+            async with controller.admit_async(estimated_tokens, timeout=max(0.0, queue_deadline - time.monotonic())):
+                start = time.monotonic()
+                remaining = None if call_deadline is None else call_deadline - start
+                usage: Dict[str, int] = {}
+                usage_token = _call_usage.set(usage)
+                try:
+                    answer = await self.agenerate_answer(question, context, timeout=remaining)
+                except Exception as e:
+                    if isinstance(e, DeadlineExceeded):
+                        raise
+                    retry_after = retry_after_seconds(e)
+                    if retry_after is None:
+                        breaker.record_failure()
+                        raise
+                    if attempt >= self.rate_limit_retries:
+                        raise
+                else:
+                    breaker.record_success()
+                    self._record_transcript(question, context, answer, time.monotonic() - start, usage)
+                    return answer
+                finally:
+                    _call_usage.reset(usage_token)
+
+            attempt += 1
+            controller.backoff(retry_after)
+
+    def _record_transcript(self, question: str, context: Optional[List[str]], answer: str, latency: float, usage: Dict[str, int]) -> None:
+        """Append the answer to the transcript file if recording is enabled"""
+        recorder = get_transcript_recorder()
+        if recorder is None or not self.records_transcripts:
+            return
+
+        recorder.record(
+            provider=self.name,
+            model=getattr(self, "model", None),
+            prompt_hash=prompt_hash(question, context),
+            question=question,
+            answer=answer,
+            latency_seconds=latency,
+            completion_tokens=usage.get("completion_tokens") or len(answer.split())
+        )
+
+    def fallback_answer(self, question: str) -> Optional[str]:
+        """
+        Answer without the upstream, from the answer cache or the built-in FAQ
+
+        Args:
+            question: User question
+
+        Returns:
+            A fallback answer, or None if neither has one
+        """
+        cached = answer_cache.get(question)
+        if cached is not None:
+            metrics.increment("fallback_answers.cache")
+            return cached
+
+        faq = _fallback_provider.match_answer(question)
+        if faq is not None:
+            metrics.increment("fallback_answers.faq")
+            return faq
+
+        return None
+
+    def answer_question(self, question: str, context: Optional[List[str]] = None, timeout: Optional[float] = None) -> str:
+        """
+        Answer a question using the LLM
+
+        Args:
+            question: User question
+            context: Retrieved passages
+            timeout: Seconds the answer may take; when they run out the upstream call is
+                abandoned and a cached or FAQ answer is returned instead
+
+        Returns:
+            The answer, or an apology if none could be produced
+        """
+        if not self.initialized:
+            success = self.initialize()
+            if not success:
+                return "I'm sorry, I couldn't initialize the language model. Please try again later."
+
+        try:
+            answer = self.request_answer(question, context, timeout=timeout)
+        except Exception as e:
+            return self._answer_after_error(question, e)
+
+        answer_cache.put(question, answer)
+        return answer
+
+    async def aanswer_question(self, question: str, context: Optional[List[str]] = None, timeout: Optional[float] = None) -> str:
+        """Async version of answer_question; cancelling the task cancels the upstream call"""
+        if not self.initialized:
+            success = await asyncio.to_thread(self.initialize)
+            if not success:
+                return "I'm sorry, I couldn't initialize the language model. Please try again later."
+
+        try:
+            answer = await self.arequest_answer(question, context, timeout=timeout)
+        except Exception as e:
+            return self._answer_after_error(question, e)
+
+        answer_cache.put(question, answer)
+        return answer
+
+    def _answer_after_error(self, question: str, error: Exception) -> str:
+        """Log a failed answer and fall back to the cache, the FAQ or an apology"""
+        timed_out = is_timeout_error(error)
+        if isinstance(error, CircuitOpenError):
+            logger.warning(f"Not calling {self.name}: {error}")
+        elif timed_out:
+            metrics.increment(f"deadline_exceeded.{self.name}")
+            logger.warning(f"Gave up waiting for {self.name}: {error}")
+        else:
+            logger.error(f"Error answering question with {self.name}: {error}")
+
+        fallback = self.fallback_answer(question)
+        if fallback is not None:
+            return fallback
+        if timed_out:
+            return "I'm sorry, answering your question is taking longer than expected. Please try again in a moment."
+        return f"I'm sorry, I encountered an error while processing your question: {str(error)}"
+
+    def stream_answer(self, question: str, context: Optional[List[str]] = None) -> Iterator[str]:
+        """Answer a question as a stream of text chunks (a single chunk unless overridden)"""
+        yield self.answer_question(question, context)
+
 class OpenAIProvider(BaseLLMProvider):
     """OpenAI LLM provider"""
 
+    name = "openai"
+
     def __init__(self, api_key: Optional[str] = None, model: str = "gpt-3.5-turbo"):
         super().__init__()
         self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
         self.model = model or os.environ.get("OPENAI_MODEL", "gpt-3.5-turbo")
+        # Override to point at a compatible server, e.g. the local stub used for benchmarks
+        self.base_url = os.environ.get("OPENAI_BASE_URL") or None
         self.client = None
         self.llm = None
+        # Async clients are tied to the event loop they were created on
+        self.async_client = None
+        self.async_client_loop = None
 
     def initialize(self) -> bool:
         """Initialize the OpenAI provider"""
@@ -56,13 +379,15 @@ class OpenAIProvider(BaseLLMProvider):
                 openai.api_key = self.api_key
 
                 # Initialize client
-                self.client = openai.OpenAI(api_key=self.api_key)
+                self.client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url, timeout=self.request_timeout)
 
                 # Initialize LLM
                 self.llm = ChatOpenAI(
                     model=self.model,
                     temperature=0,
-                    openai_api_key=self.api_key
+                    openai_api_key=self.api_key,
+                    base_url=self.base_url,
+                    timeout=self.request_timeout
                 )
 
                 self.initialized = True
@@ -83,56 +408,64 @@ class OpenAIProvider(BaseLLMProvider):
             self.initialize()
         return self.llm
 
-    def answer_question(self, question: str, context: Optional[List[str]] = None) -> str:
-        """Answer a question using OpenAI"""
-        if not self.initialized:
-            success = self.initialize()
-            if not success:
-                return "I'm sorry, I couldn't initialize the language model. Please try again later."
-
-        try:
-            # Prepare context
-            context_text = "\n".join(context) if context else "No additional context provided."
-
-            # Create prompt
-            prompt = f"""
-            You are StarBot, a helpful assistant for Star College Durban.
-
-            Use ONLY the following context to answer the question. If the answer is not in the context, say "I don't have enough information to answer that question."
-
-            Context:
-            {context_text}
-
-            Question: {question}
-
-            Answer:
-            """
-
-            # Get response from OpenAI
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are StarBot, a helpful assistant for Star College Durban. Only answer based on the provided context."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0,
-                max_tokens=500
-            )
+    def check_health(self, timeout: float = 5.0) -> bool:
+        """Check that the OpenAI API is reachable and accepts the API key"""
+        if not self.initialized and not self.initialize():
+            return False
 
-            # Extract answer
-            answer = response.choices[0].message.content.strip()
-            return answer
+        self.client.with_options(timeout=timeout).models.list()
+        return True
 
-        except Exception as e:
-            logger.error(f"Error answering question with OpenAI: {e}")
-            return f"I'm sorry, I encountered an error while processing your question: {str(e)}"
+    def generate_answer(self, question: str, context: Optional[List[str]] = None, timeout: Optional[float] = None) -> str:
+        """Answer a question using OpenAI"""
+        # Within a caller's budget there is no time for the client's own retries
+        client = self.client if timeout is None else self.client.with_options(timeout=self.call_timeout(timeout), max_retries=0)
+
+        # Get response from OpenAI
+        response = client.chat.completions.create(
+            model=self.model,
+            messages=build_messages(question, context),
+            temperature=0,
+            max_tokens=self.max_tokens
+        )
+        return self._extract_answer(response)
+
+    async def agenerate_answer(self, question: str, context: Optional[List[str]] = None, timeout: Optional[float] = None) -> str:
+        """Answer a question using the async OpenAI client"""
+        loop = asyncio.get_running_loop()
+        if self.async_client is None or self.async_client_loop is not loop:
+            import openai
+
+            self.async_client = openai.AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, timeout=self.request_timeout)
+            self.async_client_loop = loop
+
+        client = self.async_client if timeout is None else self.async_client.with_options(timeout=self.call_timeout(timeout), max_retries=0)
+        response = await client.chat.completions.create(
+            model=self.model,
+            messages=build_messages(question, context),
+            temperature=0,
+            max_tokens=self.max_tokens
+        )
+        return self._extract_answer(response)
+
+    def _extract_answer(self, response: Any) -> str:
+        """Record usage and extract the answer from a chat completion"""
+        if getattr(response, "usage", None) is not None:
+            self.record_usage(response.usage.model_dump())
+
+        # Extract answer
+        answer = response.choices[0].message.content.strip()
+        return answer
 
 class OllamaProvider(BaseLLMProvider):
     """Ollama LLM provider"""
 
+    name = "ollama"
+
     def __init__(self, model: str = "llama2"):
         super().__init__()
         self.model = model
+        self.base_url = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
         self.llm = None
 
     def initialize(self) -> bool:
@@ -143,7 +476,7 @@ class OllamaProvider(BaseLLMProvider):
                 from langchain_community.llms import Ollama
 
                 # Initialize LLM
-                self.llm = Ollama(model=self.model)
+                self.llm = Ollama(model=self.model, base_url=self.base_url, timeout=int(self.request_timeout))
 
                 self.initialized = True
                 logger.info(f"Ollama provider initialized with model {self.model}")
@@ -163,42 +496,40 @@ class OllamaProvider(BaseLLMProvider):
             self.initialize()
         return self.llm
 
-    def answer_question(self, question: str, context: Optional[List[str]] = None) -> str:
+    def generate_answer(self, question: str, context: Optional[List[str]] = None, timeout: Optional[float] = None) -> str:
         """Answer a question using Ollama"""
-        if not self.initialized:
-            success = self.initialize()
-            if not success:
-                return "I'm sorry, I couldn't initialize the language model. Please try again later."
-
-        try:
-            # Prepare context
-            context_text = "\n".join(context) if context else "No additional context provided."
-
-            # Create prompt
-            prompt = f"""
-            You are StarBot, a helpful assistant for Star College Durban.
-
-            Use ONLY the following context to answer the question. If the answer is not in the context, say "I don't have enough information to answer that question."
-
-            Context:
-            {context_text}
-
-            Question: {question}
-
-            Answer:
-            """
-
+        call_timeout = self.call_timeout(timeout)
+        if call_timeout >= self.request_timeout:
             # Get response from Ollama
-            answer = self.llm.invoke(prompt).strip()
-            return answer
+            return self.llm.invoke(build_prompt(question, context)).strip()
 
-        except Exception as e:
-            logger.error(f"Error answering question with Ollama: {e}")
-            return f"I'm sorry, I encountered an error while processing your question: {str(e)}"
+        # The Ollama client only takes a timeout when it is created, so a shorter budget is
+        # enforced by waiting on a worker thread, which the client's own timeout later frees
+        future = _ollama_executor().submit(self.llm.invoke, build_prompt(question, context))
+        try:
+            return future.result(timeout=call_timeout).strip()
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise DeadlineExceeded(f"Ollama did not answer within {call_timeout:.1f}s")
+
+    async def agenerate_answer(self, question: str, context: Optional[List[str]] = None, timeout: Optional[float] = None) -> str:
+        """Answer a question using Ollama's async client"""
+        call_timeout = self.call_timeout(timeout)
+        try:
+            answer = await asyncio.wait_for(self.llm.ainvoke(build_prompt(question, context)), timeout=call_timeout)
+        except asyncio.TimeoutError:
+            if call_timeout < self.request_timeout:
+                raise DeadlineExceeded(f"Ollama did not answer within {call_timeout:.1f}s")
+            raise
+        return answer.strip()
 
 class MockProvider(BaseLLMProvider):
     """Mock LLM provider using pre-defined answers"""
 
+    name = "mock"
+    calls_upstream = False
+    no_information_answer = "**I don't have enough information**\n\nI'm sorry, but I don't have enough information in my database to answer that question about Star College Durban.\n\nFor more specific information, you might want to:\n\n• Visit the official Star College Durban website\n• Contact the school directly at +27 31 262 71 91\n• Email them at starcollege@starcollege.co.za"
+
     def __init__(self):
         super().__init__()
         self.initialized = True
@@ -223,8 +554,8 @@ class MockProvider(BaseLLMProvider):
         """Get the mock LLM instance"""
         return None
 
-    def answer_question(self, question: str, context: Optional[List[str]] = None) -> str:
-        """Answer a question using pre-defined answers"""
+    def match_answer(self, question: str) -> Optional[str]:
+        """Find a pre-defined answer for a question, or None if there is none"""
         question_lower = question.lower()
 
         # Check for exact matches
@@ -236,17 +567,39 @@ class MockProvider(BaseLLMProvider):
             if question_lower in key or key in question_lower:
                 return value
 
+        return None
+
+    def generate_answer(self, question: str, context: Optional[List[str]] = None, timeout: Optional[float] = None) -> str:
+        """Answer a question using pre-defined answers"""
+        answer = self.match_answer(question)
+        if answer is not None:
+            return answer
+
         # Default response
-        return "**I don't have enough information**\n\nI'm sorry, but I don't have enough information in my database to answer that question about Star College Durban.\n\nFor more specific information, you might want to:\n\n• Visit the official Star College Durban website\n• Contact the school directly at +27 31 262 71 91\n• Email them at starcollege@starcollege.co.za"
+        return self.no_information_answer
+
+    async def agenerate_answer(self, question: str, context: Optional[List[str]] = None, timeout: Optional[float] = None) -> str:
+        """Answer a question using pre-defined answers, which needs no thread"""
+        return self.generate_answer(question, context, timeout)
+
+# Built-in FAQ answers served when an upstream provider cannot answer
+_fallback_provider = MockProvider()
 
 class DeepSeekProvider(BaseLLMProvider):
     """DeepSeek LLM provider"""
 
+    name = "deepseek"
+
     def __init__(self, api_key: Optional[str] = None, model: str = "deepseek-chat"):
         super().__init__()
         self.api_key = api_key or os.environ.get("DEEPSEEK_API_KEY")
         self.model = model or os.environ.get("DEEPSEEK_MODEL", "deepseek-chat")
+        # Override to point at a compatible server, e.g. the local stub used for benchmarks
+        self.base_url = os.environ.get("DEEPSEEK_BASE_URL", "https://api.deepseek.com").rstrip("/")
         self.client = None
+        # Async clients are tied to the event loop they were created on
+        self.async_client = None
+        self.async_client_loop = None
 
     def initialize(self) -> bool:
         """Initialize the DeepSeek provider"""
@@ -263,29 +616,9 @@ class DeepSeekProvider(BaseLLMProvider):
             # Import required modules
             try:
                 import requests
-                logger.info("Successfully imported requests module")
 
-                # Test the API key with a simple request
-                headers = {
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json"
-                }
-
-                # Make a simple test request to verify the API key
-                try:
-                    logger.info("Testing DeepSeek API connection...")
-                    test_url = "https://api.deepseek.com/v1/models"
-                    test_response = requests.get(test_url, headers=headers)
-
-                    if test_response.status_code == 200:
-                        logger.info("DeepSeek API connection successful!")
-                    else:
-                        logger.error(f"DeepSeek API test failed with status code: {test_response.status_code}")
-                        logger.error(f"Response: {test_response.text}")
-                        return False
-                except Exception as e:
-                    logger.error(f"Error testing DeepSeek API: {e}")
-                    return False
+                # The key itself is validated by the first real request or a background
+                # health check, so initialization never waits on an upstream round-trip
 
                 # Initialize as successful
                 self.initialized = True
@@ -306,99 +639,220 @@ class DeepSeekProvider(BaseLLMProvider):
             self.initialize()
         return None
 
-    def answer_question(self, question: str, context: Optional[List[str]] = None) -> str:
+    def check_health(self, timeout: float = 5.0) -> bool:
+        """Check that the DeepSeek API is reachable and accepts the API key"""
+        if not self.initialized and not self.initialize():
+            return False
+
+        import requests
+
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        response = requests.get(f"{self.base_url}/v1/models", headers=headers, timeout=timeout)
+        if response.status_code != 200:
+            logger.warning(f"DeepSeek health check failed with status code: {response.status_code}")
+            return False
+        return True
+
+    def generate_answer(self, question: str, context: Optional[List[str]] = None, timeout: Optional[float] = None) -> str:
         """Answer a question using DeepSeek"""
-        if not self.initialized:
-            success = self.initialize()
-            if not success:
-                return "I'm sorry, I couldn't initialize the language model. Please try again later."
+        import requests
+        import json
 
-        try:
-            import requests
-            import json
+        # Make the API request
+        url, headers, data = self._build_request(question, context)
+        response = requests.post(url, headers=headers, data=json.dumps(data), timeout=self.call_timeout(timeout))
+        response.raise_for_status()
 
-            # Prepare context
-            context_text = "\n".join(context) if context else "No additional context provided."
+        return self._extract_answer(response.json())
 
-            # Create prompt
-            prompt = f"""
-            You are StarBot, a helpful assistant for Star College Durban.
+    async def agenerate_answer(self, question: str, context: Optional[List[str]] = None, timeout: Optional[float] = None) -> str:
+        """Answer a question using DeepSeek through an async HTTP client"""
+        import httpx
 
-            Use ONLY the following context to answer the question. If the answer is not in the context, say "I don't have enough information to answer that question."
+        loop = asyncio.get_running_loop()
+        if self.async_client is None or self.async_client_loop is not loop:
+            self.async_client = httpx.AsyncClient(timeout=self.request_timeout)
+            self.async_client_loop = loop
 
-            Context:
-            {context_text}
+        url, headers, data = self._build_request(question, context)
+        response = await self.async_client.post(url, headers=headers, json=data, timeout=self.call_timeout(timeout))
+        response.raise_for_status()
 
-            Question: {question}
+        return self._extract_answer(response.json())
 
-            Format your answer in a readable, user-friendly style following these guidelines:
-            1. Use proper paragraphs with line breaks between them
-            2. Use bullet points for lists
-            3. Use headers (with bold formatting) for different sections when appropriate
-            4. Keep paragraphs short and focused on one idea
-            5. Use a conversational, helpful tone
-            6. Organize information logically
-            7. Highlight important information
+    def _build_request(self, question: str, context: Optional[List[str]]) -> tuple:
+        """Get the URL, headers and body of a chat completion request"""
+        url = f"{self.base_url}/v1/chat/completions"
 
-            Answer:
-            """
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+        data = {
+            "model": self.model,
+            "messages": build_messages(question, context),
+            "temperature": 0,
+            "max_tokens": self.max_tokens
+        }
+        return url, headers, data
 
-            # Prepare the API request
-            url = "https://api.deepseek.com/v1/chat/completions"
+    def _extract_answer(self, result: Dict[str, Any]) -> str:
+        """Record usage and extract the answer from a chat completion response"""
+        self.record_usage(result.get("usage"))
+        answer = result.get("choices", [{}])[0].get("message", {}).get("content", "")
 
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
+        return answer.strip()
 
-            data = {
-                "model": self.model,
-                "messages": [
-                    {"role": "system", "content": "You are StarBot, a helpful assistant for Star College Durban. Only answer based on the provided context."},
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": 0,
-                "max_tokens": 500
-            }
+class ReplayProvider(BaseLLMProvider):
+    """Provider that replays recorded transcripts with recorded latencies, for offline load tests"""
 
-            # Make the API request
-            response = requests.post(url, headers=headers, data=json.dumps(data))
-            response.raise_for_status()
+    name = "replay"
+    records_transcripts = False
 
-            # Parse the response
-            result = response.json()
-            answer = result.get("choices", [{}])[0].get("message", {}).get("content", "")
+    def __init__(self, transcripts_path: Optional[str] = None, latency_scale: Optional[float] = None, seed: Optional[int] = None):
+        super().__init__()
+        self.transcripts_path = transcripts_path or os.environ.get("LLM_REPLAY_FILE")
+        self.latency_scale = latency_scale if latency_scale is not None else float(os.environ.get("LLM_REPLAY_LATENCY_SCALE", "1.0"))
+        self.random = random.Random(seed)
+        self.answers: Dict[str, List[str]] = {}
+        self.all_answers: List[str] = []
+        # Seconds per completion token of each recorded call
+        self.token_seconds: List[float] = []
 
-            return answer.strip()
+    def initialize(self) -> bool:
+        """Initialize the replay provider by loading the transcripts"""
+        try:
+            if not self.transcripts_path:
+                logger.error("Replay transcripts file not provided (set LLM_REPLAY_FILE)")
+                return False
+
+            for entry in load_transcripts(self.transcripts_path):
+                answer = entry.get("answer")
+                if not answer:
+                    continue
+                self.answers.setdefault(entry.get("prompt_hash"), []).append(answer)
+                self.all_answers.append(answer)
+
+                latency = entry.get("latency_seconds")
+                if latency is None:
+                    continue
+                tokens = max(1, entry.get("completion_tokens") or len(answer.split()))
+                self.token_seconds.append(latency / tokens)
+
+            if not self.all_answers:
+                logger.error(f"No answers found in {self.transcripts_path}")
+                return False
+
+            self.initialized = True
+            logger.info(f"Replay provider initialized with {len(self.all_answers)} recorded answers")
+            return True
 
         except Exception as e:
-            logger.error(f"Error answering question with DeepSeek: {e}")
-            return f"I'm sorry, I encountered an error while processing your question: {str(e)}"
+            logger.error(f"Error initializing replay provider: {e}")
+            return False
+
+    def get_llm(self) -> Any:
+        """Get the replay LLM instance"""
+        return None
+
+    def _pick(self, question: str, context: Optional[List[str]]) -> tuple:
+        """Pick a recorded answer for the prompt and a recorded time per token"""
+        recorded = self.answers.get(prompt_hash(question, context))
+        if recorded:
+            metrics.increment("replay.hits")
+        else:
+            # Unrecorded prompts still get a realistic answer so load tests keep going
+            metrics.increment("replay.misses")
+            recorded = self.all_answers
+
+        answer = self.random.choice(recorded)
+        per_token = self.random.choice(self.token_seconds) if self.token_seconds else 0.0
+        return answer, per_token * self.latency_scale
+
+    def generate_answer(self, question: str, context: Optional[List[str]] = None, timeout: Optional[float] = None) -> str:
+        """Answer a question from the recorded transcripts after a recorded delay"""
+        call_timeout = self.call_timeout(timeout)
+        answer, per_token = self._pick(question, context)
+        delay = per_token * len(answer.split())
+        if delay > call_timeout:
+            time.sleep(call_timeout)
+            raise DeadlineExceeded(f"Replayed answer takes {delay:.1f}s, more than the {call_timeout:.1f}s allowed")
+        time.sleep(delay)
+        return answer
+
+    async def agenerate_answer(self, question: str, context: Optional[List[str]] = None, timeout: Optional[float] = None) -> str:
+        """Answer a question from the recorded transcripts after a recorded, non-blocking delay"""
+        call_timeout = self.call_timeout(timeout)
+        answer, per_token = self._pick(question, context)
+        delay = per_token * len(answer.split())
+        if delay > call_timeout:
+            await asyncio.sleep(call_timeout)
+            raise DeadlineExceeded(f"Replayed answer takes {delay:.1f}s, more than the {call_timeout:.1f}s allowed")
+        await asyncio.sleep(delay)
+        return answer
+
+    def stream_answer(self, question: str, context: Optional[List[str]] = None) -> Iterator[str]:
+        """
+        Stream a recorded answer word by word, spreading a recorded latency evenly over the words
+
+        Transcripts hold no time to first token, since providers return whole answers, so the
+        first word takes as long as any other.
+        """
+        if not self.initialized and not self.initialize():
+            yield "I'm sorry, I couldn't initialize the language model. Please try again later."
+            return
+
+        answer, per_token = self._pick(question, context)
+        controller = get_admission_controller(self.name)
+        with controller.admit(estimate_prompt_tokens(question, context) + self.max_tokens):
+            words = answer.split(" ")
+            for index, word in enumerate(words):
+                time.sleep(per_token)
+                yield word if index == len(words) - 1 else word + " "
 
 def get_llm_provider(provider_type: str = None) -> BaseLLMProvider:
     """Get an LLM provider based on the specified type"""
     provider_type = provider_type or os.environ.get("LLM_PROVIDER", "mock")
 
-    # Log all environment variables for debugging (excluding sensitive values)
-    logger.info("Environment variables:")
-    for key, value in os.environ.items():
-        if key in ["OPENAI_API_KEY", "DEEPSEEK_API_KEY"]:
-            value_preview = value[:5] + "..." if value else "None"
-            logger.info(f"  {key}: {value_preview}")
-        elif key.lower() in ["llm_provider", "deepseek_model", "openai_model"]:
-            logger.info(f"  {key}: {value}")
-
     logger.info(f"Selected provider type: {provider_type}")
 
+    from provider_registry import provider_registry
+
+    provider = provider_registry.get(provider_type)
+    if isinstance(provider, MockProvider):
+        return provider
+
+    # Comma-separated list of providers to hedge and fail over to, e.g. "openai,ollama"
+    fallback_types = [
+        fallback_type.strip().lower()
+        for fallback_type in os.environ.get("LLM_FALLBACK_PROVIDERS", "").split(",")
+        if fallback_type.strip() and fallback_type.strip().lower() != provider_type.lower()
+    ]
+    if not fallback_types:
+        return provider
+
+    return provider_registry.get_router(provider_type, fallback_types)
+
+def create_provider(provider_type: str, model: Optional[str] = None) -> BaseLLMProvider:
+    """Create a single LLM provider of the specified type, optionally overriding its model"""
+    model_kwargs = {"model": model} if model else {}
+
     if provider_type.lower() == "openai":
         logger.info("Creating OpenAI provider")
-        return OpenAIProvider()
+        return OpenAIProvider(**model_kwargs)
     elif provider_type.lower() == "deepseek":
         logger.info("Creating DeepSeek provider")
-        return DeepSeekProvider()
+        return DeepSeekProvider(**model_kwargs)
     elif provider_type.lower() == "ollama":
         logger.info("Creating Ollama provider")
-        return OllamaProvider()
+        return OllamaProvider(**model_kwargs)
+    elif provider_type.lower() == "replay":
+        logger.info("Creating Replay provider")
+        return ReplayProvider()
     else:
         logger.info(f"Creating Mock provider (unknown type: {provider_type})")
         return MockProvider()
@@ -0,0 +1,73 @@
+"""
+In-process metrics for Star College Chatbot
+"""
+import threading
+import logging
+from typing import Any, Callable, Dict, List
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class MetricsRegistry:
+    """Thread-safe registry of counters, gauges and snapshot collectors"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, Any] = {}
+        self._collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """Increment a counter"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: Any) -> None:
+        """Set a gauge to its current value"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def register_collector(self, name: str, collector: Callable[[], Dict[str, Any]]) -> None:
+        """
+        Register a callable that is asked for its values on every snapshot
+
+        Args:
+            name: Section name the collector's values are reported under
+            collector: Callable returning a JSON-serialisable dictionary
+        """
+        with self._lock:
+            self._collectors[name] = collector
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Take a snapshot of all metrics
+
+        Returns:
+            Dictionary with counters, gauges and one entry per collector
+        """
+        with self._lock:
+            result: Dict[str, Any] = {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+            }
+            collectors: List = list(self._collectors.items())
+
+        # Collectors take their own locks, so call them outside ours
+        for name, collector in collectors:
+            try:
+                result[name] = collector()
+            except Exception as e:
+                logger.error(f"Error collecting metrics for {name}: {e}")
+                result[name] = {"error": str(e)}
+
+        return result
+
+    def reset(self) -> None:
+        """Clear all counters and gauges (collectors are kept)"""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+
+# Process-wide registry shared by the server and providers
+metrics = MetricsRegistry()
@@ -0,0 +1,132 @@
+"""
+Prompt construction for Star College Chatbot LLM providers
+
+Prompts are laid out so upstream prompt caching can reuse as much as possible: the static
+system and instruction block always comes first and is byte-identical across requests,
+followed by the retrieved context and finally the question.
+"""
+import json
+import hashlib
+from typing import Optional, Dict, Any, List
+
+SYSTEM_PROMPT = """You are StarBot, a helpful assistant for Star College Durban.
+
+Use ONLY the context provided with each question to answer it. If the answer is not in the context, say "I don't have enough information to answer that question."
+
+Format your answer in a readable, user-friendly style following these guidelines:
+1. Use proper paragraphs with line breaks between them
+2. Use bullet points for lists
+3. Use headers (with bold formatting) for different sections when appropriate
+4. Keep paragraphs short and focused on one idea
+5. Use a conversational, helpful tone
+6. Organize information logically
+7. Highlight important information"""
+
+NO_CONTEXT = "No additional context provided."
+
+def format_context(context: Optional[List[str]] = None) -> str:
+    """
+    Join context passages into a single block
+
+    Args:
+        context: Retrieved passages
+
+    Returns:
+        Context text with surrounding whitespace removed from each passage
+    """
+    passages = [passage.strip() for passage in context or [] if passage and passage.strip()]
+    return "\n\n".join(passages) if passages else NO_CONTEXT
+
+def build_user_message(question: str, context: Optional[List[str]] = None) -> str:
+    """
+    Build the per-request part of the prompt
+
+    Args:
+        question: User question
+        context: Retrieved passages
+
+    Returns:
+        Context followed by the question
+    """
+    return f"Context:\n{format_context(context)}\n\nQuestion: {question.strip()}"
+
+def build_messages(question: str, context: Optional[List[str]] = None) -> List[Dict[str, str]]:
+    """
+    Build chat-completion messages for a question
+
+    Args:
+        question: User question
+        context: Retrieved passages
+
+    Returns:
+        List of messages starting with the static system prompt
+    """
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": build_user_message(question, context)}
+    ]
+
+def build_prompt(question: str, context: Optional[List[str]] = None) -> str:
+    """
+    Build a single completion prompt for a question
+
+    Args:
+        question: User question
+        context: Retrieved passages
+
+    Returns:
+        Prompt string starting with the static system prompt
+    """
+    return f"{SYSTEM_PROMPT}\n\n{build_user_message(question, context)}\n\nAnswer:"
+
+def prompt_hash(question: str, context: Optional[List[str]] = None) -> str:
+    """
+    Hash the full prompt for a question
+
+    Args:
+        question: User question
+        context: Retrieved passages
+
+    Returns:
+        Hex SHA-256 of the chat messages, identical for identical prompts
+    """
+    payload = json.dumps(build_messages(question, context), ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def estimate_prompt_tokens(question: str, context: Optional[List[str]] = None) -> int:
+    """
+    Roughly estimate the prompt size in tokens without a tokenizer
+
+    Args:
+        question: User question
+        context: Retrieved passages
+
+    Returns:
+        Estimated token count (about four characters per token)
+    """
+    return (len(SYSTEM_PROMPT) + len(build_user_message(question, context))) // 4
+
+def normalize_usage(usage: Optional[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Extract token counts from an OpenAI or DeepSeek usage object
+
+    OpenAI reports cache hits in prompt_tokens_details.cached_tokens, DeepSeek in
+    prompt_cache_hit_tokens.
+
+    Args:
+        usage: The "usage" field of a chat-completion response
+
+    Returns:
+        Dictionary with prompt_tokens, cached_prompt_tokens and completion_tokens
+    """
+    usage = usage or {}
+    details = usage.get("prompt_tokens_details") or {}
+    cached = details.get("cached_tokens")
+    if cached is None:
+        cached = usage.get("prompt_cache_hit_tokens", 0)
+
+    return {
+        "prompt_tokens": usage.get("prompt_tokens") or 0,
+        "cached_prompt_tokens": cached or 0,
+        "completion_tokens": usage.get("completion_tokens") or 0,
+    }
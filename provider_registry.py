@@ -0,0 +1,218 @@
+"""
+Process-wide registry of LLM providers and their cached health
+"""
+import os
+import time
+import threading
+import logging
+from typing import Optional, Dict, Any, List
+
+from llm_providers import BaseLLMProvider, create_provider
+from metrics import metrics
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class HealthState:
+    """Result of the most recent health check of a provider"""
+
+    def __init__(self, healthy: Optional[bool] = None, checked_at: float = 0.0, error: Optional[str] = None):
+        """
+        Initialize the health state
+
+        Args:
+            healthy: True or False once checked, None while unknown
+            checked_at: time.monotonic() timestamp of the check
+            error: Error message if the check raised
+        """
+        self.healthy = healthy
+        self.checked_at = checked_at
+        self.error = error
+
+    def is_fresh(self, ttl: float) -> bool:
+        """Check whether the state is younger than the TTL"""
+        return self.healthy is not None and time.monotonic() - self.checked_at < ttl
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the state as a dictionary"""
+        return {
+            "healthy": self.healthy,
+            "age_seconds": round(time.monotonic() - self.checked_at, 1) if self.checked_at else None,
+            "error": self.error,
+        }
+
+class ProviderRegistry:
+    """
+    Builds each provider once per process and caches its health with a TTL
+
+    Health checks never run on the request path: a stale entry is returned as-is while
+    a refresh runs in a background thread.
+    """
+
+    def __init__(self, health_ttl: float = 300.0, check_timeout: float = 5.0):
+        """
+        Initialize the registry
+
+        Args:
+            health_ttl: Seconds a health check result stays valid
+            check_timeout: Timeout in seconds for a single health check
+        """
+        self.health_ttl = health_ttl
+        self.check_timeout = check_timeout
+        self._lock = threading.Lock()
+        self._providers: Dict[str, BaseLLMProvider] = {}
+        self._routers: Dict[str, BaseLLMProvider] = {}
+        self._health: Dict[str, HealthState] = {}
+        self._checks_in_flight = set()
+        self._stop_event = threading.Event()
+        self._checker_thread: Optional[threading.Thread] = None
+
+        metrics.register_collector("provider_health", self.snapshot)
+
+    def get(self, provider_type: str, model: Optional[str] = None) -> BaseLLMProvider:
+        """
+        Get the provider of a type, creating it on first use
+
+        Args:
+            provider_type: Provider type such as "openai", "deepseek" or "ollama"
+            model: Optional model overriding the provider's default
+
+        Returns:
+            The shared provider instance
+        """
+        key = f"{provider_type.lower()}:{model}" if model else provider_type.lower()
+        with self._lock:
+            provider = self._providers.get(key)
+            if provider is None:
+                provider = create_provider(provider_type.lower(), model)
+                self._providers[key] = provider
+        return provider
+
+    def get_router(self, provider_type: str, fallback_types: List[str]) -> BaseLLMProvider:
+        """
+        Get the router for a primary provider and its fallbacks, creating it on first use
+
+        Args:
+            provider_type: Primary provider type
+            fallback_types: Provider types to hedge and fail over to, in order
+
+        Returns:
+            The shared ProviderRouter instance
+        """
+        from provider_router import ProviderRouter
+
+        key = ",".join([provider_type.lower()] + fallback_types)
+        providers = [self.get(provider_type)] + [self.get(fallback_type) for fallback_type in fallback_types]
+        with self._lock:
+            router = self._routers.get(key)
+            if router is None:
+                logger.info(f"Creating provider router with fallbacks: {', '.join(fallback_types)}")
+                router = ProviderRouter(
+                    providers,
+                    default_budget=float(os.environ.get("LLM_HEDGE_BUDGET", "8.0"))
+                )
+                self._routers[key] = router
+        return router
+
+    def health(self, provider_type: str) -> HealthState:
+        """
+        Get the cached health of a provider without blocking
+
+        A missing or stale entry schedules a background refresh.
+
+        Args:
+            provider_type: Provider type
+
+        Returns:
+            The last known health state (healthy is None if never checked)
+        """
+        key = provider_type.lower()
+        with self._lock:
+            state = self._health.get(key)
+            known = key in self._providers
+
+        if known and (state is None or not state.is_fresh(self.health_ttl)):
+            self.refresh_async(key)
+
+        return state or HealthState()
+
+    def refresh_async(self, provider_type: str) -> None:
+        """Run a health check for a provider in a background thread"""
+        key = provider_type.lower()
+        with self._lock:
+            if key in self._checks_in_flight or key not in self._providers:
+                return
+            self._checks_in_flight.add(key)
+
+        thread = threading.Thread(target=self.check_now, args=(key,), name=f"health-{key}", daemon=True)
+        thread.start()
+
+    def check_now(self, provider_type: str) -> HealthState:
+        """
+        Run a health check for a provider and cache the result
+
+        Args:
+            provider_type: Provider type
+
+        Returns:
+            The new health state
+        """
+        key = provider_type.lower()
+        with self._lock:
+            provider = self._providers.get(key)
+
+        try:
+            if provider is None:
+                return HealthState()
+
+            try:
+                state = HealthState(bool(provider.check_health(timeout=self.check_timeout)), time.monotonic())
+            except Exception as e:
+                logger.warning(f"Health check for {key} provider failed: {e}")
+                state = HealthState(False, time.monotonic(), str(e))
+
+            with self._lock:
+                self._health[key] = state
+            metrics.set_gauge(f"provider_health.{key}", state.healthy)
+            return state
+
+        finally:
+            with self._lock:
+                self._checks_in_flight.discard(key)
+
+    def start_health_checks(self, interval: float = 60.0) -> None:
+        """
+        Periodically check every registered provider in a background thread
+
+        Args:
+            interval: Seconds between rounds of checks
+        """
+        if self._checker_thread and self._checker_thread.is_alive():
+            return
+
+        self._stop_event.clear()
+
+        def run():
+            while not self._stop_event.is_set():
+                with self._lock:
+                    provider_types = list(self._providers)
+                for provider_type in provider_types:
+                    self.check_now(provider_type)
+                self._stop_event.wait(interval)
+
+        self._checker_thread = threading.Thread(target=run, name="provider-health", daemon=True)
+        self._checker_thread.start()
+        logger.info(f"Started provider health checks every {interval:.0f}s")
+
+    def stop_health_checks(self) -> None:
+        """Stop the periodic health checks"""
+        self._stop_event.set()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get the health of every registered provider"""
+        with self._lock:
+            return {key: self._health.get(key, HealthState()).to_dict() for key in self._providers}
+
+# Process-wide registry used by get_llm_provider
+provider_registry = ProviderRegistry()
@@ -0,0 +1,368 @@
+"""
+Latency-aware routing and request hedging across LLM providers
+"""
+import time
+import asyncio
+import threading
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Optional, Dict, Any, List
+
+from llm_providers import BaseLLMProvider
+from circuit_breaker import OPEN, get_circuit_breaker
+from deadline import DeadlineExceeded
+from metrics import metrics
+from provider_registry import provider_registry
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class ProviderStats:
+    """Rolling latency and error statistics for a single provider"""
+
+    def __init__(self, window_size: int = 200):
+        """
+        Initialize the statistics window
+
+        Args:
+            window_size: Number of most recent calls to keep
+        """
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window_size)
+        self._outcomes = deque(maxlen=window_size)
+        self.total_calls = 0
+        self.total_errors = 0
+
+    def record(self, latency: float, success: bool) -> None:
+        """Record the latency and outcome of one call"""
+        with self._lock:
+            self._outcomes.append(success)
+            self.total_calls += 1
+            if success:
+                # Only successful calls say anything about how fast answers arrive
+                self._latencies.append(latency)
+            else:
+                self.total_errors += 1
+
+    @property
+    def sample_count(self) -> int:
+        """Number of latency samples in the window"""
+        with self._lock:
+            return len(self._latencies)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """
+        Get a latency percentile over the window
+
+        Args:
+            pct: Percentile between 0 and 100
+
+        Returns:
+            Latency in seconds, or None if there are no samples yet
+        """
+        with self._lock:
+            samples = sorted(self._latencies)
+
+        if not samples:
+            return None
+
+        # Nearest-rank percentile
+        rank = max(1, int(round(pct / 100.0 * len(samples))))
+        return samples[min(rank, len(samples)) - 1]
+
+    def error_rate(self) -> float:
+        """Fraction of failed calls over the window"""
+        with self._lock:
+            if not self._outcomes:
+                return 0.0
+            return self._outcomes.count(False) / len(self._outcomes)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get the statistics as a dictionary"""
+        return {
+            "samples": self.sample_count,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "error_rate": self.error_rate(),
+            "total_calls": self.total_calls,
+            "total_errors": self.total_errors,
+        }
+
+class ProviderRouter(BaseLLMProvider):
+    """
+    Provider that routes each question to the healthiest provider and hedges slow calls
+
+    The primary call gets a budget equal to its provider's rolling p95 latency. If no answer
+    has arrived by then, the same question is sent to the next provider and whichever answer
+    arrives first is returned. Failed calls fail over to the next provider immediately.
+    """
+
+    name = "router"
+    # Each routed provider applies its own admission control and circuit breaker
+    calls_upstream = False
+
+    def __init__(self,
+                 providers: List[BaseLLMProvider],
+                 default_budget: float = 8.0,
+                 min_samples: int = 20,
+                 max_hedges: int = 1,
+                 max_error_rate: float = 0.5,
+                 max_workers: int = 16):
+        """
+        Initialize the router
+
+        Args:
+            providers: Providers in order of preference
+            default_budget: Hedge budget in seconds until enough latency samples exist
+            min_samples: Number of samples needed before the p95 budget is trusted
+            max_hedges: Maximum number of extra requests sent because of slowness
+            max_error_rate: Providers above this error rate are demoted in the ranking
+            max_workers: Size of the thread pool running upstream calls
+        """
+        super().__init__()
+        self.providers = providers
+        self.default_budget = default_budget
+        self.min_samples = min_samples
+        self.max_hedges = max_hedges
+        self.max_error_rate = max_error_rate
+        self.stats = {provider.name: ProviderStats() for provider in providers}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-router")
+
+        metrics.register_collector("providers", self.stats_snapshot)
+
+    def initialize(self) -> bool:
+        """Initialize every provider, succeeding if at least one is usable"""
+        available = []
+        for provider in self.providers:
+            if provider.initialized or provider.initialize():
+                available.append(provider)
+            else:
+                logger.warning(f"Provider {provider.name} could not be initialized and will not be routed to")
+
+        if not available:
+            logger.error("No LLM providers could be initialized for the router")
+            return False
+
+        self.providers = available
+        self.initialized = True
+        logger.info(f"Provider router initialized with: {', '.join(p.name for p in available)}")
+        return True
+
+    def get_llm(self) -> Any:
+        """Get the LLM instance of the preferred provider"""
+        ranked = self.ranked_providers()
+        return ranked[0].get_llm() if ranked else None
+
+    def ranked_providers(self) -> List[BaseLLMProvider]:
+        """
+        Rank providers for the next request
+
+        Healthy providers keep their configured order; providers whose error rate is above
+        the threshold, whose last health check failed or whose circuit is open go to the back,
+        least failing first.
+
+        Returns:
+            Providers in the order they should be tried
+        """
+        healthy = []
+        degraded = []
+        for provider in self.providers:
+            unhealthy = (
+                provider_registry.health(provider.name).healthy is False
+                or get_circuit_breaker(provider.name).state == OPEN
+            )
+            if unhealthy or self.stats[provider.name].error_rate() > self.max_error_rate:
+                degraded.append(provider)
+            else:
+                healthy.append(provider)
+
+        degraded.sort(key=lambda p: self.stats[p.name].error_rate())
+        return healthy + degraded
+
+    def hedge_budget(self, provider: BaseLLMProvider) -> float:
+        """
+        Get how long to wait for a provider before hedging
+
+        Args:
+            provider: Provider the request was sent to
+
+        Returns:
+            Budget in seconds
+        """
+        stats = self.stats[provider.name]
+        if stats.sample_count < self.min_samples:
+            return self.default_budget
+        return stats.percentile(95)
+
+    def generate_answer(self, question: str, context: Optional[List[str]] = None, timeout: Optional[float] = None) -> str:
+        """Answer a question using the first provider to respond successfully within timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        candidates = self.ranked_providers()
+        if not candidates:
+            raise RuntimeError("No LLM providers available")
+
+        pending = {}
+        launched = 0
+        hedges = 0
+        last_error: Optional[Exception] = None
+
+        def launch() -> BaseLLMProvider:
+            nonlocal launched
+            provider = candidates[launched]
+            launched += 1
+            remaining = None if deadline is None else deadline - time.monotonic()
+            future = self._executor.submit(self._call_provider, provider, question, context, remaining)
+            pending[future] = provider
+            return provider
+
+        budget = self.hedge_budget(launch())
+
+        while pending:
+            # Only wait on the budget while there is someone left to hedge to
+            can_hedge = launched < len(candidates) and hedges < self.max_hedges
+            wait_timeout = budget if can_hedge else None
+            if deadline is not None:
+                remaining = max(0.0, deadline - time.monotonic())
+                wait_timeout = remaining if wait_timeout is None else min(wait_timeout, remaining)
+            done, _ = wait(list(pending), timeout=wait_timeout, return_when=FIRST_COMPLETED)
+
+            if not done and deadline is not None and time.monotonic() >= deadline:
+                # Calls still in flight time out on their own budgets and free their threads
+                raise DeadlineExceeded(f"No provider answered within {timeout:.1f}s")
+
+            if not done:
+                hedges += 1
+                hedge = launch()
+                metrics.increment("provider_router.hedged_requests")
+                logger.info(f"Primary exceeded its {budget:.2f}s budget, hedging to {hedge.name}")
+                budget = self.hedge_budget(hedge)
+                continue
+
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    answer = future.result()
+                except Exception as e:
+                    last_error = e
+                    logger.warning(f"Provider {provider.name} failed: {e}")
+                    continue
+
+                metrics.increment(f"provider_router.wins.{provider.name}")
+                return answer
+
+            # Everything in flight failed, so fail over to the next provider
+            if not pending and launched < len(candidates):
+                metrics.increment("provider_router.failovers")
+                budget = self.hedge_budget(launch())
+
+        raise last_error or RuntimeError("All LLM providers failed")
+
+    async def agenerate_answer(self, question: str, context: Optional[List[str]] = None, timeout: Optional[float] = None) -> str:
+        """Async version of generate_answer; calls that lose the race are cancelled"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        candidates = self.ranked_providers()
+        if not candidates:
+            raise RuntimeError("No LLM providers available")
+
+        pending = {}
+        launched = 0
+        hedges = 0
+        last_error: Optional[Exception] = None
+
+        def launch() -> BaseLLMProvider:
+            nonlocal launched
+            provider = candidates[launched]
+            launched += 1
+            remaining = None if deadline is None else deadline - time.monotonic()
+            task = asyncio.ensure_future(self._acall_provider(provider, question, context, remaining))
+            pending[task] = provider
+            return provider
+
+        try:
+            budget = self.hedge_budget(launch())
+
+            while pending:
+                can_hedge = launched < len(candidates) and hedges < self.max_hedges
+                wait_timeout = budget if can_hedge else None
+                if deadline is not None:
+                    remaining = max(0.0, deadline - time.monotonic())
+                    wait_timeout = remaining if wait_timeout is None else min(wait_timeout, remaining)
+                done, _ = await asyncio.wait(list(pending), timeout=wait_timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done and deadline is not None and time.monotonic() >= deadline:
+                    raise DeadlineExceeded(f"No provider answered within {timeout:.1f}s")
+
+                if not done:
+                    hedges += 1
+                    hedge = launch()
+                    metrics.increment("provider_router.hedged_requests")
+                    logger.info(f"Primary exceeded its {budget:.2f}s budget, hedging to {hedge.name}")
+                    budget = self.hedge_budget(hedge)
+                    continue
+
+                for task in done:
+                    provider = pending.pop(task)
+                    try:
+                        answer = task.result()
+                    except Exception as e:
+                        last_error = e
+                        logger.warning(f"Provider {provider.name} failed: {e}")
+                        continue
+
+                    metrics.increment(f"provider_router.wins.{provider.name}")
+                    return answer
+
+                if not pending and launched < len(candidates):
+                    metrics.increment("provider_router.failovers")
+                    budget = self.hedge_budget(launch())
+
+            raise last_error or RuntimeError("All LLM providers failed")
+
+        finally:
+            # Unlike threads, losing or abandoned calls can be cancelled outright
+            for task in pending:
+                task.cancel()
+
+    async def _acall_provider(self, provider: BaseLLMProvider, question: str, context: Optional[List[str]], timeout: Optional[float] = None) -> str:
+        """Async version of _call_provider"""
+        if not provider.initialized and not await asyncio.to_thread(provider.initialize):
+            self.stats[provider.name].record(0.0, False)
+            raise RuntimeError(f"Provider {provider.name} is not initialized")
+
+        start = time.monotonic()
+        try:
+            answer = await provider.arequest_answer(question, context, timeout=timeout)
+        except DeadlineExceeded:
+            raise
+        except Exception:
+            self.stats[provider.name].record(time.monotonic() - start, False)
+            raise
+
+        self.stats[provider.name].record(time.monotonic() - start, True)
+        return answer
+
+    def _call_provider(self, provider: BaseLLMProvider, question: str, context: Optional[List[str]], timeout: Optional[float] = None) -> str:
+        """Call one provider and record its latency and outcome"""
+        if not provider.initialized and not provider.initialize():
+            self.stats[provider.name].record(0.0, False)
+            raise RuntimeError(f"Provider {provider.name} is not initialized")
+
+        start = time.monotonic()
+        try:
+            answer = provider.request_answer(question, context, timeout=timeout)
+        except DeadlineExceeded:
+            # Running out of the caller's budget says nothing about the provider
+            raise
+        except Exception:
+            self.stats[provider.name].record(time.monotonic() - start, False)
+            raise
+
+        self.stats[provider.name].record(time.monotonic() - start, True)
+        return answer
+
+    def stats_snapshot(self) -> Dict[str, Any]:
+        """Get the statistics of every provider"""
+        return {name: stats.snapshot() for name, stats in self.stats.items()}
@@ -0,0 +1,379 @@
+"""
+Per-provider admission control for upstream LLM calls
+
+Each provider gets one AdmissionController per process, shared by all threads. It caps the
+number of concurrent upstream calls, keeps request and token rates under the upstream
+per-minute limits with token buckets, and queues callers in FIFO order up to a deadline
+instead of letting them run into HTTP 429 errors.
+"""
+import os
+import time
+import asyncio
+import threading
+import logging
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+from typing import Optional, Dict, Any, Iterator, AsyncIterator
+
+from metrics import metrics
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Limits of a provider without <NAME>_MAX_CONCURRENCY or <NAME>_QUEUE_SIZE, for sync workers;
+# an async process keeps far more requests in flight and raises them with set_default_limits
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_MAX_QUEUE = 64
+ASYNC_MAX_CONCURRENCY = 256
+ASYNC_MAX_QUEUE = 1024
+
+class AdmissionError(RuntimeError):
+    """Raised when a call cannot be admitted before its deadline or the queue is full"""
+
+class _AsyncTicket:
+    """Place in line of an asyncio task, woken through its event loop when it may go"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.future: Optional[asyncio.Future] = None
+
+    def wake(self) -> None:
+        """Wake the task from any thread (caller holds the controller lock)"""
+        future = self.future
+        if future is not None:
+            self.loop.call_soon_threadsafe(self._set, future)
+
+    @staticmethod
+    def _set(future: asyncio.Future) -> None:
+        if not future.done():
+            future.set_result(None)
+
+class TokenBucket:
+    """Token bucket refilled continuously at a per-minute rate (not thread-safe on its own)"""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        """
+        Initialize the bucket
+
+        Args:
+            rate_per_minute: Refill rate in units per minute
+            capacity: Maximum burst size (defaults to one minute's worth)
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.available = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay(self, amount: float) -> float:
+        """
+        Get how long until an amount can be taken
+
+        Args:
+            amount: Units needed (clamped to the capacity)
+
+        Returns:
+            Seconds to wait, 0 if the amount is available now
+        """
+        self._refill()
+        missing = min(amount, self.capacity) - self.available
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float) -> None:
+        """Take an amount, letting the balance go negative if it is not all there"""
+        self._refill()
+        self.available -= min(amount, self.capacity)
+
+class AdmissionController:
+    """
+    Concurrency cap, request/token rate limits and a bounded FIFO wait queue
+
+    Threads and asyncio tasks share one queue: threads block on a condition variable,
+    while a task awaits a future that is set, through its event loop, when it reaches the
+    front of the queue or a slot frees up.
+    """
+
+    def __init__(self,
+                 name: str,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None,
+                 max_queue: int = DEFAULT_MAX_QUEUE,
+                 queue_timeout: float = 30.0):
+        """
+        Initialize the admission controller
+
+        Args:
+            name: Provider name, used in logs and metrics
+            max_concurrency: Maximum number of calls in flight
+            requests_per_minute: Upstream request limit, None for unlimited
+            tokens_per_minute: Upstream token limit, None for unlimited
+            max_queue: Maximum number of callers waiting for admission
+            queue_timeout: Default number of seconds a caller may wait
+        """
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+        self._condition = threading.Condition()
+        self._queue = deque()
+        self._active = 0
+        self._paused_until = 0.0
+        self.admitted = 0
+        self.rejected = 0
+
+    def _rate_delay(self, tokens: int) -> float:
+        """Seconds until the rate limits allow a call (caller holds the lock)"""
+        delay = max(0.0, self._paused_until - time.monotonic())
+        if self.request_bucket:
+            delay = max(delay, self.request_bucket.delay(1))
+        if self.token_bucket and tokens:
+            delay = max(delay, self.token_bucket.delay(tokens))
+        return delay
+
+    def _notify(self) -> None:
+        """Wake the waiters after a slot or the front of the queue changed (caller holds the lock)"""
+        self._condition.notify_all()
+        # Only the caller at the front can be admitted; threads recheck on their own
+        if self._queue and isinstance(self._queue[0], _AsyncTicket):
+            self._queue[0].wake()
+
+    def _enqueue(self, ticket: object) -> None:
+        """Join the wait queue (caller holds the lock)"""
+        if len(self._queue) >= self.max_queue:
+            self.rejected += 1
+            metrics.increment(f"admission.{self.name}.rejected")
+            raise AdmissionError(f"Too many requests waiting for {self.name}")
+        self._queue.append(ticket)
+
+    def _admission_delay(self, ticket: object, tokens: int) -> Optional[float]:
+        """
+        Seconds until a ticket can be admitted (caller holds the lock)
+
+        Returns:
+            0 if it can go now, the rate-limit delay if it is next in line with a free slot,
+            or None if it has to wait for the callers ahead of it or for a slot
+        """
+        if self._queue[0] is ticket and self._active < self.max_concurrency:
+            return self._rate_delay(tokens)
+        return None
+
+    def _admit(self, tokens: int) -> None:
+        """Take rate-limit capacity and a concurrency slot (caller holds the lock)"""
+        if self.request_bucket:
+            self.request_bucket.take(1)
+        if self.token_bucket and tokens:
+            self.token_bucket.take(tokens)
+        self._active += 1
+        self.admitted += 1
+
+    def _time_out(self) -> AdmissionError:
+        """Count a caller that gave up waiting (caller holds the lock)"""
+        self.rejected += 1
+        metrics.increment(f"admission.{self.name}.timed_out")
+        return AdmissionError(f"Timed out waiting for {self.name} capacity")
+
+    def acquire(self, tokens: int = 0, timeout: Optional[float] = None) -> None:
+        """
+        Wait for admission
+
+        Args:
+            tokens: Estimated tokens the call will consume
+            timeout: Seconds to wait at most (defaults to queue_timeout)
+
+        Raises:
+            AdmissionError: If the queue is full or the deadline passes
+        """
+        deadline = time.monotonic() + (self.queue_timeout if timeout is None else timeout)
+        ticket = object()
+
+        with self._condition:
+            self._enqueue(ticket)
+            try:
+                while True:
+                    wait_for = self._admission_delay(ticket, tokens)
+                    if wait_for == 0:
+                        break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise self._time_out()
+
+                    self._condition.wait(remaining if wait_for is None else min(wait_for, remaining))
+
+                self._admit(tokens)
+            finally:
+                self._queue.remove(ticket)
+                # The next caller in line may now be able to go
+                self._notify()
+
+        metrics.increment(f"admission.{self.name}.admitted")
+
+    async def acquire_async(self, tokens: int = 0, timeout: Optional[float] = None) -> None:
+        """
+        Wait for admission from a coroutine, without blocking the event loop
+
+        Args:
+            tokens: Estimated tokens the call will consume
+            timeout: Seconds to wait at most (defaults to queue_timeout)
+
+        Raises:
+            AdmissionError: If the queue is full or the deadline passes
+        """
+        deadline = time.monotonic() + (self.queue_timeout if timeout is None else timeout)
+        loop = asyncio.get_running_loop()
+        ticket = _AsyncTicket(loop)
+
+        with self._condition:
+            self._enqueue(ticket)
+        try:
+            while True:
+                with self._condition:
+                    wait_for = self._admission_delay(ticket, tokens)
+                    if wait_for == 0:
+                        self._admit(tokens)
+                        break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise self._time_out()
+
+                    # Created under the lock, so a wake-up after the check is not missed
+                    ticket.future = loop.create_future()
+
+                await asyncio.wait([ticket.future], timeout=remaining if wait_for is None else min(wait_for, remaining))
+        finally:
+            with self._condition:
+                ticket.future = None
+                self._queue.remove(ticket)
+                self._notify()
+
+        metrics.increment(f"admission.{self.name}.admitted")
+
+    def release(self) -> None:
+        """Release a concurrency slot"""
+        with self._condition:
+            self._active -= 1
+            self._notify()
+
+    @contextmanager
+    def admit(self, tokens: int = 0, timeout: Optional[float] = None) -> Iterator[None]:
+        """Hold a concurrency slot for the duration of a with-block"""
+        self.acquire(tokens, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def admit_async(self, tokens: int = 0, timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """Hold a concurrency slot for the duration of an async with-block"""
+        await self.acquire_async(tokens, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def backoff(self, seconds: float) -> None:
+        """Stop admitting new calls for a while, e.g. after an upstream 429"""
+        with self._condition:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        metrics.increment(f"admission.{self.name}.rate_limited")
+        logger.warning(f"{self.name} is rate limited, pausing admissions for {seconds:.1f}s")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get the controller state as a dictionary"""
+        with self._condition:
+            return {
+                "active": self._active,
+                "waiting": len(self._queue),
+                "max_concurrency": self.max_concurrency,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+            }
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """
+    Get the back-off requested by an upstream rate-limit error
+
+    Args:
+        error: Exception raised by a provider call
+
+    Returns:
+        Seconds to wait if the error is an HTTP 429, otherwise None
+    """
+    # requests.HTTPError and openai.RateLimitError both carry the response
+    response = getattr(error, "response", None)
+    status_code = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    if status_code != 429:
+        return None
+
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After", 1.0))
+    except (TypeError, ValueError):
+        return 1.0
+
+_controllers: Dict[str, AdmissionController] = {}
+_controllers_lock = threading.Lock()
+_default_limits = {"max_concurrency": DEFAULT_MAX_CONCURRENCY, "max_queue": DEFAULT_MAX_QUEUE}
+
+def set_default_limits(max_concurrency: int, max_queue: int) -> None:
+    """
+    Set the limits of providers without their own, for controllers created from now on
+
+    Args:
+        max_concurrency: Maximum number of calls in flight per provider
+        max_queue: Maximum number of callers waiting per provider
+    """
+    with _controllers_lock:
+        _default_limits.update(max_concurrency=max_concurrency, max_queue=max_queue)
+
+def _env_float(name: str) -> Optional[float]:
+    value = os.environ.get(name)
+    return float(value) if value else None
+
+def get_admission_controller(provider_name: str) -> AdmissionController:
+    """
+    Get the process-wide admission controller for a provider
+
+    Limits are read from <NAME>_MAX_CONCURRENCY, <NAME>_RPM, <NAME>_TPM,
+    <NAME>_QUEUE_SIZE and <NAME>_QUEUE_TIMEOUT, e.g. DEEPSEEK_RPM; see set_default_limits
+    for those not set.
+
+    Args:
+        provider_name: Provider name
+
+    Returns:
+        The shared controller
+    """
+    with _controllers_lock:
+        controller = _controllers.get(provider_name)
+        if controller is None:
+            prefix = provider_name.upper()
+            controller = AdmissionController(
+                provider_name,
+                max_concurrency=int(_env_float(f"{prefix}_MAX_CONCURRENCY") or _default_limits["max_concurrency"]),
+                requests_per_minute=_env_float(f"{prefix}_RPM"),
+                tokens_per_minute=_env_float(f"{prefix}_TPM"),
+                max_queue=int(_env_float(f"{prefix}_QUEUE_SIZE") or _default_limits["max_queue"]),
+                queue_timeout=_env_float(f"{prefix}_QUEUE_TIMEOUT") or 30.0
+            )
+            _controllers[provider_name] = controller
+        return controller
+
+def admission_snapshot() -> Dict[str, Any]:
+    """Get the state of every admission controller"""
+    with _controllers_lock:
+        controllers = list(_controllers.values())
+    return {controller.name: controller.snapshot() for controller in controllers}
+
+metrics.register_collector("admission", admission_snapshot)
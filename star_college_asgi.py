@@ -0,0 +1,211 @@
+"""
+ASGI web application for Star College Chatbot
+
+Serves the same routes as star_college_server.py, but answers questions on an event loop:
+a request waiting on the LLM holds a coroutine instead of a worker, so a single process can
+keep hundreds of conversations in flight. Initialization and state are shared with the
+Flask app.
+
+Usage:
+    uvicorn star_college_asgi:app --host 0.0.0.0 --port 8000
+"""
+import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, List
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import FileResponse, JSONResponse, Response
+from starlette.routing import Route
+
+import star_college_server as server
+from deadline import Deadline
+from metrics import metrics
+from rate_limiter import ASYNC_MAX_CONCURRENCY, ASYNC_MAX_QUEUE, set_default_limits
+from static_assets import asset_manifest, etag_matches, not_modified_headers
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# One process serves every conversation, so providers without their own
+# <PROVIDER>_MAX_CONCURRENCY and <PROVIDER>_QUEUE_SIZE get limits to match
+set_default_limits(ASYNC_MAX_CONCURRENCY, ASYNC_MAX_QUEUE)
+
+# Seconds between checks for a client that has gone away
+DISCONNECT_POLL_SECONDS = 0.25
+
+class ClientDisconnected(Exception):
+    """Raised when the client closes the connection before its answer is ready"""
+
+async def run_until_disconnect(request: Request, awaitable: Awaitable[Any]) -> Any:
+    """
+    Await a result, cancelling it if the client disconnects first
+
+    Args:
+        request: Request the result is for
+        awaitable: Coroutine producing the result
+
+    Returns:
+        The result
+
+    Raises:
+        ClientDisconnected: If the client went away; the work has been cancelled
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                metrics.increment("asgi.client_disconnects")
+                raise ClientDisconnected()
+    finally:
+        task.cancel()
+
+async def answer_question(current: server.StarBotState, question: str, deadline: Deadline) -> str:
+    """Retrieve context and answer a question within the request's deadline"""
+    async def retrieve() -> List[str]:
+        """Get relevant context from data retriever"""
+        if not current.data_retriever:
+            return []
+        return await current.data_retriever.asearch(question, timeout=deadline.stage_budget(server.RETRIEVAL_BUDGET_FRACTION))
+
+    def answer_timeout() -> float:
+        """Time left for the answer, giving up in time to answer from the cache"""
+        return max(0.0, deadline.remaining() - server.IMAGE_RESERVE_SECONDS)
+
+    # Get answer locally or from the LLM provider; small talk and FAQ hits skip retrieval
+    logger.info(f"Using {current.provider_type} provider for question: {question}")
+    if current.intent_router:
+        answer, _ = await current.intent_router.aanswer(question, timeout=answer_timeout, retrieve=retrieve)
+        return answer
+    context = await retrieve()
+    return await current.llm_provider.aanswer_question(question, context, timeout=answer_timeout())
+
+def send_static(request: Request, path: str) -> Response:
+    """Send a static file, or a precompressed variant of it, with its caching headers"""
+    asset = asset_manifest.lookup(path, request.headers.get('Accept-Encoding'))
+    if asset is None:
+        return Response(status_code=404)
+    if etag_matches(request.headers.get('If-None-Match'), asset.etag):
+        return Response(status_code=304, headers=not_modified_headers(asset.headers))
+    return FileResponse(asset.file_path, media_type=asset.content_type, headers=asset.headers)
+
+async def home(request: Request) -> Response:
+    """Serve the HTML file"""
+    # Check if the standard version is requested
+    if request.query_params.get('standard', 'false').lower() == 'true':
+        return send_static(request, 'index.html')
+    # Use avatar version by default
+    return send_static(request, 'index_with_avatar.html')
+
+async def avatar_version(request: Request) -> Response:
+    """Serve the avatar version of the HTML file"""
+    return send_static(request, 'index_with_avatar.html')
+
+async def standard_version(request: Request) -> Response:
+    """Serve the standard version of the HTML file"""
+    return send_static(request, 'index.html')
+
+async def try_avatar(request: Request) -> Response:
+    """Serve the try avatar page"""
+    return send_static(request, 'try_avatar.html')
+
+async def serve_static(request: Request) -> Response:
+    """Serve static files"""
+    return send_static(request, request.path_params['path'])
+
+async def initialize(request: Request) -> Response:
+    """Initialize StarBot"""
+    try:
+        current = await asyncio.to_thread(server.initialize_starbot)
+        logger.info(f"StarBot initialized with {current.provider_type} provider")
+        return JSONResponse({
+            "message": f"StarBot initialized successfully with {current.provider_type} provider",
+            "mode": current.provider_type
+        })
+    except Exception as e:
+        logger.error(f"Error during initialization: {e}")
+        return JSONResponse({"error": str(e), "mode": "error"}, status_code=500)
+
+async def healthz(request: Request) -> Response:
+    """Liveness: the process is up and serving requests"""
+    return JSONResponse({"status": "ok"})
+
+async def readyz(request: Request) -> Response:
+    """Readiness: the index is loaded and the provider is healthy"""
+    ready, checks = server.readiness()
+    return JSONResponse({"status": "ready" if ready else "not ready", "checks": checks}, status_code=200 if ready else 503)
+
+async def get_metrics(request: Request) -> Response:
+    """Report in-process metrics"""
+    return JSONResponse(metrics.snapshot())
+
+async def ask(request: Request) -> Response:
+    """Answer a question"""
+    try:
+        # Initialization blocks on the crawl, so it runs off the event loop
+        current = server.state or await asyncio.to_thread(server.initialize_starbot)
+
+        # Get question from request
+        data = await request.json()
+        question = data.get('question', '')
+
+        if not question:
+            return JSONResponse({"error": "No question provided"}, status_code=400)
+
+        deadline = Deadline(server.request_budget(request.headers.get('X-Request-Timeout')))
+        try:
+            answer = await run_until_disconnect(request, answer_question(current, question, deadline))
+        except ClientDisconnected:
+            logger.info("Client disconnected, cancelled its question")
+            # Nobody is listening; 499 is the conventional "client closed request" status
+            return Response(status_code=499)
+
+        # Image matching and the catalogue query block, so they run off the event loop too
+        payload = await asyncio.to_thread(server.answer_payload, current, question, answer, deadline)
+        return JSONResponse(payload)
+    except Exception as e:
+        logger.error(f"Error answering question: {e}")
+        return JSONResponse({
+            "error": str(e),
+            "answer": "Sorry, I encountered an error while processing your question. Please try again.",
+            "mode": "error"
+        }, status_code=500)
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    """Warm up in the background so /healthz answers while the website is crawled"""
+    warm_up = asyncio.ensure_future(asyncio.to_thread(server.warm_up))
+    yield
+    if not warm_up.done():
+        warm_up.cancel()
+
+app = Starlette(
+    routes=[
+        Route('/', home),
+        Route('/avatar', avatar_version),
+        Route('/standard', standard_version),
+        Route('/try-avatar', try_avatar),
+        Route('/initialize', initialize),
+        Route('/healthz', healthz),
+        Route('/readyz', readyz),
+        Route('/metrics', get_metrics),
+        Route('/ask', ask, methods=['POST']),
+        Route('/static/{path:path}', serve_static),
+    ],
+    # Enable CORS for all routes
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan
+)
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(app, host='0.0.0.0', port=int(os.environ.get('PORT', '8000')))
@@ -3,12 +3,17 @@ Flask web application for Star College Chatbot
 """
 import os
 import ssl
+import threading
 import certifi
 import logging
-from flask import Flask, request, jsonify, send_from_directory
+from typing import Any, Dict, List, NamedTuple, Optional
+from flask import Flask, Response, abort, request, jsonify, send_file
 from flask_cors import CORS
 from dotenv import load_dotenv
 from image_content_manager import ImageContentManager
+from deadline import Deadline
+from metrics import metrics
+from static_assets import asset_manifest, etag_matches, not_modified_headers
 
 # Load environment variables from .env file if it exists
 load_dotenv()
@@ -28,73 +33,250 @@ ssl_context.load_verify_locations(certifi.where())
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Initialize components
-llm_provider = None
-data_retriever = None
-image_manager = None
-initialized = False
-provider_type = None
+# Time budget for one /ask request, kept below gunicorn's 30 second worker timeout
+ASK_TIMEOUT = float(os.environ.get("ASK_TIMEOUT", "25"))
+# Share of the budget retrieval may use, and time kept back for image enhancement
+RETRIEVAL_BUDGET_FRACTION = 0.2
+IMAGE_RESERVE_SECONDS = 0.5
 
-def initialize_starbot():
-    """Initialize StarBot components"""
-    global llm_provider, data_retriever, image_manager, initialized, provider_type
+# Website crawled for context, overridable for offline benchmarks
+WEBSITE_URL = os.environ.get("STARBOT_WEBSITE_URL", "https://starcollegedurban.co.za/")
 
-    if not initialized:
-        try:
-            # Log all environment variables for debugging (excluding sensitive values)
-            logger.info("Server environment variables:")
-            for key, value in os.environ.items():
-                if key in ["OPENAI_API_KEY", "DEEPSEEK_API_KEY"]:
-                    value_preview = value[:5] + "..." if value else "None"
-                    logger.info(f"  {key}: {value_preview}")
-                elif key.lower() in ["llm_provider", "deepseek_model", "openai_model", "port"]:
-                    logger.info(f"  {key}: {value}")
-
-            # Import the LLM provider and data retriever
-            logger.info("Importing modules...")
-            from llm_providers import get_llm_provider
-            from data_retrieval import DataRetriever
-            logger.info("Modules imported successfully")
-
-            # Get the LLM provider type from environment variable or default to "mock"
-            provider_type = os.environ.get("LLM_PROVIDER", "mock")
-            logger.info(f"Selected provider type from environment: {provider_type}")
-
-            # Initialize the LLM provider
-            logger.info(f"Getting LLM provider for type: {provider_type}")
-            llm_provider = get_llm_provider(provider_type)
-            logger.info("Initializing LLM provider...")
-            provider_initialized = llm_provider.initialize()
-
-            if not provider_initialized:
-                logger.warning("Could not initialize LLM provider, falling back to mock provider")
-                llm_provider = get_llm_provider("mock")
-                llm_provider.initialize()
-                provider_type = "mock"
-
-            # Initialize the data retriever
-            logger.info("Initializing data retriever...")
-            data_retriever = DataRetriever()
-            data_retriever.initialize()
-
-            # Initialize the image content manager
-            logger.info("Initializing image content manager...")
-            image_manager = ImageContentManager()
-
-            logger.info(f"StarBot initialized with {provider_type} provider")
-            initialized = True
-
-        except Exception as e:
-            logger.error(f"Error initializing StarBot: {e}")
-            logger.error(f"Error type: {type(e).__name__}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            # Import the mock provider as fallback
-            from llm_providers import MockProvider
-            llm_provider = MockProvider()
-            initialized = True
+class StarBotState(NamedTuple):
+    """The initialized StarBot components, published as one immutable bundle"""
+    llm_provider: Any
+    data_retriever: Optional[Any]
+    image_manager: Optional[ImageContentManager]
+    intent_router: Optional[Any]
+    provider_type: str
+
+# Initialized components; None until initialization finishes, then replaced as a whole
+state: Optional[StarBotState] = None
+_init_lock = threading.Lock()
+
+def initialize_starbot(background: bool = True) -> StarBotState:
+    """
+    Initialize StarBot components once per process
+
+    Concurrent callers wait for the first one to finish rather than each crawling the
+    website, and all of them get the same state.
+
+    Args:
+        background: Whether to also start this process's background threads
+
+    Returns:
+        The initialized state
+    """
+    global state
+
+    current = state
+    if current is not None:
+        return current
+
+    with _init_lock:
+        if state is None:
+            state = _build_state()
+            if background:
+                start_background_tasks()
+        return state
+
+def _build_state() -> StarBotState:
+    """Initialize every component and return them as a new state"""
+    try:
+        # Log all environment variables for debugging (excluding sensitive values)
+        logger.info("Server environment variables:")
+        for key, value in os.environ.items():
+            if key in ["OPENAI_API_KEY", "DEEPSEEK_API_KEY"]:
+                value_preview = value[:5] + "..." if value else "None"
+                logger.info(f"  {key}: {value_preview}")
+            elif key.lower() in ["llm_provider", "deepseek_model", "openai_model", "port"]:
+                logger.info(f"  {key}: {value}")
+
+        # Import the LLM provider and data retriever
+        logger.info("Importing modules...")
+        from llm_providers import get_llm_provider
+        from data_retrieval import DataRetriever
+        from intent_router import IntentRouter
+        from provider_registry import provider_registry
+        logger.info("Modules imported successfully")
+
+        # Get the LLM provider type from environment variable or default to "mock"
+        provider_type = os.environ.get("LLM_PROVIDER", "mock")
+        logger.info(f"Selected provider type from environment: {provider_type}")
+
+        # Initialize the LLM provider
+        logger.info(f"Getting LLM provider for type: {provider_type}")
+        llm_provider = get_llm_provider(provider_type)
+        logger.info("Initializing LLM provider...")
+        provider_initialized = llm_provider.initialize()
+
+        if not provider_initialized:
+            logger.warning("Could not initialize LLM provider, falling back to mock provider")
+            llm_provider = get_llm_provider("mock")
+            llm_provider.initialize()
             provider_type = "mock"
 
+        # Answer small talk, FAQ hits and retrieval misses locally, and send simple
+        # questions to a cheaper model when one is configured
+        cheap_model = os.environ.get("LLM_CHEAP_MODEL")
+        cheap_provider = None
+        if cheap_model and provider_type != "mock":
+            cheap_provider = provider_registry.get(provider_type, cheap_model)
+        intent_router = IntentRouter(llm_provider, cheap_provider)
+
+        # Answers saved by answer_many.py --cache-file, served when the upstream fails
+        answer_cache_file = os.environ.get("ANSWER_CACHE_FILE")
+        if answer_cache_file and os.path.exists(answer_cache_file):
+            from answer_cache import answer_cache
+            logger.info(f"Loaded {answer_cache.load(answer_cache_file)} cached answers from {answer_cache_file}")
+
+        # Initialize the data retriever
+        logger.info("Initializing data retriever...")
+        data_retriever = DataRetriever()
+        data_retriever.initialize(WEBSITE_URL)
+
+        # Initialize the image content manager
+        logger.info("Initializing image content manager...")
+        image_manager = ImageContentManager()
+
+        logger.info(f"StarBot initialized with {provider_type} provider")
+        return StarBotState(llm_provider, data_retriever, image_manager, intent_router, provider_type)
+
+    except Exception as e:
+        logger.error(f"Error initializing StarBot: {e}")
+        logger.error(f"Error type: {type(e).__name__}")
+        import traceback
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        # Import the mock provider as fallback
+        from llm_providers import MockProvider
+        from intent_router import IntentRouter
+        llm_provider = MockProvider()
+        return StarBotState(llm_provider, None, None, IntentRouter(llm_provider), "mock")
+
+def start_background_tasks():
+    """Start the background threads of this process, such as provider health checks"""
+    current = state
+    if current is None:
+        return
+
+    # Picks up edits to the image database without a restart
+    image_poll_interval = float(os.environ.get("IMAGE_DATABASE_POLL_INTERVAL", "5"))
+    if current.image_manager and image_poll_interval > 0:
+        current.image_manager.start_watching(image_poll_interval)
+
+    if current.provider_type == "mock":
+        return
+
+    from provider_registry import provider_registry
+
+    # Provider credentials are checked off the request path
+    health_check_interval = float(os.environ.get("LLM_HEALTH_CHECK_INTERVAL", "60"))
+    if health_check_interval > 0:
+        provider_registry.start_health_checks(health_check_interval)
+
+def warm_up(background: bool = True):
+    """
+    Initialize StarBot before it receives any traffic
+
+    Args:
+        background: Whether to start background threads too. A pre-fork master passes False,
+            since threads do not survive fork; each worker starts its own after forking.
+    """
+    logger.info("Warming up StarBot...")
+    current = initialize_starbot(background)
+
+    if current.provider_type != "mock":
+        from provider_registry import provider_registry
+
+        # Know the provider's health before the first readiness probe
+        provider_registry.check_now(current.provider_type)
+    logger.info("StarBot is warm")
+
+def readiness():
+    """
+    Check whether this process can serve questions, without initializing anything
+
+    Returns:
+        Tuple of (ready, checks)
+    """
+    from provider_registry import provider_registry
+
+    current = state
+    if current is None:
+        return False, {"initialized": False, "index_loaded": False, "documents": 0, "provider": None, "provider_healthy": False, "image_catalogue_generation": None}
+
+    data_retriever = current.data_retriever
+    checks = {
+        "initialized": True,
+        "index_loaded": bool(data_retriever and data_retriever.initialized),
+        "documents": len(data_retriever.documents) if data_retriever else 0,
+        "provider": current.provider_type,
+        # Unknown health counts as healthy until the first check says otherwise
+        "provider_healthy": provider_registry.health(current.provider_type).healthy is not False,
+        "image_catalogue_generation": current.image_manager.generation if current.image_manager else None,
+    }
+    ready = checks["index_loaded"] and checks["provider_healthy"]
+    return ready, checks
+
+def request_budget(client_timeout: Optional[str] = None) -> float:
+    """
+    Get the time budget of an /ask request
+
+    Args:
+        client_timeout: Value of the X-Request-Timeout header, if the client sent one
+
+    Returns:
+        Seconds the request may take: ASK_TIMEOUT, or less if the client gives up sooner
+    """
+    budget = ASK_TIMEOUT
+    if client_timeout:
+        try:
+            budget = min(budget, max(0.0, float(client_timeout)))
+        except ValueError:
+            logger.warning(f"Ignoring invalid X-Request-Timeout header: {client_timeout}")
+    return budget
+
+def answer_payload(current: StarBotState, question: str, answer: str, deadline: Deadline) -> Dict[str, Any]:
+    """
+    Build the /ask response, enhanced with images if applicable and there is still time
+
+    Args:
+        current: State the question was answered with
+        question: User question
+        answer: Answer text
+        deadline: Deadline of the request
+
+    Returns:
+        The response body
+    """
+    if deadline.expired():
+        logger.warning(f"Request budget of {deadline.budget:.1f}s spent, answering without images")
+    if current.image_manager and not deadline.expired():
+        enhanced_response = current.image_manager.enhance_response_with_images(question, answer)
+        return {
+            "answer": enhanced_response["text"],
+            "has_images": enhanced_response["has_images"],
+            "images": enhanced_response.get("images", []),
+            "mode": current.provider_type
+        }
+    return {
+        "answer": answer,
+        "has_images": False,
+        "mode": current.provider_type
+    }
+
+def send_static(path: str):
+    """Send a static file, or a precompressed variant of it, with its caching headers"""
+    asset = asset_manifest.lookup(path, request.headers.get('Accept-Encoding'))
+    if asset is None:
+        abort(404)
+    if etag_matches(request.headers.get('If-None-Match'), asset.etag):
+        return Response(status=304, headers=not_modified_headers(asset.headers))
+
+    response = send_file(asset.file_path, mimetype=asset.content_type, etag=False, conditional=False)
+    response.headers.update(asset.headers)
+    return response
+
 # Serve the static HTML file
 @app.route('/')
 def home():
@@ -103,52 +285,67 @@ def home():
     use_standard = request.args.get('standard', 'false').lower() == 'true'
 
     if use_standard:
-        return send_from_directory('static', 'index.html')
+        return send_static('index.html')
     else:
         # Use avatar version by default
-        return send_from_directory('static', 'index_with_avatar.html')
+        return send_static('index_with_avatar.html')
 
 @app.route('/avatar')
 def avatar_version():
     """Serve the avatar version of the HTML file"""
-    return send_from_directory('static', 'index_with_avatar.html')
+    return send_static('index_with_avatar.html')
 
 @app.route('/standard')
 def standard_version():
     """Serve the standard version of the HTML file"""
-    return send_from_directory('static', 'index.html')
+    return send_static('index.html')
 
 @app.route('/try-avatar')
 def try_avatar():
     """Serve the try avatar page"""
-    return send_from_directory('static', 'try_avatar.html')
+    return send_static('try_avatar.html')
 
 @app.route('/static/<path:path>')
 def serve_static(path):
     """Serve static files"""
-    return send_from_directory('static', path)
+    return send_static(path)
 
 @app.route('/initialize')
 def initialize():
     """Initialize StarBot"""
     try:
-        initialize_starbot()
-        logger.info(f"StarBot initialized with {provider_type} provider")
+        current = initialize_starbot()
+        logger.info(f"StarBot initialized with {current.provider_type} provider")
         return jsonify({
-            "message": f"StarBot initialized successfully with {provider_type} provider",
-            "mode": provider_type
+            "message": f"StarBot initialized successfully with {current.provider_type} provider",
+            "mode": current.provider_type
         })
     except Exception as e:
         logger.error(f"Error during initialization: {e}")
         return jsonify({"error": str(e), "mode": "error"}), 500
 
+@app.route('/healthz')
+def healthz():
+    """Liveness: the process is up and serving requests"""
+    return jsonify({"status": "ok"})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness: the index is loaded and the provider is healthy"""
+    ready, checks = readiness()
+    return jsonify({"status": "ready" if ready else "not ready", "checks": checks}), 200 if ready else 503
+
+@app.route('/metrics')
+def get_metrics():
+    """Report in-process metrics"""
+    return jsonify(metrics.snapshot())
+
 @app.route('/ask', methods=['POST'])
 def ask():
     """Answer a question"""
     try:
-        # Initialize if not already initialized
-        if not initialized:
-            initialize_starbot()
+        # Initialize if not already initialized, and use one consistent state throughout
+        current = initialize_starbot()
 
         # Get question from request
         data = request.json
@@ -157,28 +354,27 @@ def ask():
         if not question:
             return jsonify({"error": "No question provided"}), 400
 
-        # Get relevant context from data retriever
-        context = data_retriever.search(question) if data_retriever else []
-
-        # Get answer from LLM provider
-        logger.info(f"Using {provider_type} provider for question: {question}")
-        answer = llm_provider.answer_question(question, context)
-
-        # Enhance response with images if applicable
-        if image_manager:
-            enhanced_response = image_manager.enhance_response_with_images(question, answer)
-            return jsonify({
-                "answer": enhanced_response["text"],
-                "has_images": enhanced_response["has_images"],
-                "images": enhanced_response.get("images", []),
-                "mode": provider_type
-            })
+        deadline = Deadline(request_budget(request.headers.get('X-Request-Timeout')))
+
+        def retrieve() -> List[str]:
+            """Get relevant context from data retriever"""
+            if not current.data_retriever:
+                return []
+            return current.data_retriever.search(question, timeout=deadline.stage_budget(RETRIEVAL_BUDGET_FRACTION))
+
+        def answer_timeout() -> float:
+            """Time left for the answer, giving up in time to answer from the cache"""
+            return max(0.0, deadline.remaining() - IMAGE_RESERVE_SECONDS)
+
+        # Get answer locally or from the LLM provider; small talk and FAQ hits skip retrieval
+        logger.info(f"Using {current.provider_type} provider for question: {question}")
+        if current.intent_router:
+            answer, _ = current.intent_router.answer(question, timeout=answer_timeout, retrieve=retrieve)
         else:
-            return jsonify({
-                "answer": answer,
-                "has_images": False,
-                "mode": provider_type
-            })
+            context = retrieve()
+            answer = current.llm_provider.answer_question(question, context, timeout=answer_timeout())
+
+        return jsonify(answer_payload(current, question, answer, deadline))
     except Exception as e:
         logger.error(f"Error answering question: {e}")
         return jsonify({
@@ -190,4 +386,5 @@ def ask():
 if __name__ == '__main__':
     # Create static directory if it doesn't exist
     os.makedirs('static', exist_ok=True)
+    warm_up()
     app.run(host='0.0.0.0', port=8000, debug=True)
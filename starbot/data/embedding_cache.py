@@ -0,0 +1,278 @@
+"""
+Content-addressed embedding cache for StarBot
+"""
+import os
+import re
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialized within a process
+    fcntl = None
+
+# Where embeddings are cached between runs
+DEFAULT_CACHE_DIRECTORY = os.environ.get(
+    "STARBOT_EMBEDDING_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".starbot", "embeddings")
+)
+
+# Query embeddings kept in memory; user queries rarely repeat exactly, so they are not
+# worth a write to the cache files on the request path
+DEFAULT_QUERY_CACHE_SIZE = 1024
+
+# Each index record is the raw SHA-256 of a text; its position is the row of its vector
+DIGEST_SIZE = 32
+
+class EmbeddingCache:
+    """
+    Embeddings of one model at one endpoint keyed by the SHA-256 of the embedded text
+
+    Vectors are appended to a float32 file that is read through a memory map, and the
+    digest of each text to an index file in the same order, so lookups need neither the
+    vectors in memory nor a rewrite of either file.
+    """
+    def __init__(self, model: str, endpoint: Optional[str] = None, directory: str = DEFAULT_CACHE_DIRECTORY):
+        """
+        Initialize the cache
+
+        Args:
+            model: Name of the embedding model; each model has its own files
+            endpoint: URL of the server the model runs on; each endpoint has its own files,
+                so a stand-in server's vectors are never served as the real model's
+            directory: Directory the cache files are kept in
+        """
+        self.model = model
+        self.endpoint = endpoint
+        self.directory = directory
+        key = f"{model}@{endpoint.split('://')[-1].rstrip('/')}" if endpoint else model
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", key)
+        self.vectors_path = os.path.join(directory, f"{slug}.f32")
+        self.index_path = os.path.join(directory, f"{slug}.index")
+        self.meta_path = os.path.join(directory, f"{slug}.json")
+
+        self.dimension: Optional[int] = None
+        self._rows: Dict[bytes, int] = {}
+        self._records = 0
+        self._vectors: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self._read_index()
+
+    @staticmethod
+    def digest(text: str) -> bytes:
+        """SHA-256 of a text, the key its embedding is cached under"""
+        return hashlib.sha256(text.encode("utf-8")).digest()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _read_dimension(self) -> Optional[int]:
+        """Dimension recorded in the meta file, or None before the first vector is cached"""
+        if not os.path.exists(self.meta_path):
+            return None
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)["dimension"]
+
+    def _write_dimension(self, dimension: int) -> None:
+        """Record the dimension of the cached vectors in the meta file"""
+        fd, temp_path = tempfile.mkstemp(suffix=".json", dir=self.directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"model": self.model, "endpoint": self.endpoint, "dimension": dimension}, f)
+            os.replace(temp_path, self.meta_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def _read_index(self) -> None:
+        """Read index records appended since the last read, by this or another process"""
+        if self.dimension is None:
+            self.dimension = self._read_dimension()
+        if not os.path.exists(self.index_path) or self.dimension is None:
+            return
+        # Vectors are written before their digests, so every indexed row has its vector
+        with open(self.index_path, "rb") as f:
+            f.seek(self._records * DIGEST_SIZE)
+            data = f.read()
+        for offset in range(0, len(data) - len(data) % DIGEST_SIZE, DIGEST_SIZE):
+            self._rows.setdefault(data[offset:offset + DIGEST_SIZE], self._records)
+            self._records += 1
+
+    def _vector_map(self, rows: int) -> np.memmap:
+        """Memory map covering at least the first rows vectors"""
+        if self._vectors is None or self._vectors.shape[0] < rows:
+            total = os.path.getsize(self.vectors_path) // (4 * self.dimension)
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(total, self.dimension))
+        return self._vectors
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Look up the embeddings of texts
+
+        Args:
+            texts: Texts to look up
+
+        Returns:
+            One embedding per text, or None where it is not cached
+        """
+        digests = [self.digest(text) for text in texts]
+        with self._lock:
+            if any(digest not in self._rows for digest in digests):
+                self._read_index()
+            rows = [self._rows.get(digest) for digest in digests]
+            known = [row for row in rows if row is not None]
+            if not known:
+                return [None] * len(texts)
+            vectors = self._vector_map(max(known) + 1)
+            return [vectors[row].tolist() if row is not None else None for row in rows]
+
+    def put_many(self, texts: List[str], embeddings: List[List[float]]) -> None:
+        """
+        Cache the embeddings of texts
+
+        Args:
+            texts: Embedded texts
+            embeddings: Their embeddings, in the same order
+        """
+        if not texts:
+            return
+
+        array = np.asarray(embeddings, dtype=np.float32)
+        with self._lock:
+            with open(self.index_path, "ab") as index:
+                if fcntl is not None:
+                    fcntl.flock(index, fcntl.LOCK_EX)
+                try:
+                    # The first writer records the dimension; everyone checks against the file
+                    recorded = self._read_dimension()
+                    if recorded is None:
+                        recorded = int(array.shape[1])
+                        self._write_dimension(recorded)
+                    if self.dimension is None:
+                        self.dimension = recorded
+                    if self.dimension != recorded:
+                        raise ValueError(f"Cache for {self.model} was rewritten with {recorded}-dimensional embeddings")
+                    if array.shape[1] != recorded:
+                        raise ValueError(f"Expected {recorded}-dimensional embeddings from {self.model}, got {array.shape[1]}")
+
+                    # Pick up rows other processes added, so positions line up
+                    self._read_index()
+                    new = {}
+                    for text, vector in zip(texts, array):
+                        digest = self.digest(text)
+                        if digest not in self._rows and digest not in new:
+                            new[digest] = vector
+                    if not new:
+                        return
+
+                    # Drop vectors left by a writer that died before indexing them
+                    row_size = 4 * self.dimension
+                    if os.path.exists(self.vectors_path) and os.path.getsize(self.vectors_path) > self._records * row_size:
+                        os.truncate(self.vectors_path, self._records * row_size)
+
+                    with open(self.vectors_path, "ab") as vectors:
+                        vectors.write(np.stack(list(new.values())).astype(np.float32).tobytes())
+                        vectors.flush()
+                        os.fsync(vectors.fileno())
+                    index.write(b"".join(new))
+                    index.flush()
+
+                    for digest in new:
+                        self._rows[digest] = self._records
+                        self._records += 1
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(index, fcntl.LOCK_UN)
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings that consult an EmbeddingCache first and only send the misses to the model
+    """
+    def __init__(self,
+                 embeddings: Embeddings,
+                 model: str,
+                 cache: Optional[EmbeddingCache] = None,
+                 query_cache_size: int = DEFAULT_QUERY_CACHE_SIZE,
+                 endpoint: Optional[str] = None):
+        """
+        Initialize the cached embeddings
+
+        Args:
+            embeddings: Embedding model to call on a miss
+            model: Name of the embedding model, part of the cache key
+            cache: Cache of document embeddings; defaults to the cache of the model at
+                endpoint in the default directory
+            query_cache_size: Number of query embeddings to keep in memory
+            endpoint: URL of the server the model runs on, part of the cache key
+        """
+        self.embeddings = embeddings
+        self.model = model
+        self.cache = cache if cache is not None else EmbeddingCache(model, endpoint)
+        self.query_cache_size = query_cache_size
+        self._queries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._queries_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed texts, calling the model only for those not cached
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            One embedding per text
+        """
+        results = self.cache.get_many(texts)
+        missing = [index for index, result in enumerate(results) if result is None]
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            # Each distinct text goes to the model once, however often it repeats
+            distinct = list(dict.fromkeys(texts[index] for index in missing))
+            embedded = dict(zip(distinct, self.embeddings.embed_documents(distinct)))
+            self.cache.put_many(distinct, [embedded[text] for text in distinct])
+            for index in missing:
+                results[index] = embedded[texts[index]]
+
+        return results
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a query, calling the model only if it was embedded recently
+
+        Queries are kept in memory only, apart from documents, in case a model embeds
+        them differently.
+
+        Args:
+            text: Query to embed
+
+        Returns:
+            Its embedding
+        """
+        with self._queries_lock:
+            cached = self._queries.get(text)
+            if cached is not None:
+                self._queries.move_to_end(text)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        embedding = self.embeddings.embed_query(text)
+        with self._queries_lock:
+            self._queries[text] = embedding
+            while len(self._queries) > self.query_cache_size:
+                self._queries.popitem(last=False)
+        return embedding
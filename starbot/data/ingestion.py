@@ -5,7 +5,9 @@ import os
 import ssl
 import certifi
 import httpx
-from typing import List, Union, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Dict, Iterable, List, Union, Optional, Tuple
 from langchain.text_splitter import CharacterTextSplitter
 from langchain_community.document_loaders import (
     TextLoader,
@@ -14,6 +16,8 @@ from langchain_community.document_loaders import (
 )
 from starbot.utils.image_loader import ImageLoader, DirectoryImageLoader
 from starbot.utils.web_loader import CustomWebLoader
+from starbot.data.manifest import SourceManifest, source_hash, chunk_ids
+from starbot.data.embedding_cache import CachedEmbeddings
 from langchain_community.vectorstores import Chroma
 from langchain_ollama import OllamaEmbeddings
 
@@ -27,11 +31,78 @@ ssl_context.load_verify_locations(certifi.where())
 # Configure httpx client with SSL context
 httpx_client = httpx.Client(verify=certifi.where())
 
+# Where vector store collections are persisted between runs
+DEFAULT_PERSIST_DIRECTORY = os.environ.get(
+    "STARBOT_PERSIST_DIR",
+    os.path.join(os.path.expanduser("~"), ".starbot", "chroma")
+)
+MANIFEST_NAME = "starbot-manifest.json"
+
+# Source kinds whose loading is CPU-bound (PDF parsing and OCR), run in worker processes
+CPU_BOUND_KINDS = {"pdf", "image", "image_directory"}
+
+# Text splitters of this process, by (chunk size, chunk overlap)
+_splitters: Dict[Tuple[int, int], CharacterTextSplitter] = {}
+
+def _splitter(chunk_size: int, chunk_overlap: int) -> CharacterTextSplitter:
+    """Get this process's text splitter for a chunk size and overlap"""
+    key = (chunk_size, chunk_overlap)
+    if key not in _splitters:
+        _splitters[key] = CharacterTextSplitter.from_tiktoken_encoder(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    return _splitters[key]
+
+def _load_source(kind: str, source: str) -> List:
+    """
+    Load the documents of one source, unsplit
+
+    Args:
+        kind: One of "text", "pdf", "url", "directory", "image" or "image_directory"
+        source: File path, directory path or URL
+
+    Returns:
+        List of documents
+    """
+    if kind == "text":
+        loader = TextLoader(source)
+    elif kind == "pdf":
+        loader = PyPDFLoader(source)
+    elif kind == "url":
+        loader = CustomWebLoader(source)
+    elif kind == "directory":
+        loader = DirectoryLoader(source, glob="**/*.txt")
+    elif kind == "image":
+        loader = ImageLoader(source)
+    elif kind == "image_directory":
+        # Already in a worker process; the sources are the unit of parallelism here
+        loader = DirectoryImageLoader(source, workers=1)
+    else:
+        raise ValueError(f"Unknown source kind: {kind}")
+    return loader.load()
+
+def _load_and_split(kind: str, source: str, chunk_size: int, chunk_overlap: int) -> List:
+    """
+    Load and split one source; runs in a worker thread or process
+
+    Args:
+        kind: Kind of source, as for _load_source
+        source: File path, directory path or URL
+        chunk_size: Size of text chunks for splitting documents
+        chunk_overlap: Overlap between chunks
+
+    Returns:
+        List of document chunks
+    """
+    return _splitter(chunk_size, chunk_overlap).split_documents(_load_source(kind, source))
+
 class DataIngestion:
     """
     Handles ingestion of various data sources into the vector database
     """
-    def __init__(self, embedding_model: str = "nomic-embed-text", chunk_size: int = 750, chunk_overlap: int = 100):
+    def __init__(self,
+                 embedding_model: str = "nomic-embed-text",
+                 chunk_size: int = 750,
+                 chunk_overlap: int = 100,
+                 persist_directory: str = DEFAULT_PERSIST_DIRECTORY):
         """
         Initialize the data ingestion module
 
@@ -39,15 +110,25 @@ class DataIngestion:
             embedding_model: Name of the Ollama embedding model to use
             chunk_size: Size of text chunks for splitting documents
             chunk_overlap: Overlap between chunks
+            persist_directory: Directory the vector store collections are persisted in
         """
         self.embedding_model = embedding_model
+        self.persist_directory = persist_directory
+        # Sources that failed in the last parallel ingestion, with their errors
+        self.errors: Dict[str, str] = {}
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.text_splitter = CharacterTextSplitter.from_tiktoken_encoder(
             chunk_size=self.chunk_size,
             chunk_overlap=self.chunk_overlap
         )
-        self.embeddings = OllamaEmbeddings(model=self.embedding_model)
+        # Chunks embedded before, in any collection, are not sent to the model again
+        base_url = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
+        self.embeddings = CachedEmbeddings(
+            OllamaEmbeddings(model=self.embedding_model, base_url=base_url),
+            self.embedding_model,
+            endpoint=base_url
+        )
 
     def ingest_text_file(self, file_path: str) -> List:
         """
@@ -121,7 +202,7 @@ class DataIngestion:
         documents = loader.load()
         return self.text_splitter.split_documents(documents)
 
-    def ingest_image_directory(self, directory_path: str, glob_pattern: str = "**/*.{jpg,jpeg,png,gif,bmp,tiff}", language: str = "eng") -> List:
+    def ingest_image_directory(self, directory_path: str, glob_pattern: str = "**/*.{jpg,jpeg,png,gif,bmp,tiff}", language: str = "eng", workers: Optional[int] = None) -> List:
         """
         Ingest all image files in a directory and extract text using OCR
 
@@ -129,11 +210,12 @@ class DataIngestion:
             directory_path: Path to the directory
             glob_pattern: Pattern to match image files
             language: Language for OCR (default: English)
+            workers: Processes to run OCR in (default: one per core)
 
         Returns:
             List of document chunks
         """
-        loader = DirectoryImageLoader(directory_path, glob_pattern=glob_pattern, language=language)
+        loader = DirectoryImageLoader(directory_path, glob_pattern=glob_pattern, language=language, workers=workers)
         documents = loader.load()
         return self.text_splitter.split_documents(documents)
 
@@ -143,7 +225,10 @@ class DataIngestion:
                                image_files: Optional[List[str]] = None,
                                urls: Optional[List[str]] = None,
                                directories: Optional[List[str]] = None,
-                               image_directories: Optional[List[str]] = None) -> List:
+                               image_directories: Optional[List[str]] = None,
+                               parallel: bool = False,
+                               io_workers: int = 8,
+                               cpu_workers: Optional[int] = None) -> List:
         """
         Ingest multiple data sources
 
@@ -154,10 +239,28 @@ class DataIngestion:
             urls: List of website URLs
             directories: List of directory paths for text files
             image_directories: List of directory paths for image files
+            parallel: Load and split the sources concurrently: text files, URLs and text
+                directories on a thread pool, PDFs and images on a process pool. A source
+                that fails is recorded in self.errors and skipped instead of raising.
+            io_workers: Threads for I/O-bound sources in parallel mode
+            cpu_workers: Processes for CPU-bound sources in parallel mode (default: one per core)
 
         Returns:
-            List of document chunks
+            List of document chunks, in the same order in either mode
         """
+        self.errors = {}
+        if parallel:
+            return self._ingest_parallel(
+                [("text", path) for path in text_files or []]
+                + [("pdf", path) for path in pdf_files or []]
+                + [("url", url) for url in urls or []]
+                + [("directory", path) for path in directories or []]
+                + [("image", path) for path in image_files or []]
+                + [("image_directory", path) for path in image_directories or []],
+                io_workers,
+                cpu_workers
+            )
+
         all_documents = []
 
         if text_files:
@@ -186,19 +289,174 @@ class DataIngestion:
 
         return all_documents
 
-    def create_vector_store(self, documents: List, collection_name: str = "starbot-data") -> Chroma:
+    def _ingest_parallel(self, sources: List[Tuple[str, str]], io_workers: int, cpu_workers: Optional[int]) -> List:
+        """
+        Load and split sources concurrently
+
+        Args:
+            sources: List of (kind, source) pairs, in the order their chunks are returned
+            io_workers: Threads for I/O-bound sources
+            cpu_workers: Processes for CPU-bound sources
+
+        Returns:
+            List of document chunks
         """
-        Create a vector store from documents
+        self.errors = {}
+        needs_processes = any(kind in CPU_BOUND_KINDS for kind, _ in sources)
+
+        threads = ThreadPoolExecutor(max_workers=io_workers)
+        processes = ProcessPoolExecutor(max_workers=cpu_workers) if needs_processes else None
+        try:
+            futures = [
+                (processes if kind in CPU_BOUND_KINDS else threads).submit(
+                    _load_and_split, kind, source, self.chunk_size, self.chunk_overlap
+                )
+                for kind, source in sources
+            ]
+
+            # Collected in submission order, so the output does not depend on timing
+            all_documents = []
+            for (kind, source), future in zip(sources, futures):
+                try:
+                    all_documents.extend(future.result())
+                except Exception as e:
+                    self.errors[source] = f"{type(e).__name__}: {e}"
+                    print(f"Error ingesting {kind} {source}: {e}")
+        finally:
+            threads.shutdown()
+            if processes is not None:
+                processes.shutdown()
+
+        print(f"Ingested {len(sources) - len(self.errors)} of {len(sources)} sources")
+        return all_documents
+
+    def load_vector_store(self, collection_name: str = "starbot-data") -> Optional[Chroma]:
+        """
+        Open a persisted collection
+
+        Args:
+            collection_name: Name of the collection in the vector store
+
+        Returns:
+            Chroma vector store, or None if the collection has not been ingested with this
+            embedding model
+        """
+        manifest = SourceManifest(os.path.join(self.persist_directory, MANIFEST_NAME))
+        if not manifest.sources(collection_name, self.embedding_model):
+            return None
+        return Chroma(
+            collection_name=collection_name,
+            embedding_function=self.embeddings,
+            persist_directory=self.persist_directory
+        )
+
+    def website_vector_store(self, url: str, collection_name: str = "starbot-data", refresh: Optional[bool] = None) -> Chroma:
+        """
+        Open the persisted collection of a website, crawling and ingesting it if needed
+
+        Args:
+            url: URL of the website
+            collection_name: Name of the collection in the vector store
+            refresh: Re-crawl the website and update the collection even if it was ingested
+                before (default: the STARBOT_REFRESH_DATA environment variable)
+
+        Returns:
+            Chroma vector store
+        """
+        if refresh is None:
+            refresh = os.environ.get("STARBOT_REFRESH_DATA", "false").lower() == "true"
+
+        vector_store = None if refresh else self.load_vector_store(collection_name)
+        if vector_store is not None:
+            print("Loaded the persisted vector store")
+            return vector_store
+
+        print(f"Ingesting data from {url}...")
+        docs = self.ingest_website(url)
+        print(f"Ingested {len(docs)} document chunks")
+
+        # Update the vector store, embedding only new or changed pages
+        vector_store = self.create_vector_store(docs, collection_name)
+        print("Vector store created successfully")
+        return vector_store
+
+    def create_vector_store(self, documents: List, collection_name: str = "starbot-data", keep_sources: Optional[Iterable[str]] = None) -> Chroma:
+        """
+        Bring a persisted collection up to date with documents
+
+        Only sources that are new or whose content changed since the last ingestion are
+        embedded; sources no longer among the documents are deleted from the collection,
+        unless they came from a source that failed to load.
 
         Args:
             documents: List of document chunks
             collection_name: Name of the collection in the vector store
+            keep_sources: Sources that failed to load, e.g. self.errors after a parallel
+                ingestion; what was recorded from them, including the pages of a URL and
+                the files of a directory, is kept as it is
 
         Returns:
             Chroma vector store
         """
-        return Chroma.from_documents(
-            documents=documents,
-            embedding=self.embeddings,
-            collection_name=collection_name
+        vector_store = Chroma(
+            collection_name=collection_name,
+            embedding_function=self.embeddings,
+            persist_directory=self.persist_directory
         )
+        manifest = SourceManifest(os.path.join(self.persist_directory, MANIFEST_NAME))
+
+        previous = manifest.sources(collection_name, self.embedding_model)
+        if not previous:
+            # Embedded with another model or never recorded: none of it can be reused
+            stale_ids = vector_store.get(include=[])["ids"]
+            if stale_ids:
+                vector_store.delete(ids=stale_ids)
+
+        # Group chunks by the source they came from, keeping their order
+        by_source = OrderedDict()
+        for document in documents:
+            by_source.setdefault(str(document.metadata.get("source", "")), []).append(document)
+
+        sources = {}
+        unchanged = 0
+        to_delete = []
+        to_add = []
+        to_add_ids = []
+        for source, chunks in by_source.items():
+            content_hash = source_hash(chunks)
+            recorded = previous.get(source)
+            if recorded and recorded["hash"] == content_hash:
+                sources[source] = recorded
+                unchanged += 1
+                continue
+            if recorded:
+                to_delete.extend(recorded["chunk_ids"])
+            ids = chunk_ids(source, chunks)
+            to_add.extend(chunks)
+            to_add_ids.extend(ids)
+            sources[source] = {"hash": content_hash, "chunk_ids": ids}
+
+        # A source that failed to load is not gone; keep what it had
+        failed = [failed_source.rstrip("/" + os.sep) for failed_source in keep_sources or [] if failed_source]
+        kept = 0
+        removed = []
+        for source, recorded in previous.items():
+            if source in by_source:
+                continue
+            if any(source == prefix or source.startswith((prefix + "/", prefix + os.sep)) for prefix in failed):
+                sources[source] = recorded
+                kept += 1
+            else:
+                removed.append(source)
+        for source in removed:
+            to_delete.extend(previous[source]["chunk_ids"])
+
+        if to_delete:
+            vector_store.delete(ids=to_delete)
+        if to_add:
+            vector_store.add_documents(to_add, ids=to_add_ids)
+        manifest.update(collection_name, self.embedding_model, sources)
+
+        print(f"Collection {collection_name}: {len(by_source) - unchanged} sources embedded ({len(to_add)} chunks), "
+              f"{unchanged} unchanged, {kept} kept after failing to load, {len(removed)} removed")
+        return vector_store
@@ -0,0 +1,127 @@
+"""
+Source manifest for incremental ingestion
+"""
+import os
+import json
+import hashlib
+import tempfile
+from typing import Dict, List, Any
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent updates are not serialized
+    fcntl = None
+
+def hash_text(text: str) -> str:
+    """
+    Hex SHA-256 of some text
+
+    Args:
+        text: Text to hash
+
+    Returns:
+        Hex digest
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def source_hash(chunks: List) -> str:
+    """
+    Hash the chunks of one source, so any change to its content or its splitting shows
+
+    Args:
+        chunks: Document chunks of the source, in order
+
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(hash_text(chunk.page_content).encode("ascii"))
+        digest.update(json.dumps(chunk.metadata, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+def chunk_ids(source: str, chunks: List) -> List[str]:
+    """
+    Stable ids for the chunks of one source
+
+    Args:
+        source: Source the chunks came from
+        chunks: Document chunks of the source, in order
+
+    Returns:
+        One id per chunk, derived from the source, the chunk's position and its text
+    """
+    return [
+        hash_text(f"{source}\n{index}\n{chunk.page_content}")[:32]
+        for index, chunk in enumerate(chunks)
+    ]
+
+class SourceManifest:
+    """
+    Records, per collection, the content hash of every ingested source and the ids of its
+    chunks, so re-ingestion can tell which sources are new, changed or gone
+    """
+    def __init__(self, path: str):
+        """
+        Initialize the manifest
+
+        Args:
+            path: JSON file the manifest is kept in
+        """
+        self.path = path
+        self.collections = self._read()
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        """Collections recorded in the manifest file"""
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f).get("collections", {})
+
+    def sources(self, collection_name: str, embedding_model: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the sources recorded for a collection
+
+        Args:
+            collection_name: Name of the collection
+            embedding_model: Embedding model the collection is being updated with
+
+        Returns:
+            Sources mapped to {"hash": ..., "chunk_ids": [...]}; empty if the collection
+            was embedded with a different model, since none of its vectors can be reused
+        """
+        collection = self.collections.get(collection_name)
+        if not collection or collection.get("embedding_model") != embedding_model:
+            return {}
+        return collection.get("sources", {})
+
+    def update(self, collection_name: str, embedding_model: str, sources: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Record the sources of a collection and save the manifest
+
+        Other collections are taken from the file as it is now, so an ingest of another
+        collection that finished in the meantime keeps its entry.
+
+        Args:
+            collection_name: Name of the collection
+            embedding_model: Embedding model the collection was embedded with
+            sources: Sources mapped to {"hash": ..., "chunk_ids": [...]}
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+
+        with open(self.path + ".lock", "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self.collections = self._read()
+                self.collections[collection_name] = {"embedding_model": embedding_model, "sources": sources}
+
+                # Written beside the manifest and renamed into place, so it is never half written
+                descriptor, temporary_path = tempfile.mkstemp(suffix=".json", dir=directory)
+                with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+                    json.dump({"collections": self.collections}, f, indent=2, sort_keys=True)
+                os.replace(temporary_path, self.path)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
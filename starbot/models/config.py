@@ -9,6 +9,8 @@ from typing import List, Dict, Any, Optional
 from langchain_ollama import ChatOllama, OllamaEmbeddings
 from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
 
+from starbot.data.embedding_cache import CachedEmbeddings
+
 # Set SSL certificate environment variable
 os.environ['SSL_CERT_FILE'] = certifi.where()
 
@@ -26,7 +28,8 @@ class ModelConfig:
     def __init__(self,
                 llm_model: str = "mistral",
                 embedding_model: str = "nomic-embed-text",
-                streaming: bool = True):
+                streaming: bool = True,
+                base_url: Optional[str] = None):
         """
         Initialize model configuration
 
@@ -34,10 +37,12 @@ class ModelConfig:
             llm_model: Name of the Ollama LLM model to use
             embedding_model: Name of the Ollama embedding model to use
             streaming: Whether to enable streaming responses
+            base_url: Ollama server URL (defaults to OLLAMA_BASE_URL or the local server)
         """
         self.llm_model = llm_model
         self.embedding_model = embedding_model
         self.streaming = streaming
+        self.base_url = base_url or os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
 
     def get_llm(self, streaming: Optional[bool] = None) -> ChatOllama:
         """
@@ -54,23 +59,29 @@ class ModelConfig:
         if use_streaming:
             return ChatOllama(
                 model=self.llm_model,
+                base_url=self.base_url,
                 streaming=True,
                 callbacks=[StreamingStdOutCallbackHandler()]
             )
         else:
             return ChatOllama(
                 model=self.llm_model,
+                base_url=self.base_url,
                 streaming=False
             )
 
-    def get_embeddings(self) -> OllamaEmbeddings:
+    def get_embeddings(self) -> CachedEmbeddings:
         """
         Get the configured embeddings model
 
         Returns:
-            Configured OllamaEmbeddings model
+            Configured OllamaEmbeddings model, behind the embedding cache
         """
-        return OllamaEmbeddings(model=self.embedding_model)
+        return CachedEmbeddings(
+            OllamaEmbeddings(model=self.embedding_model, base_url=self.base_url),
+            self.embedding_model,
+            endpoint=self.base_url
+        )
 
     @staticmethod
     def list_available_models() -> List[str]:
@@ -28,7 +28,8 @@ class StarBotCLI:
                    pdf_files: Optional[List[str]] = None,
                    urls: Optional[List[str]] = None,
                    directories: Optional[List[str]] = None,
-                   collection_name: str = "starbot-data"):
+                   collection_name: str = "starbot-data",
+                   parallel: bool = False):
         """
         Ingest data from various sources
         
@@ -38,21 +39,25 @@ class StarBotCLI:
             urls: List of website URLs
             directories: List of directory paths
             collection_name: Name of the collection in the vector store
+            parallel: Load the sources concurrently, on every core
         """
         print("Ingesting data...")
         documents = self.data_ingestion.ingest_multiple_sources(
             text_files=text_files,
             pdf_files=pdf_files,
             urls=urls,
-            directories=directories
+            directories=directories,
+            parallel=parallel
         )
         
         print(f"Ingested {len(documents)} document chunks")
         
         print("Creating vector store...")
+        # Sources that failed to load keep what was embedded from them before
         self.vector_store = self.data_ingestion.create_vector_store(
             documents=documents,
-            collection_name=collection_name
+            collection_name=collection_name,
+            keep_sources=self.data_ingestion.errors
         )
         
         print("Vector store created successfully")
@@ -98,9 +103,11 @@ class StarBotCLI:
         ingest_parser.add_argument("--url", nargs="+", help="URLs to ingest")
         ingest_parser.add_argument("--dir", nargs="+", help="Directories to ingest")
         ingest_parser.add_argument("--collection", default="starbot-data", help="Collection name for the vector store")
+        ingest_parser.add_argument("--parallel", action="store_true", help="Load the sources concurrently")
         
         # Chat command
         chat_parser = subparsers.add_parser("chat", help="Start chat session")
+        chat_parser.add_argument("--collection", default="starbot-data", help="Collection name for the vector store")
         
         args = parser.parse_args()
         
@@ -110,21 +117,21 @@ class StarBotCLI:
                 pdf_files=args.pdf,
                 urls=args.url,
                 directories=args.dir,
-                collection_name=args.collection
+                collection_name=args.collection,
+                parallel=args.parallel
             )
             
             # Start chat after ingestion
             self.chat_loop()
             
         elif args.command == "chat":
-            # Try to load existing vector store
+            # Load the collection persisted by a previous ingest
             try:
-                from langchain_community.vectorstores import Chroma
-                
-                self.vector_store = Chroma(
-                    collection_name="starbot-data",
-                    embedding_function=self.model_config.get_embeddings()
-                )
+                self.vector_store = self.data_ingestion.load_vector_store(args.collection)
+                if self.vector_store is None:
+                    print(f"No data has been ingested into the {args.collection} collection")
+                    print("Please ingest data first using the 'ingest' command")
+                    return
                 
                 self.qa_system = RetrievalQA(
                     vector_store=self.vector_store,
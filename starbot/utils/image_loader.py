@@ -2,119 +2,363 @@
 Image loader with OCR capabilities for StarBot
 """
 import os
-from typing import List, Optional
+import re
+import json
+import functools
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 from PIL import Image
 import pytesseract
 from langchain.docstore.document import Document
 from langchain.document_loaders.base import BaseLoader
 
+from starbot.utils.ocr_cache import DEFAULT_CACHE_PATH, OCRCache, file_hash
+from starbot.utils.ocr_preprocessing import OCRPreprocessor
+from starbot.utils.text_detector import TextDetector
+
+NO_TEXT_MESSAGE = "No text could be extracted from this image."
+
+@functools.lru_cache(maxsize=None)
+def tesseract_version() -> str:
+    """Version of the Tesseract engine, which decides what text OCR finds"""
+    try:
+        return str(pytesseract.get_tesseract_version())
+    except Exception:
+        return "unknown"
+
+def expand_braces(pattern: str) -> List[str]:
+    """
+    Expand shell-style brace alternatives, which glob does not understand
+
+    Args:
+        pattern: Glob pattern such as "**/*.{jpg,png}"
+
+    Returns:
+        Patterns without braces, e.g. ["**/*.jpg", "**/*.png"]
+    """
+    match = re.search(r"\{([^{}]*)\}", pattern)
+    if not match:
+        return [pattern]
+    return [
+        expanded
+        for alternative in match.group(1).split(",")
+        for expanded in expand_braces(pattern[:match.start()] + alternative + pattern[match.end():])
+    ]
+
+def extract_text(file_path: str,
+                 language: str = "eng",
+                 config: str = "",
+                 preprocessor: Optional[OCRPreprocessor] = None,
+                 detector: Optional[TextDetector] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Extract the text of one image with Tesseract; a plain function so worker processes can run it
+
+    Args:
+        file_path: Path to the image file
+        language: Language for OCR
+        config: Extra Tesseract options, e.g. "--psm 6"
+        preprocessor: How to prepare the image (default: OCRPreprocessor())
+        detector: If given, OCR is skipped for images it scores below its threshold
+
+    Returns:
+        Tuple of (text, image metadata); metadata has "text_score" when a detector is given,
+        and "text_detected" set to False when OCR was skipped
+    """
+    # Decode the image once, ready for Tesseract
+    image, metadata = (preprocessor or OCRPreprocessor()).prepare(file_path)
+
+    # Photos without text would only produce an empty document
+    if detector is not None:
+        metadata["text_score"] = round(detector.score(image), 5)
+        if not detector.accepts(metadata["text_score"]):
+            metadata["text_detected"] = False
+            return "", metadata
+
+    # Extract text using pytesseract
+    try:
+        text = pytesseract.image_to_string(image, lang=language, config=config)
+        text = text.strip()
+    except Exception as e:
+        raise RuntimeError(f"Error extracting text from image: {str(e)}")
+
+    return text, metadata
+
+def make_document(file_path: str, text: str, metadata: Dict[str, Any]) -> Document:
+    """
+    Build the document for an image's extracted text
+
+    Args:
+        file_path: Path to the image file
+        text: Extracted text
+        metadata: Image metadata
+
+    Returns:
+        Document with the text, or a message saying there was none
+    """
+    # If no text was extracted, return a message
+    if not text:
+        text = NO_TEXT_MESSAGE
+
+    return Document(page_content=text, metadata={"source": file_path, **metadata})
+
+def ocr_settings(config: str, preprocessor: OCRPreprocessor, detector: Optional[TextDetector] = None) -> str:
+    """
+    Serialize everything besides the image and language that decides what OCR reads
+
+    Args:
+        config: Extra Tesseract options
+        preprocessor: How images are prepared for Tesseract
+        detector: Text detector deciding which images are read, if any
+
+    Returns:
+        Settings string for OCR cache keys
+    """
+    return json.dumps(
+        {
+            "config": config,
+            "preprocessing": preprocessor.settings(),
+            "detection": detector.settings() if detector else None,
+            "tesseract": tesseract_version()
+        },
+        sort_keys=True
+    )
+
+def skipped_without_text(metadata: Dict[str, Any], detector: Optional[TextDetector]) -> bool:
+    """
+    Whether an image's text score is below the detector's current threshold
+
+    Args:
+        metadata: Metadata from extract_text, possibly cached under another threshold
+        detector: Text detector in use, if any
+
+    Returns:
+        True if the image should not be indexed
+    """
+    return detector is not None and "text_score" in metadata and not detector.accepts(metadata["text_score"])
+
+def needs_ocr(metadata: Dict[str, Any], detector: Optional[TextDetector]) -> bool:
+    """
+    Whether a cached result was skipped under a threshold the current one would read
+
+    Args:
+        metadata: Cached metadata from extract_text
+        detector: Text detector in use, if any
+
+    Returns:
+        True if the image has to be read again
+    """
+    return metadata.get("text_detected") is False and not skipped_without_text(metadata, detector)
+
 class ImageLoader(BaseLoader):
     """
     Load images and extract text using OCR
     """
-    
-    def __init__(self, file_path: str, language: str = "eng"):
+
+    def __init__(self,
+                 file_path: str,
+                 language: str = "eng",
+                 config: str = "",
+                 preprocessor: Optional[OCRPreprocessor] = None,
+                 detector: Optional[TextDetector] = None,
+                 cache_path: Optional[str] = DEFAULT_CACHE_PATH):
         """
         Initialize the image loader
-        
+
         Args:
             file_path: Path to the image file
             language: Language for OCR (default: English)
+            config: Extra Tesseract options, e.g. "--psm 6"
+            preprocessor: How to prepare the image for OCR (default: OCRPreprocessor())
+            detector: If given, images it finds unlikely to contain text are skipped
+            cache_path: OCR cache file, or None to always run OCR
         """
         self.file_path = file_path
         self.language = language
-        
+        self.config = config
+        self.preprocessor = preprocessor or OCRPreprocessor()
+        self.detector = detector
+        self.cache_path = cache_path
+
         # Check if file exists
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"Image file not found: {file_path}")
-        
-        # Check if file is an image
+
+        # Check if file is an image; only the header is read, the pixels are decoded once in load
         try:
-            Image.open(file_path).verify()
+            with Image.open(file_path):
+                pass
         except Exception:
             raise ValueError(f"Not a valid image file: {file_path}")
-    
+
     def load(self) -> List[Document]:
         """
         Load and extract text from the image
-        
+
         Returns:
-            List of Document objects containing extracted text
+            List of Document objects containing extracted text; empty if the detector
+            found the image unlikely to contain text
         """
-        # Load image using PIL
-        image = Image.open(self.file_path)
-        
-        # Extract text using pytesseract
-        try:
-            text = pytesseract.image_to_string(image, lang=self.language)
-            text = text.strip()
-        except Exception as e:
-            raise RuntimeError(f"Error extracting text from image: {str(e)}")
-        
-        # If no text was extracted, return a message
-        if not text:
-            text = "No text could be extracted from this image."
-        
-        # Create metadata
-        metadata = {
-            "source": self.file_path,
-            "type": "image",
-            "format": image.format,
-            "mode": image.mode,
-            "width": image.width,
-            "height": image.height
-        }
-        
-        # Return document with extracted text
-        return [Document(page_content=text, metadata=metadata)]
+        cache = OCRCache(self.cache_path) if self.cache_path else None
+        settings = ocr_settings(self.config, self.preprocessor, self.detector)
+        content_hash = file_hash(self.file_path) if cache else None
 
+        result = cache.get(content_hash, self.language, settings) if cache else None
+        if result is None or needs_ocr(result[1], self.detector):
+            result = extract_text(self.file_path, self.language, self.config, self.preprocessor, self.detector)
+            if cache:
+                cache.put(content_hash, self.language, settings, *result)
+
+        if skipped_without_text(result[1], self.detector):
+            return []
+
+        # Return document with extracted text
+        return [make_document(self.file_path, *result)]
 
 class DirectoryImageLoader(BaseLoader):
     """
     Load all images from a directory and extract text using OCR
     """
-    
-    def __init__(self, directory_path: str, glob_pattern: str = "**/*.{jpg,jpeg,png,gif,bmp,tiff}", language: str = "eng", recursive: bool = True):
+
+    def __init__(self,
+                 directory_path: str,
+                 glob_pattern: str = "**/*.{jpg,jpeg,png,gif,bmp,tiff}",
+                 language: str = "eng",
+                 recursive: bool = True,
+                 config: str = "",
+                 preprocessor: Optional[OCRPreprocessor] = None,
+                 detector: Optional[TextDetector] = None,
+                 workers: Optional[int] = None,
+                 cache_path: Optional[str] = DEFAULT_CACHE_PATH):
         """
         Initialize the directory image loader
-        
+
         Args:
             directory_path: Path to the directory
-            glob_pattern: Pattern to match image files
+            glob_pattern: Pattern to match image files; {a,b} alternatives are expanded
             language: Language for OCR (default: English)
             recursive: Whether to search recursively (default: True)
+            config: Extra Tesseract options, e.g. "--psm 6"
+            preprocessor: How to prepare images for OCR (default: OCRPreprocessor())
+            detector: Skips OCR and indexing for images unlikely to contain text
+                (default: TextDetector(); TextDetector(threshold=0) reads every image)
+            workers: Processes to run OCR in (default: one per core; 1 runs it in this process)
+            cache_path: OCR cache file, or None to always run OCR
         """
         self.directory_path = directory_path
         self.glob_pattern = glob_pattern
         self.language = language
         self.recursive = recursive
-        
+        self.config = config
+        self.preprocessor = preprocessor or OCRPreprocessor()
+        self.detector = detector or TextDetector()
+        self.workers = workers or os.cpu_count() or 1
+        self.cache_path = cache_path
+
+        # Counters from the last load
+        self.cache_hits = 0
+        self.ocr_runs = 0
+        self.skipped_no_text = 0
+
         # Check if directory exists
         if not os.path.isdir(directory_path):
             raise NotADirectoryError(f"Directory not found: {directory_path}")
-    
+
+    def find_images(self) -> List[str]:
+        """
+        Find the image files in the directory
+
+        Returns:
+            Sorted list of image file paths
+        """
+        import glob
+
+        image_files = set()
+        for pattern in expand_braces(self.glob_pattern):
+            image_files.update(glob.glob(os.path.join(self.directory_path, pattern), recursive=self.recursive))
+        return sorted(image_files)
+
     def load(self) -> List[Document]:
         """
         Load and extract text from all images in the directory
-        
+
+        Images already in the OCR cache are not read again; the rest are read in parallel.
+        Images the text detector finds unlikely to contain text are neither read nor returned.
+
         Returns:
-            List of Document objects containing extracted text
+            List of Document objects containing extracted text, in file name order
         """
-        import glob
-        
-        # Find all image files in the directory
-        if self.recursive:
-            image_files = glob.glob(os.path.join(self.directory_path, self.glob_pattern), recursive=True)
-        else:
-            image_files = glob.glob(os.path.join(self.directory_path, self.glob_pattern), recursive=False)
-        
-        # Load each image
-        documents = []
+        image_files = self.find_images()
+        cache = OCRCache(self.cache_path) if self.cache_path else None
+        settings = ocr_settings(self.config, self.preprocessor, self.detector)
+
+        # Look every image up first, so only the misses go to Tesseract
+        results: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        pending: List[Tuple[str, Optional[str]]] = []
         for image_file in image_files:
             try:
-                loader = ImageLoader(image_file, language=self.language)
-                documents.extend(loader.load())
-            except Exception as e:
+                content_hash = file_hash(image_file) if cache else None
+            except OSError as e:
                 print(f"Error loading image {image_file}: {str(e)}")
-        
+                continue
+            result = cache.get(content_hash, self.language, settings) if cache else None
+            if result is not None and not needs_ocr(result[1], self.detector):
+                results[image_file] = result
+            else:
+                pending.append((image_file, content_hash))
+
+        self.cache_hits = len(results)
+        self.ocr_runs = 0
+
+        for (image_file, content_hash), result in zip(pending, self._extract_all([path for path, _ in pending])):
+            if isinstance(result, Exception):
+                print(f"Error loading image {image_file}: {str(result)}")
+                continue
+            results[image_file] = result
+            if result[1].get("text_detected") is not False:
+                self.ocr_runs += 1
+            if cache:
+                cache.put(content_hash, self.language, settings, *result)
+
+        documents = []
+        self.skipped_no_text = 0
+        for image_file in image_files:
+            if image_file not in results:
+                continue
+            if skipped_without_text(results[image_file][1], self.detector):
+                self.skipped_no_text += 1
+                continue
+            documents.append(make_document(image_file, *results[image_file]))
+
+        if image_files:
+            print(f"OCR: {self.cache_hits} images cached, {self.ocr_runs} read, {self.skipped_no_text} skipped as unlikely to contain text")
+
         return documents
+
+    def _extract_all(self, image_files: List[str]) -> List:
+        """
+        Run OCR on images, in worker processes when there are several
+
+        Args:
+            image_files: Paths to the image files
+
+        Returns:
+            One (text, metadata) tuple or exception per image, in the same order
+        """
+        if self.workers <= 1 or len(image_files) <= 1:
+            results = []
+            for image_file in image_files:
+                try:
+                    results.append(extract_text(image_file, self.language, self.config, self.preprocessor, self.detector))
+                except Exception as e:
+                    results.append(e)
+            return results
+
+        results = []
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(image_files))) as pool:
+            futures = [pool.submit(extract_text, image_file, self.language, self.config, self.preprocessor, self.detector) for image_file in image_files]
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append(e)
+        return results
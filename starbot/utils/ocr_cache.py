@@ -0,0 +1,107 @@
+"""
+Persistent OCR result cache for StarBot
+"""
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+# Where OCR results are cached between runs
+DEFAULT_CACHE_PATH = os.environ.get(
+    "STARBOT_OCR_CACHE",
+    os.path.join(os.path.expanduser("~"), ".starbot", "ocr_cache.sqlite")
+)
+
+def file_hash(file_path: str) -> str:
+    """
+    Hex SHA-256 of a file's content
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class OCRCache:
+    """
+    OCR results keyed by (image content hash, language, preprocessing settings)
+
+    Keyed by content rather than path, so renamed or copied images are not read again,
+    and by settings, so changing how images are prepared for Tesseract reads them afresh.
+    """
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        """
+        Initialize the cache
+
+        Args:
+            path: SQLite file the results are kept in
+        """
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connection() as connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS ocr_results (
+                    content_hash TEXT NOT NULL,
+                    language TEXT NOT NULL,
+                    settings TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    metadata TEXT NOT NULL,
+                    PRIMARY KEY (content_hash, language, settings)
+                )
+            """)
+
+    def _connection(self) -> sqlite3.Connection:
+        """This thread's connection; several processes may write at once"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, content_hash: str, language: str, settings: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Look up an OCR result
+
+        Args:
+            content_hash: Hex SHA-256 of the image file
+            language: OCR language
+            settings: Preprocessing settings, serialized
+
+        Returns:
+            Tuple of (text, image metadata), or None if the image has not been read this way
+        """
+        row = self._connection().execute(
+            "SELECT text, metadata FROM ocr_results WHERE content_hash = ? AND language = ? AND settings = ?",
+            (content_hash, language, settings)
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def put(self, content_hash: str, language: str, settings: str, text: str, metadata: Dict[str, Any]) -> None:
+        """
+        Store an OCR result
+
+        Args:
+            content_hash: Hex SHA-256 of the image file
+            language: OCR language
+            settings: Preprocessing settings, serialized
+            text: Extracted text
+            metadata: Image metadata
+        """
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO ocr_results (content_hash, language, settings, text, metadata) VALUES (?, ?, ?, ?, ?)",
+                (content_hash, language, settings, text, json.dumps(metadata))
+            )
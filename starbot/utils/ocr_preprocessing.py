@@ -0,0 +1,170 @@
+"""
+Image preprocessing before OCR for StarBot
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from PIL import Image, ImageOps
+
+# Resolution Tesseract is tuned for
+DEFAULT_TARGET_DPI = 300
+
+# Longest side an image of unknown resolution is sent to Tesseract at; phone photos are
+# about twice this
+DEFAULT_MAX_SIDE = 2000
+
+# Longest side a low-resolution image is enlarged to, that of an A4 page at 300 DPI; a
+# file recording a tiny DPI would otherwise be blown up many times over
+DEFAULT_MAX_UPSCALED_SIDE = 3508
+
+# What cameras and editors record when they do not know the resolution
+PLACEHOLDER_DPIS = {72, 96}
+
+# Resizing by less than this fraction is not worth the time
+SCALE_TOLERANCE = 0.1
+
+def otsu_threshold(histogram: List[int]) -> int:
+    """
+    Grey level that best separates dark from light pixels (Otsu's method)
+
+    Args:
+        histogram: 256-bin histogram of a greyscale image
+
+    Returns:
+        Threshold; pixels above it are light
+    """
+    total = sum(histogram)
+    weighted_total = sum(level * count for level, count in enumerate(histogram))
+
+    best_threshold, best_variance = 0, -1.0
+    background, weighted_background = 0, 0
+    for level, count in enumerate(histogram):
+        background += count
+        weighted_background += level * count
+        foreground = total - background
+        if background == 0:
+            continue
+        if foreground == 0:
+            break
+        mean_background = weighted_background / background
+        mean_foreground = (weighted_total - weighted_background) / foreground
+        variance = background * foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best_threshold, best_variance = level, variance
+    return best_threshold
+
+class OCRPreprocessor:
+    """
+    Decode an image once and prepare it for Tesseract
+
+    JPEGs are decoded straight to greyscale and, when the image is far larger than OCR needs,
+    at a reduced scale (draft mode). The image is then rotated upright and scaled: scans with
+    a known resolution to the target DPI, anything else down to the maximum side. Finally it
+    is optionally binarised.
+    """
+    def __init__(self,
+                 enabled: bool = True,
+                 target_dpi: int = DEFAULT_TARGET_DPI,
+                 max_side: int = DEFAULT_MAX_SIDE,
+                 max_upscaled_side: int = DEFAULT_MAX_UPSCALED_SIDE,
+                 binarize: bool = False):
+        """
+        Initialize the preprocessor
+
+        Args:
+            enabled: Whether to preprocess at all; if False images go to Tesseract as they are
+            target_dpi: Resolution to scale images with a known DPI to
+            max_side: Longest side an image of unknown DPI is sent to Tesseract at
+            max_upscaled_side: Longest side an image of known DPI is enlarged to at most
+            binarize: Whether to threshold to black and white (Otsu) before OCR
+        """
+        self.enabled = enabled
+        self.target_dpi = target_dpi
+        self.max_side = max_side
+        self.max_upscaled_side = max_upscaled_side
+        self.binarize = binarize
+
+    def settings(self) -> Dict[str, Any]:
+        """Settings that change what OCR reads, for OCR cache keys"""
+        if not self.enabled:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            "target_dpi": self.target_dpi,
+            "max_side": self.max_side,
+            "max_upscaled_side": self.max_upscaled_side,
+            "binarize": self.binarize
+        }
+
+    def scale(self, size: Tuple[int, int], dpi: Optional[float]) -> float:
+        """
+        Factor to resize an image by before OCR
+
+        Args:
+            size: Width and height of the image
+            dpi: Resolution recorded in the file, if known
+
+        Returns:
+            Scale factor; 1.0 when the image is close enough already
+        """
+        if dpi:
+            # Images are only enlarged up to max_upscaled_side, never shrunk by the cap
+            scale = min(self.target_dpi / dpi, max(1.0, self.max_upscaled_side / max(size)))
+        else:
+            scale = min(1.0, self.max_side / max(size))
+        if abs(scale - 1.0) < SCALE_TOLERANCE:
+            return 1.0
+        return scale
+
+    def prepare(self, file_path: str) -> Tuple[Image.Image, Dict[str, Any]]:
+        """
+        Decode an image and prepare it for OCR
+
+        Args:
+            file_path: Path to the image file
+
+        Returns:
+            Tuple of (image ready for Tesseract, metadata of the original image)
+        """
+        image = Image.open(file_path)
+        metadata = {
+            "type": "image",
+            "format": image.format,
+            "mode": image.mode,
+            "width": image.width,
+            "height": image.height
+        }
+        if not self.enabled:
+            return image, metadata
+
+        dpi = round(image.info.get("dpi", (0, 0))[0]) or None
+        if dpi is not None and (dpi < 10 or dpi in PLACEHOLDER_DPIS):
+            dpi = None
+        scale = self.scale(image.size, dpi)
+
+        # JPEGs decode straight to greyscale, and at 1/2, 1/4 or 1/8 scale when that is still
+        # large enough, for far less work; other formats ignore this
+        reduce = min(scale, 1.0)
+        image.draft("L", (max(1, round(image.width * reduce)), max(1, round(image.height * reduce))))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("L")
+
+        if scale != 1.0:
+            # Draft decoding may have done part of the scaling already
+            longest = round(max(metadata["width"], metadata["height"]) * scale)
+            ratio = longest / max(image.size)
+            if abs(ratio - 1.0) >= SCALE_TOLERANCE:
+                image = image.resize(
+                    (max(1, round(image.width * ratio)), max(1, round(image.height * ratio))),
+                    Image.LANCZOS
+                )
+        # Tell Tesseract the resolution it is getting, or let it estimate one
+        if dpi:
+            effective_dpi = round(dpi * max(image.size) / max(metadata["width"], metadata["height"]))
+            image.info["dpi"] = (effective_dpi, effective_dpi)
+        else:
+            image.info.pop("dpi", None)
+
+        if self.binarize:
+            threshold = otsu_threshold(image.histogram())
+            image = image.point([0 if level <= threshold else 255 for level in range(256)])
+
+        return image, metadata
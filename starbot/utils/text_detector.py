@@ -0,0 +1,152 @@
+"""
+Fast text-presence detection for StarBot, to skip OCR on photos without text
+"""
+import os
+from typing import Any, Dict
+import numpy as np
+from PIL import Image
+
+# Images scoring below this are taken to have no text; see docs/image_processing.md for
+# the scores it was calibrated on
+DEFAULT_THRESHOLD = float(os.environ.get("STARBOT_TEXT_THRESHOLD", "0.3"))
+
+# Longest side of the copy the image is analysed at
+ANALYSIS_SIZE = 1024
+
+# Side of the square tiles the copy is split into; about two lines of body text
+TILE_SIZE = 32
+
+# Fewest high-contrast tiles a score is taken over, so a few stray tiles on a blank
+# image cannot score high
+MIN_CONTRASTED_TILES = 4
+
+class TextDetector:
+    """
+    Estimate from a small greyscale copy whether an image is likely to contain text
+
+    The copy is split into tiles, and a tile looks like text when it is high-contrast and
+    two-toned, and its minority tone (the ink) is drawn in thin strokes crossed in both
+    directions, banded along rows and never filling a whole row or column the way rules,
+    stripes and brickwork do. Text runs along lines, so only text-like tiles with a
+    text-like neighbour on the same row count. The score is the share of high-contrast
+    tiles that count, so margins and blank paper do not dilute it: pages and notices score
+    above 0.8, while photos, logos and drawings stay below 0.1.
+    """
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, size: int = ANALYSIS_SIZE, tile: int = TILE_SIZE):
+        """
+        Initialize the detector
+
+        Args:
+            threshold: Lowest score taken to mean the image has text; 0 keeps every image
+            size: Longest side of the copy the image is analysed at
+            tile: Side of the tiles, in pixels of the copy
+        """
+        self.threshold = threshold
+        self.size = size
+        self.tile = tile
+
+    def settings(self) -> Dict[str, Any]:
+        """Settings that change scores, for OCR cache keys; the threshold is applied afresh to cached scores"""
+        return {"size": self.size, "tile": self.tile, "score": "contrasted-share"}
+
+    def score(self, image: Image.Image) -> float:
+        """
+        Score how likely an image is to contain text
+
+        Args:
+            image: Image to analyse
+
+        Returns:
+            Share of high-contrast tiles that look like lines of text, between 0 and 1
+        """
+        small = image.convert("L")
+        factor = -(-max(small.size) // self.size)
+        if factor > 1:
+            small = small.reduce(factor)
+
+        pixels = np.asarray(small, dtype=np.float32)
+        rows, columns = pixels.shape[0] // self.tile, pixels.shape[1] // self.tile
+        if rows == 0 or columns == 0:
+            return 0.0
+
+        # (rows, columns, tile pixels) blocks
+        tiles = pixels[:rows * self.tile, :columns * self.tile]
+        tiles = tiles.reshape(rows, self.tile, columns, self.tile).transpose(0, 2, 1, 3)
+        flat = tiles.reshape(rows, columns, -1)
+
+        low, high = np.percentile(flat, [5, 95], axis=-1)
+        contrast = high - low
+        spread = np.maximum(contrast, 1.0)[..., None]
+
+        # Text is two-toned: most pixels sit near the paper or the ink tone
+        near_low = (flat - low[..., None]) < 0.3 * spread
+        near_high = (high[..., None] - flat) < 0.3 * spread
+        two_toned = (near_low | near_high).mean(axis=-1)
+
+        # Ink is whichever tone covers less of the tile (dark on light or light on dark)
+        dark = tiles < ((low + high) / 2)[..., None, None]
+        dark_share = dark.mean(axis=(-2, -1))
+        ink = np.where((dark_share <= 0.5)[..., None, None], dark, ~dark)
+        ink_share = np.minimum(dark_share, 1.0 - dark_share)
+
+        # Strokes are thin: ink runs along rows and columns are short
+        row_starts = ink[..., :, 0].sum(axis=-1) + (ink[..., :, 1:] & ~ink[..., :, :-1]).sum(axis=(-2, -1))
+        column_starts = ink[..., 0, :].sum(axis=-1) + (ink[..., 1:, :] & ~ink[..., :-1, :]).sum(axis=(-2, -1))
+        ink_pixels = ink.sum(axis=(-2, -1))
+        stroke_width = np.minimum(
+            ink_pixels / np.maximum(row_starts, 1),
+            ink_pixels / np.maximum(column_starts, 1)
+        )
+        crossings = row_starts / (self.tile * self.tile)
+
+        # Rules, borders and stripes fill whole rows or columns of a tile; strokes of text do not
+        ruled = (ink.mean(axis=-1).max(axis=-1) >= 0.9) | (ink.mean(axis=-2).max(axis=-1) >= 0.9)
+
+        # Letters have strokes across both directions, where stripes cross only one way
+        balanced = (column_starts >= 0.25 * row_starts) & (row_starts >= 0.25 * column_starts)
+
+        # Lines of text leave rows with little ink between them
+        row_ink = ink.mean(axis=-1)
+        banded = row_ink.std(axis=-1) >= 1.2 * ink.mean(axis=-2).std(axis=-1)
+
+        contrasted = contrast >= 60
+        text_like = (
+            contrasted
+            & (two_toned >= 0.75)
+            & (ink_share >= 0.04) & (ink_share <= 0.4)
+            & (stroke_width <= self.tile / 5)
+            & (crossings >= 0.02)
+            & ~ruled
+            & balanced
+            & banded
+        )
+
+        # Only tiles continuing a line of text count
+        beside = np.zeros_like(text_like)
+        beside[:, 1:] |= text_like[:, :-1]
+        beside[:, :-1] |= text_like[:, 1:]
+        return float((text_like & beside).sum() / max(int(contrasted.sum()), MIN_CONTRASTED_TILES))
+
+    def likely_text(self, image: Image.Image) -> bool:
+        """
+        Decide whether an image is worth running OCR on
+
+        Args:
+            image: Image to analyse
+
+        Returns:
+            True if the image scores at or above the threshold
+        """
+        return self.accepts(self.score(image))
+
+    def accepts(self, score: float) -> bool:
+        """
+        Decide whether a score is high enough to run OCR
+
+        Args:
+            score: Score from score()
+
+        Returns:
+            True if the score is at or above the threshold
+        """
+        return self.threshold <= 0 or score >= self.threshold
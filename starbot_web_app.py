@@ -5,12 +5,13 @@ import os
 import ssl
 import certifi
 import httpx
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify
 from flask_cors import CORS
 
 from starbot.data.ingestion import DataIngestion
 from starbot.models.config import ModelConfig
 from starbot.models.retrieval import RetrievalQA
+from static_assets import InlineAsset, etag_matches, not_modified_headers
 
 # Set SSL certificate environment variable
 os.environ['SSL_CERT_FILE'] = certifi.where()
@@ -31,14 +32,8 @@ print("Initializing StarBot...")
 data_ingestion = DataIngestion()
 model_config = ModelConfig()
 
-# Load data from Star College Durban website
-print("Ingesting data from Star College Durban website...")
-docs = data_ingestion.ingest_website('https://starcollegedurban.co.za/')
-print(f"Ingested {len(docs)} document chunks")
-
-# Create vector store
-vector_store = data_ingestion.create_vector_store(docs, 'star-college')
-print("Vector store created successfully")
+# Reuse the persisted collection; set STARBOT_REFRESH_DATA=true to re-crawl the website
+vector_store = data_ingestion.website_vector_store('https://starcollegedurban.co.za/', 'star-college')
 
 # Initialize QA system
 qa_system = RetrievalQA(
@@ -48,9 +43,8 @@ qa_system = RetrievalQA(
 print("QA system initialized")
 print("StarBot is ready!")
 
-@app.route('/')
-def home():
-    """Render home page"""
+def home_html() -> str:
+    """Get the home page HTML"""
     return '''
     <!DOCTYPE html>
     <html>
@@ -277,6 +271,17 @@ def home():
     </html>
     '''
 
+# The page never changes while the app runs, so it is compressed and hashed once
+home_page = InlineAsset(home_html())
+
+@app.route('/')
+def home():
+    """Render home page"""
+    body, headers = home_page.select(request.headers.get('Accept-Encoding'))
+    if etag_matches(request.headers.get('If-None-Match'), headers['ETag']):
+        return Response(status=304, headers=not_modified_headers(headers))
+    return Response(body, headers=headers)
+
 @app.route('/ask', methods=['POST'])
 def ask():
     """Answer a question"""
@@ -0,0 +1,294 @@
+"""
+Fingerprinted, precompressed static assets for Star College Chatbot
+
+build_static.py copies every asset under static/ to static/dist/ with a content hash in its
+name, writes gzip and brotli variants of compressible files and rewrites the references in
+the HTML pages. This module decides which file answers a request and with which headers:
+hashed files are cached as immutable, while pages and anything not built are revalidated
+with strong ETags. It does not depend on a web framework, so the Flask and ASGI servers
+share it.
+"""
+import os
+import gzip
+import json
+import hashlib
+import logging
+import mimetypes
+import threading
+from typing import Optional, Dict, Tuple, Any
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+DIST_DIRNAME = "dist"
+MANIFEST_NAME = "manifest.json"
+
+# Content types worth compressing; images and videos are compressed already
+COMPRESSIBLE_EXTENSIONS = {".html", ".css", ".js", ".json", ".svg", ".txt", ".xml", ".map"}
+
+# Layout hint for responsive images: chat bubbles are nearly full width on phones
+IMAGE_SIZES = "(max-width: 600px) 90vw, 480px"
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Variant file suffixes in order of preference, with their Content-Encoding
+ENCODINGS = ((".br", "br"), (".gz", "gzip"))
+
+def content_hash(data: bytes) -> str:
+    """Hex SHA-256 of some content"""
+    return hashlib.sha256(data).hexdigest()
+
+def accepted_encodings(accept_encoding: Optional[str]) -> set:
+    """Encodings the client accepts, from its Accept-Encoding header"""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.partition(";")
+        params = params.strip().replace(" ", "")
+        try:
+            quality = float(params[2:]) if params.startswith("q=") else 1.0
+        except ValueError:
+            quality = 1.0
+        if name.strip() and quality > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison, as RFC 9110 asks for)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    bare = etag[2:] if etag.startswith("W/") else etag
+    return any((candidate[2:] if candidate.startswith("W/") else candidate) == bare for candidate in candidates)
+
+def not_modified_headers(headers: Dict[str, str]) -> Dict[str, str]:
+    """Headers to repeat on a 304 Not Modified response"""
+    return {name: value for name, value in headers.items() if name in ("ETag", "Cache-Control", "Vary")}
+
+class StaticAsset:
+    """A file chosen to answer a static request, with its response headers"""
+
+    def __init__(self, file_path: str, content_type: str, etag: str, headers: Dict[str, str]):
+        """
+        Initialize the asset
+
+        Args:
+            file_path: File to send
+            content_type: Content type of the decoded content
+            etag: Strong ETag of the bytes sent
+            headers: Response headers, ETag and Cache-Control included
+        """
+        self.file_path = file_path
+        self.content_type = content_type
+        self.etag = etag
+        self.headers = headers
+
+class AssetManifest:
+    """Maps static paths to their fingerprinted copies and answers static requests"""
+
+    def __init__(self, static_dir: str = STATIC_DIR):
+        """
+        Initialize the manifest
+
+        Args:
+            static_dir: Directory the static files are served from
+        """
+        self.static_dir = os.path.realpath(static_dir)
+        self.dist_dir = os.path.join(self.static_dir, DIST_DIRNAME)
+        self.assets: Dict[str, str] = {}
+        self.pages: set = set()
+        self.images: Dict[str, Dict[str, Any]] = {}
+        self.hashed: set = set()
+        self._etags: Dict[Tuple[str, int, int], str] = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self) -> None:
+        """Load the manifest written by build_static.py, if there is one"""
+        path = os.path.join(self.dist_dir, MANIFEST_NAME)
+        if not os.path.exists(path):
+            logger.info("No static asset manifest found, serving static files unversioned")
+            return
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Error loading static asset manifest: {e}")
+            return
+
+        self.assets = manifest.get("assets", {})
+        self.pages = set(manifest.get("pages", []))
+        self.images = manifest.get("images", {})
+        self.hashed = set(self.assets.values())
+        for image in self.images.values():
+            for variants in image["variants"].values():
+                self.hashed.update(variant["path"] for variant in variants)
+        logger.info(f"Loaded static asset manifest with {len(self.assets)} assets")
+
+    def url(self, path: str) -> str:
+        """
+        Get the URL to reference a static file by
+
+        Args:
+            path: Path relative to static/, e.g. "images/science.jpg"
+
+        Returns:
+            The fingerprinted URL if the asset was built, otherwise the plain one
+        """
+        hashed = self.assets.get(path)
+        if hashed is None:
+            return f"/static/{path}"
+        return f"/static/{DIST_DIRNAME}/{hashed}"
+
+    def responsive_image(self, path: str) -> Dict[str, Any]:
+        """
+        Get what a client needs to load an image at the size it displays it
+
+        Args:
+            path: Image path relative to static/, e.g. "images/science.jpg"
+
+        Returns:
+            Dictionary with the fallback "url" and, if variants were built, its "width" and
+            "height", a "sizes" hint and "sources" giving the srcset of each format, best first
+        """
+        image: Dict[str, Any] = {"url": self.url(path)}
+        built = self.images.get(path)
+        if not built:
+            return image
+
+        sources = []
+        for content_type, variants in built["variants"].items():
+            srcset = ", ".join(f"/static/{DIST_DIRNAME}/{variant['path']} {variant['width']}w" for variant in variants)
+            sources.append({"type": content_type, "srcset": srcset})
+
+        image.update({
+            "width": built["width"],
+            "height": built["height"],
+            "sizes": IMAGE_SIZES,
+            "sources": sources,
+        })
+        return image
+
+    def _etag(self, file_path: str) -> str:
+        """Strong ETag of a file, cached until the file changes"""
+        stat = os.stat(file_path)
+        key = (file_path, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            etag = self._etags.get(key)
+        if etag is None:
+            with open(file_path, "rb") as f:
+                etag = f'"{content_hash(f.read())[:32]}"'
+            with self._lock:
+                self._etags[key] = etag
+        return etag
+
+    def _safe_path(self, root: str, path: str) -> Optional[str]:
+        """Resolve a request path under a root, or None if it escapes it or is not a file"""
+        full_path = os.path.realpath(os.path.join(root, path))
+        if not full_path.startswith(root + os.sep) or not os.path.isfile(full_path):
+            return None
+        return full_path
+
+    def lookup(self, path: str, accept_encoding: Optional[str] = None) -> Optional[StaticAsset]:
+        """
+        Choose the file and headers that answer a request for a static path
+
+        Args:
+            path: Path relative to static/, e.g. "index_with_avatar.html" or "dist/images/a.1f2e3d4c.png"
+            accept_encoding: The request's Accept-Encoding header
+
+        Returns:
+            The asset, or None if there is no such file
+        """
+        dist_path = path[len(DIST_DIRNAME) + 1:] if path.startswith(DIST_DIRNAME + "/") else None
+        if dist_path is not None and dist_path in self.hashed:
+            file_path = self._safe_path(self.dist_dir, dist_path)
+            cache_control = IMMUTABLE_CACHE_CONTROL
+        elif path in self.pages:
+            # Built pages reference the fingerprinted assets but keep their names, so they revalidate
+            file_path = self._safe_path(self.dist_dir, path)
+            cache_control = REVALIDATE_CACHE_CONTROL
+        else:
+            file_path = None
+            cache_control = REVALIDATE_CACHE_CONTROL
+
+        if file_path is None:
+            file_path = self._safe_path(self.static_dir, path)
+            cache_control = REVALIDATE_CACHE_CONTROL
+            if file_path is None:
+                return None
+
+        content_type = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type in ("application/javascript", "application/json"):
+            content_type += "; charset=utf-8"
+        headers = {"Cache-Control": cache_control}
+
+        # Serve a precompressed variant if the build wrote one and the client takes it
+        if os.path.splitext(file_path)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+            headers["Vary"] = "Accept-Encoding"
+            accepted = accepted_encodings(accept_encoding)
+            for suffix, encoding in ENCODINGS:
+                if encoding in accepted and os.path.isfile(file_path + suffix):
+                    file_path += suffix
+                    headers["Content-Encoding"] = encoding
+                    break
+
+        etag = self._etag(file_path)
+        headers["ETag"] = etag
+        return StaticAsset(file_path, content_type, etag, headers)
+
+class InlineAsset:
+    """A response body built in code, e.g. an inline HTML page, compressed and hashed once"""
+
+    def __init__(self, body: str, content_type: str = "text/html; charset=utf-8"):
+        """
+        Initialize the inline asset
+
+        Args:
+            body: Response body
+            content_type: Content type of the body
+        """
+        self.content_type = content_type
+        data = body.encode("utf-8")
+        self.variants: Dict[Optional[str], Tuple[bytes, str]] = {None: (data, f'"{content_hash(data)[:32]}"')}
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        self.variants["gzip"] = (compressed, f'"{content_hash(compressed)[:32]}"')
+        if brotli is not None:
+            compressed = brotli.compress(data)
+            self.variants["br"] = (compressed, f'"{content_hash(compressed)[:32]}"')
+
+    def select(self, accept_encoding: Optional[str] = None) -> Tuple[bytes, Dict[str, str]]:
+        """
+        Get the body and headers for a request
+
+        Args:
+            accept_encoding: The request's Accept-Encoding header
+
+        Returns:
+            Tuple of (body, headers)
+        """
+        accepted = accepted_encodings(accept_encoding)
+        encoding = next((name for _, name in ENCODINGS if name in accepted and name in self.variants), None)
+        body, etag = self.variants[encoding]
+        headers = {
+            "Content-Type": self.content_type,
+            "Cache-Control": REVALIDATE_CACHE_CONTROL,
+            "Vary": "Accept-Encoding",
+            "ETag": etag,
+        }
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return body, headers
+
+# Process-wide manifest used by the servers
+asset_manifest = AssetManifest()
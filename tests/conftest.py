@@ -0,0 +1,8 @@
+"""
+Shared test setup for Star College Chatbot
+"""
+import os
+import sys
+
+# The server modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
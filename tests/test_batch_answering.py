@@ -0,0 +1,78 @@
+"""
+Tests for batch answering through the intent router
+"""
+import threading
+import time
+
+from answer_cache import AnswerCache
+from batch_answering import answer_many
+from intent_router import IntentRouter
+from llm_providers import BaseLLMProvider
+
+class CountingProvider(BaseLLMProvider):
+    """Answers every question after a short delay, counting calls in flight"""
+
+    name = "batch-counting"
+    records_transcripts = False
+
+    def __init__(self):
+        super().__init__()
+        self.initialized = True
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def initialize(self) -> bool:
+        return True
+
+    def generate_answer(self, question, context=None, timeout=None):
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(0.01)
+        with self._lock:
+            self.in_flight -= 1
+        return f"answer to {question}"
+
+class RecordingRetriever:
+    """Returns one passage per question and records what it was asked"""
+
+    def __init__(self):
+        self.calls = []
+
+    def search_many(self, queries, num_results=3):
+        self.calls.append(list(queries))
+        return [[f"passage about {query}"] for query in queries]
+
+def test_local_routes_skip_retrieval_and_results_keep_order():
+    provider = CountingProvider()
+    retriever = RecordingRetriever()
+    questions = [{"question": "hello"}, {"question": "Which clubs run on Saturday mornings?"}]
+
+    results = list(answer_many(questions, IntentRouter(provider), retriever))
+
+    assert [result["route"] for result in results] == ["small_talk", "main_model"]
+    assert retriever.calls == [["Which clubs run on Saturday mornings?"]]
+    assert results[1]["context"] == ["passage about Which clubs run on Saturday mornings?"]
+    assert results[1]["answer"] == "answer to Which clubs run on Saturday mornings?"
+
+def test_questions_taken_a_chunk_at_a_time():
+    provider = CountingProvider()
+    retriever = RecordingRetriever()
+    questions = [{"question": f"Which sports are offered to learners in grade {grade}?"} for grade in range(10)]
+
+    results = list(answer_many(questions, IntentRouter(provider), retriever, max_workers=2, chunk_size=4))
+
+    assert [result["id"] for result in results] == list(range(10))
+    assert [len(call) for call in retriever.calls] == [4, 4, 2]
+    assert provider.peak <= 2
+
+def test_answer_cache_round_trip(tmp_path):
+    cache = AnswerCache()
+    cache.put("Which clubs run on Saturday?", "Chess and robotics.")
+    path = str(tmp_path / "answers.jsonl")
+    assert cache.save(path) == 1
+
+    loaded = AnswerCache()
+    assert loaded.load(path) == 1
+    assert loaded.get("which clubs run on saturday") == "Chess and robotics."
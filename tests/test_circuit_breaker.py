@@ -0,0 +1,93 @@
+"""
+Tests for the circuit breakers around upstream LLM calls
+"""
+import asyncio
+import time
+
+import pytest
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, get_circuit_breaker
+from deadline import DeadlineExceeded
+from llm_providers import BaseLLMProvider
+
+class ScriptedProvider(BaseLLMProvider):
+    """Provider whose calls raise or return whatever the test queues up"""
+
+    records_transcripts = False
+
+    def __init__(self, name: str, outcomes):
+        super().__init__()
+        self.name = name
+        self.outcomes = list(outcomes)
+        self.initialized = True
+
+    def generate_answer(self, question, context=None, timeout=None):
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+def open_breaker(name: str) -> CircuitBreaker:
+    """Get a breaker for name that is open and goes half-open almost at once"""
+    breaker = get_circuit_breaker(name)
+    breaker.recovery_timeout = 0.01
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    assert breaker.state == OPEN
+    time.sleep(0.02)
+    assert breaker.state == HALF_OPEN
+    return breaker
+
+def test_timed_out_half_open_trial_frees_its_slot():
+    breaker = open_breaker("test-timeout")
+    provider = ScriptedProvider("test-timeout", [DeadlineExceeded("out of time"), "recovered"])
+
+    with pytest.raises(DeadlineExceeded):
+        provider.request_answer("question", timeout=1.0)
+    assert breaker.state == HALF_OPEN
+
+    # The next trial is let through and closes the breaker
+    assert provider.request_answer("question", timeout=1.0) == "recovered"
+    assert breaker.state == CLOSED
+
+def test_cancelled_half_open_trial_frees_its_slot():
+    breaker = open_breaker("test-cancel")
+
+    class SlowProvider(ScriptedProvider):
+        async def agenerate_answer(self, question, context=None, timeout=None):
+            await asyncio.sleep(10)
+
+    async def cancel_trial():
+        task = asyncio.ensure_future(SlowProvider("test-cancel", []).arequest_answer("question"))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_trial())
+    assert breaker.state == HALF_OPEN
+    assert ScriptedProvider("test-cancel", ["recovered"]).request_answer("question") == "recovered"
+    assert breaker.state == CLOSED
+
+def test_half_open_slots_are_limited():
+    breaker = CircuitBreaker("test-busy", failure_threshold=1, recovery_timeout=0.0)
+    breaker.record_failure()
+    token = breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.release(token)
+    breaker.release(token)
+    assert breaker.before_call() is not None
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+def test_stale_token_is_ignored_after_state_change():
+    breaker = CircuitBreaker("test-stale", failure_threshold=1, recovery_timeout=0.0)
+    breaker.record_failure()
+    token = breaker.before_call()
+    breaker.record_failure()
+    assert breaker.before_call() is not None
+    # Releasing the first trial's token must not free the second trial's slot
+    breaker.release(token)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
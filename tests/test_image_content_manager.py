@@ -0,0 +1,86 @@
+"""
+Tests for reloading the image database while it is being searched
+"""
+import json
+import os
+import threading
+
+from PIL import Image
+
+from image_content_manager import ImageContentManager
+from image_placeholders import load_placeholders
+
+def write_database(directory, locations):
+    path = os.path.join(directory, "database.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"locations": locations, "students": []}, f)
+    return path
+
+def location(name, image):
+    return {"name": name, "description": f"The {name.lower()}", "image": image, "keywords": [name.lower()]}
+
+def bump_mtime(path, seconds):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + int(seconds * 1e9)))
+
+def test_reload_describes_new_photos(tmp_path):
+    Image.new("RGB", (40, 30), (200, 20, 20)).save(tmp_path / "hall.jpg")
+    database_path = write_database(str(tmp_path), [location("Hall", "hall.jpg")])
+    manager = ImageContentManager(database_path, backend="json")
+
+    Image.new("RGB", (30, 60), (20, 20, 200)).save(tmp_path / "library.jpg")
+    write_database(str(tmp_path), [location("Hall", "hall.jpg"), location("Library", "library.jpg")])
+    bump_mtime(database_path, 2)
+
+    assert manager.reload_if_changed()
+    assert set(load_placeholders(database_path)) == {"hall.jpg", "library.jpg"}
+    image = manager.find_matching_images("where is the library located")[0]
+    assert (image["width"], image["height"]) == (30, 60)
+    assert image["placeholder"].startswith("data:image/webp")
+
+    # The sidecar written during the reload does not count as another change
+    assert not manager.reload_if_changed()
+
+def test_replaced_catalogue_closed_after_searches_finish(tmp_path):
+    Image.new("RGB", (40, 30)).save(tmp_path / "hall.jpg")
+    database_path = write_database(str(tmp_path), [location("Hall", "hall.jpg")])
+    manager = ImageContentManager(database_path, backend="sqlite")
+
+    old = manager.catalogue
+    closed = []
+    old.close = lambda: closed.append(old)
+
+    searching, reloaded = threading.Event(), threading.Event()
+    search = old.search
+
+    def slow_search(query):
+        searching.set()
+        reloaded.wait(5)
+        return search(query)
+
+    old.search = slow_search
+    reader = threading.Thread(target=manager.find_matching_images, args=("where is the hall located",))
+    reader.start()
+    searching.wait(5)
+
+    write_database(str(tmp_path), [location("Hall", "hall.jpg"), location("Gym", "hall.jpg")])
+    bump_mtime(database_path, 2)
+    assert manager.reload_if_changed()
+    assert manager.catalogue is not old
+    assert closed == []
+
+    reloaded.set()
+    reader.join(5)
+    assert closed == [old]
+
+def test_idle_catalogue_closed_on_reload(tmp_path):
+    Image.new("RGB", (40, 30)).save(tmp_path / "hall.jpg")
+    database_path = write_database(str(tmp_path), [location("Hall", "hall.jpg")])
+    manager = ImageContentManager(database_path, backend="sqlite")
+    manager.find_matching_images("where is the hall located")
+
+    old = manager.catalogue
+    write_database(str(tmp_path), [location("Gym", "hall.jpg")])
+    bump_mtime(database_path, 2)
+    assert manager.reload_if_changed()
+    assert old._connections == []
@@ -0,0 +1,51 @@
+"""
+Tests that incremental ingestion keeps what failed sources had
+"""
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("langchain_community")
+
+from langchain_community.embeddings import FakeEmbeddings
+
+import starbot.data.ingestion as ingestion
+from starbot.data.ingestion import DataIngestion
+
+def write_sources(tmp_path):
+    paths = []
+    for name, text in (("clubs.txt", "Chess, robotics and debating clubs meet on Saturdays."),
+                       ("fees.txt", "Bursaries are available to learners who qualify.")):
+        path = tmp_path / name
+        path.write_text(text, encoding="utf-8")
+        paths.append(str(path))
+    return paths
+
+def test_failed_source_keeps_its_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingestion, "CachedEmbeddings", lambda embeddings, model: FakeEmbeddings(size=16))
+    data_ingestion = DataIngestion(persist_directory=str(tmp_path / "chroma"))
+    clubs, fees = write_sources(tmp_path)
+
+    documents = data_ingestion.ingest_multiple_sources(text_files=[clubs, fees], parallel=True)
+    data_ingestion.create_vector_store(documents, "test", keep_sources=data_ingestion.errors)
+    before = set(data_ingestion.load_vector_store("test").get(include=[])["ids"])
+
+    load_source = ingestion._load_source
+
+    def flaky(kind, source):
+        if source == fees:
+            raise OSError("temporarily unavailable")
+        return load_source(kind, source)
+
+    monkeypatch.setattr(ingestion, "_load_source", flaky)
+    documents = data_ingestion.ingest_multiple_sources(text_files=[clubs, fees], parallel=True)
+    assert set(data_ingestion.errors) == {fees}
+    vector_store = data_ingestion.create_vector_store(documents, "test", keep_sources=data_ingestion.errors)
+
+    assert set(vector_store.get(include=[])["ids"]) == before
+    assert data_ingestion.load_vector_store("test") is not None
+
+    # Once it loads again without changes, nothing is embedded or deleted
+    monkeypatch.setattr(ingestion, "_load_source", load_source)
+    documents = data_ingestion.ingest_multiple_sources(text_files=[clubs, fees], parallel=True)
+    vector_store = data_ingestion.create_vector_store(documents, "test", keep_sources=data_ingestion.errors)
+    assert set(vector_store.get(include=[])["ids"]) == before
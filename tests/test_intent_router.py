@@ -0,0 +1,60 @@
+"""
+Tests for local intent routing
+"""
+from intent_router import IntentRouter
+from llm_providers import MockProvider
+
+class RecordingProvider(MockProvider):
+    """Mock provider that counts the questions it is asked"""
+
+    def __init__(self):
+        super().__init__()
+        self.questions = []
+
+    def answer_question(self, question, context=None, timeout=None):
+        self.questions.append(question)
+        return "from the model"
+
+def make_router():
+    provider = RecordingProvider()
+    return IntentRouter(provider), provider
+
+def test_faq_questions_padded_with_politeness_are_hits():
+    router, _ = make_router()
+    assert router.route_local("Where is Star College located?")[0] == "faq"
+    assert router.route_local("Hi, please tell me where is star college located")[0] == "faq"
+
+def test_questions_containing_an_faq_question_go_to_the_model():
+    router, _ = make_router()
+    for question in [
+        "What is Star College Durban ranked nationally?",
+        "where is star college located relative to the airport",
+        "how can i contact star college to apply for a bursary",
+    ]:
+        assert router.route_local(question) is None, question
+
+def test_small_talk_needs_a_whole_phrase():
+    router, _ = make_router()
+    assert router.route_local("see you later")[0] == "small_talk"
+    assert router.route_local("thank you so much starbot")[0] == "small_talk"
+    assert router.route_local("hi there")[0] == "small_talk"
+    assert router.route_local("see") is None
+
+def test_retrieval_only_runs_when_the_model_is_needed():
+    router, provider = make_router()
+    retrievals = []
+
+    def retrieve():
+        retrievals.append(True)
+        return ["Some passage about sports."]
+
+    answer, route = router.answer("hello", retrieve=retrieve)
+    assert route == "small_talk" and not retrievals
+
+    answer, route = router.answer("Which sports can learners play at the school?", retrieve=retrieve, timeout=lambda: 3.0)
+    assert route == "main_model" and answer == "from the model" and retrievals
+
+def test_retrieval_miss_is_answered_locally():
+    router, provider = make_router()
+    _, route = router.answer("Which sports can learners play?", retrieve=lambda: ["No relevant information found."])
+    assert route == "retrieval_miss" and not provider.questions
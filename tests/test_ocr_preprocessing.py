@@ -0,0 +1,29 @@
+"""
+Tests for the scale images are sent to Tesseract at
+"""
+from PIL import Image
+
+from starbot.utils.ocr_preprocessing import OCRPreprocessor
+
+def test_scans_scaled_to_target_dpi():
+    preprocessor = OCRPreprocessor()
+    assert preprocessor.scale((1275, 1650), 150) == 2.0
+    assert preprocessor.scale((5100, 6600), 600) == 0.5
+
+def test_low_dpi_never_enlarged_past_cap():
+    preprocessor = OCRPreprocessor()
+    assert preprocessor.scale((4000, 3000), 25) == 1.0
+    assert round(1000 * preprocessor.scale((1000, 800), 25)) == preprocessor.max_upscaled_side
+
+def test_unknown_dpi_only_scaled_down():
+    preprocessor = OCRPreprocessor()
+    assert preprocessor.scale((4032, 3024), None) == 2000 / 4032
+    assert preprocessor.scale((800, 600), None) == 1.0
+
+def test_prepared_image_within_cap(tmp_path):
+    path = str(tmp_path / "tiny-dpi.png")
+    Image.new("L", (1200, 900), 255).save(path, dpi=(25, 25))
+
+    image, metadata = OCRPreprocessor().prepare(path)
+    assert max(image.size) <= OCRPreprocessor().max_upscaled_side
+    assert (metadata["width"], metadata["height"]) == (1200, 900)
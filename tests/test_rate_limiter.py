@@ -0,0 +1,79 @@
+"""
+Tests for asyncio waiters of the admission controller
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+import rate_limiter
+from rate_limiter import AdmissionController, AdmissionError
+
+def test_async_waiters_admitted_in_order_as_slots_free():
+    controller = AdmissionController("test", max_concurrency=1, queue_timeout=5)
+    order = []
+
+    async def call(index):
+        async with controller.admit_async():
+            order.append(index)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(*(call(index) for index in range(20)))
+
+    asyncio.run(main())
+    assert order == list(range(20))
+    assert controller.snapshot()["active"] == 0
+    assert controller.snapshot()["waiting"] == 0
+
+def test_async_waiter_woken_by_release_from_another_thread():
+    controller = AdmissionController("test", max_concurrency=1, queue_timeout=5)
+    controller.acquire()
+
+    async def main():
+        waiter = asyncio.ensure_future(controller.acquire_async())
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+
+        released_at = time.monotonic()
+        threading.Thread(target=controller.release).start()
+        await waiter
+        return time.monotonic() - released_at
+
+    assert asyncio.run(main()) < 0.5
+    assert controller.snapshot()["active"] == 1
+
+def test_cancelled_async_waiter_leaves_the_queue():
+    controller = AdmissionController("test", max_concurrency=1, queue_timeout=5)
+    controller.acquire()
+
+    async def main():
+        first = asyncio.ensure_future(controller.acquire_async())
+        second = asyncio.ensure_future(controller.acquire_async())
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        controller.release()
+        await asyncio.wait_for(second, 1)
+
+    asyncio.run(main())
+    assert controller.snapshot() == {"active": 1, "waiting": 0, "max_concurrency": 1, "admitted": 2, "rejected": 0}
+
+def test_async_waiter_times_out():
+    controller = AdmissionController("test", max_concurrency=1)
+    controller.acquire()
+
+    with pytest.raises(AdmissionError):
+        asyncio.run(controller.acquire_async(timeout=0.05))
+    assert controller.snapshot()["waiting"] == 0
+
+def test_default_limits_apply_to_new_controllers(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "_controllers", {})
+    monkeypatch.setattr(rate_limiter, "_default_limits", dict(rate_limiter._default_limits))
+
+    rate_limiter.set_default_limits(rate_limiter.ASYNC_MAX_CONCURRENCY, rate_limiter.ASYNC_MAX_QUEUE)
+    controller = rate_limiter.get_admission_controller("limits-test")
+    assert controller.max_concurrency == rate_limiter.ASYNC_MAX_CONCURRENCY
+    assert controller.max_queue == rate_limiter.ASYNC_MAX_QUEUE
@@ -0,0 +1,59 @@
+"""
+Tests that the text detector's default threshold separates pages from photos
+"""
+import os
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+import pytest
+
+from starbot.utils.ocr_preprocessing import OCRPreprocessor
+from starbot.utils.text_detector import TextDetector
+
+IMAGES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static", "images")
+
+TEXT = (
+    "Star College is an independent school for boys and girls. Learners take part in "
+    "mathematics olympiads, robotics and coding clubs, debating, chess and athletics."
+)
+
+def font(size):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        return ImageFont.load_default()
+
+def notice(path, lines):
+    """A4 notice at 150 DPI with a heading and lines of body text"""
+    image = Image.new("RGB", (1240, 1754), (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    draw.text((124, 146), "NOTICE TO PARENTS", fill=(0, 0, 0), font=font(60))
+    words = TEXT.split()
+    for line in range(lines):
+        draw.text((124, 266 + line * 47), " ".join(words[line * 6 % 24:line * 6 % 24 + 6]), fill=(20, 20, 20), font=font(26))
+    image.save(path, dpi=(150, 150))
+    return path
+
+def score(path):
+    image, _ = OCRPreprocessor().prepare(path)
+    return TextDetector().score(image)
+
+@pytest.mark.parametrize("lines", [3, 12])
+def test_notice_scores_above_threshold(tmp_path, lines):
+    detector = TextDetector()
+    assert detector.accepts(score(notice(str(tmp_path / "notice.png"), lines)))
+
+@pytest.mark.parametrize("name", ["photorealistic_avatar.png", "avatar_preview.jpg", "chess.jpg", "science.jpg", "starBot.png"])
+def test_repo_images_score_below_threshold(name):
+    assert not TextDetector().accepts(score(os.path.join(IMAGES, name)))
+
+def test_noise_scores_below_threshold(tmp_path):
+    rng = np.random.default_rng(0)
+    path = str(tmp_path / "noise.jpg")
+    Image.fromarray(rng.integers(0, 256, (900, 1200, 3), dtype=np.uint8)).save(path)
+    assert not TextDetector().accepts(score(path))
+
+def test_blank_image_scores_zero(tmp_path):
+    path = str(tmp_path / "blank.png")
+    Image.new("L", (800, 600), 255).save(path)
+    assert score(path) == 0.0
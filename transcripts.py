@@ -0,0 +1,95 @@
+"""
+Recording and loading of LLM provider transcripts
+
+Set LLM_RECORD_TRANSCRIPTS to a file path and every successful upstream answer is appended
+to it as one JSON line, keyed by the hash of the prompt. ReplayProvider serves these
+recordings back for offline load tests.
+"""
+import os
+import json
+import time
+import threading
+import logging
+from typing import Optional, Dict, Any, List
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class TranscriptRecorder:
+    """Thread-safe JSONL writer for provider transcripts"""
+
+    def __init__(self, path: str):
+        """
+        Initialize the recorder
+
+        Args:
+            path: JSONL file to append transcripts to
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self,
+               provider: str,
+               model: Optional[str],
+               prompt_hash: str,
+               question: str,
+               answer: str,
+               latency_seconds: float,
+               completion_tokens: int) -> None:
+        """Append one transcript; providers return whole answers, so only the total latency is known"""
+        entry = {
+            "recorded_at": time.time(),
+            "provider": provider,
+            "model": model,
+            "prompt_hash": prompt_hash,
+            "question": question,
+            "answer": answer,
+            "latency_seconds": round(latency_seconds, 4),
+            "completion_tokens": completion_tokens,
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        try:
+            with self._lock:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+        except OSError as e:
+            logger.error(f"Error recording transcript to {self.path}: {e}")
+
+def load_transcripts(path: str) -> List[Dict[str, Any]]:
+    """
+    Load recorded transcripts
+
+    Args:
+        path: JSONL file written by TranscriptRecorder
+
+    Returns:
+        List of transcript entries
+    """
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                logger.warning(f"Skipping malformed transcript on line {line_number} of {path}: {e}")
+    logger.info(f"Loaded {len(entries)} transcripts from {path}")
+    return entries
+
+_recorder: Optional[TranscriptRecorder] = None
+_recorder_lock = threading.Lock()
+
+def get_transcript_recorder() -> Optional[TranscriptRecorder]:
+    """Get the recorder configured by LLM_RECORD_TRANSCRIPTS, or None if recording is off"""
+    global _recorder
+    path = os.environ.get("LLM_RECORD_TRANSCRIPTS")
+    if not path:
+        return None
+
+    with _recorder_lock:
+        if _recorder is None or _recorder.path != path:
+            _recorder = TranscriptRecorder(path)
+        return _recorder